@@ -0,0 +1,89 @@
+"""
+Benchmark of the memory taken by a materialized plan of sync actions, reports the
+bytes per action of each record type as JSON: a dataclass with __dict__ (the
+previous GetActionResponse), the slotted GetActionResponse and ActionBatch. The
+names are allocated before the measure, only the records are measured
+
+usage: cd src && python -m benchmarks.action_memory [--entries 5000000]
+"""
+
+import argparse
+import json
+import os
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from diff_folders.actions import ActionBatch, GetActionResponse, batch_actions
+from settings import DiffActionsEnum
+
+
+@dataclass
+class DictActionResponse:
+    """GetActionResponse before slots, each record with its own __dict__"""
+    common_root: str
+    name: str
+    action: DiffActionsEnum
+    origin: Optional[str] = None
+
+
+def build_plan(
+    record: Callable[..., object], roots: List[str], names: List[str]
+) -> List[object]:
+    """Return a create action of every name on every folder"""
+    return [
+        record(common_root=root, name=name, action=DiffActionsEnum.CREATE_FILE)
+        for root in roots
+        for name in names
+    ]
+
+
+def build_batches(roots: List[str], names: List[str]) -> List[ActionBatch]:
+    """Return the same plan grouped in a batch per folder"""
+    return list(batch_actions(
+        GetActionResponse(common_root=root, name=name, action=DiffActionsEnum.CREATE_FILE)
+        for root in roots
+        for name in names
+    ))
+
+
+def measure(build: Callable[[], object], entries: int) -> float:
+    """Return the traced bytes per action kept by the built plan"""
+    tracemalloc.start()
+    plan = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del plan
+
+    return round(size / entries, 1)
+
+
+def main(args):
+    """Print the bytes per action of each record type"""
+    folders = max(args.entries // args.files_per_folder, 1)
+    roots = [os.path.join("folder", str(count)) for count in range(folders)]
+    names = [f"file{count}.txt" for count in range(args.files_per_folder)]
+    entries = folders * args.files_per_folder
+
+    result = {
+        "entries": entries,
+        "dataclass_dict": measure(
+            lambda: build_plan(DictActionResponse, roots, names), entries
+        ),
+        "dataclass_slots": measure(
+            lambda: build_plan(GetActionResponse, roots, names), entries
+        ),
+        "action_batch": measure(lambda: build_batches(roots, names), entries),
+    }
+
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=5_000_000,
+        help="number of actions of the plan")
+    parser.add_argument("--files-per-folder", type=int, default=1000,
+        help="number of actions of each folder")
+
+    main(parser.parse_args())
@@ -0,0 +1,73 @@
+"""
+Benchmark of the hash algorithms available to the content diff strategy, reports
+the throughput in GB/s of each algorithm on the current machine, from memory or
+from a file when a path is given
+
+usage: cd src && python -m benchmarks.hash_algorithms [--size-mb 256] [--file path]
+"""
+
+import argparse
+import os
+import time
+
+from diff_folders.hashing import file_digest, new_hasher
+from settings import HASH_BUFFER_SIZE, HashAlgorithmEnum
+
+
+def memory_throughput(algorithm: HashAlgorithmEnum, data: bytes, repeat: int) -> float:
+    """Return the best throughput in GB/s hashing data by chunks"""
+    view = memoryview(data)
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher = new_hasher(algorithm)
+        for offset in range(0, len(view), HASH_BUFFER_SIZE):
+            hasher.update(view[offset:offset + HASH_BUFFER_SIZE])
+        hasher.digest()
+        best = min(best, time.perf_counter() - start)
+
+    return len(data) / best / 1e9
+
+
+def file_throughput(algorithm: HashAlgorithmEnum, path: str, repeat: int) -> float:
+    """Return the best throughput in GB/s hashing a file, page cache included"""
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        file_digest(path, algorithm)
+        best = min(best, time.perf_counter() - start)
+
+    return os.stat(path).st_size / best / 1e9
+
+
+def main(args):
+    """Print the algorithms from the fastest to the slowest"""
+    data = os.urandom(args.size_mb * 1024 * 1024) if args.file is None else b""
+    results = {}
+
+    for algorithm in HashAlgorithmEnum:
+        try:
+            if args.file is None:
+                results[algorithm] = memory_throughput(algorithm, data, args.repeat)
+            else:
+                results[algorithm] = file_throughput(algorithm, args.file, args.repeat)
+        except ValueError as err:
+            # e.g. md5 disabled on FIPS builds
+            print(f"{algorithm.value:<10} unavailable: {err}")
+
+    for algorithm, throughput in sorted(results.items(), key=lambda item: -item[1]):
+        print(f"{algorithm.value:<10} {throughput:6.2f} GB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256,
+        help="size of random data hashed from memory")
+    parser.add_argument("--file", type=str, default=None,
+        help="hash this file instead of random data from memory")
+    parser.add_argument("--repeat", type=int, default=3,
+        help="number of runs per algorithm, the best run is reported")
+
+    main(parser.parse_args())
@@ -0,0 +1,176 @@
+"""
+Benchmark of the sync phases on synthetic trees, each shape is generated on source,
+copied to destination and mutated, then the phases are timed: the walk of both
+trees, the diff with size and last modified date, the diff with content hash and
+the apply of the actions. Reports as JSON, for each phase, the files/s, MB/s, read
+and write syscalls (from /proc/self/io) and the peak RSS of the process so far
+
+usage: cd src && python -m benchmarks.sync_phases [--shapes deep wide] [--scale 10]
+"""
+
+import argparse
+import dataclasses
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from benchmarks.tree_generator import (SHAPES, Mutation, TreeShape, copy_tree,
+                                       generate_tree, mutate_tree)
+from diff_folders.walk_tree import DiffTree
+from settings import FolderSettingsDataClass, SyncOptionsDataClass
+from sync.controller import SyncController
+from sync.plan import write_plan
+
+
+def proc_io() -> Optional[Dict[str, int]]:
+    """Return the io counters of the process, None when /proc is not available"""
+    try:
+        with open("/proc/self/io", encoding="ascii") as counters:
+            return {
+                key: int(value)
+                for key, value in (line.split(": ") for line in counters)
+            }
+    except OSError:
+        return None
+
+
+def measure(run: Callable[[], Tuple[int, int]]) -> Dict[str, object]:
+    """
+    Time a phase, run returns the files and bytes processed by the phase, the
+    peak RSS is the peak of the process since it started
+    """
+    io_before = proc_io()
+    start = time.perf_counter()
+    files, processed_bytes = run()
+    seconds = time.perf_counter() - start
+    io_after = proc_io()
+
+    result = {
+        "seconds": round(seconds, 4),
+        "files": files,
+        "bytes": processed_bytes,
+        "files_per_s": round(files / seconds, 1) if seconds else None,
+        "mb_per_s": round(processed_bytes / seconds / 1e6, 1) if seconds else None,
+        "read_syscalls": None,
+        "write_syscalls": None,
+        # KiB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if io_before is not None and io_after is not None:
+        result["read_syscalls"] = io_after["syscr"] - io_before["syscr"]
+        result["write_syscalls"] = io_after["syscw"] - io_before["syscw"]
+
+    return result
+
+
+def bench_shape(
+    shape: TreeShape, mutation: Mutation, seed: int, work_dir: Optional[str]
+) -> Dict[str, object]:
+    """Generate the trees of a shape and time each phase"""
+    with tempfile.TemporaryDirectory(dir=work_dir) as root:
+        source = os.path.join(root, "source")
+        destination = os.path.join(root, "destination")
+        os.mkdir(source)
+        os.mkdir(destination)
+
+        files = generate_tree(source, shape, seed)
+        copy_tree(source, destination)
+        mutated = mutate_tree(source, files, shape, mutation, seed)
+        source_files = len(files) - mutated["deleted"]
+        folder_settings = FolderSettingsDataClass(source=source, destination=destination)
+
+        def walk():
+            diff_tree = DiffTree(folder_settings=folder_settings)
+            # pylint: disable-next=protected-access
+            for _ in diff_tree._scan_tree_generator():
+                pass
+            return source_files, 0
+
+        def compare(sha256: bool):
+            options = SyncOptionsDataClass(sha256=sha256)
+            diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+            for _ in diff_tree.get_actions():
+                pass
+            return source_files, source_files * shape.file_size if sha256 else 0
+
+        plan = write_plan(
+            DiffTree(folder_settings=folder_settings).get_actions(),
+            folder_settings,
+            io.StringIO(),
+        )
+
+        def apply():
+            logger = logging.getLogger("benchmark")
+            logger.addHandler(logging.NullHandler())
+            logger.propagate = False
+            SyncController(folder_settings=folder_settings, logger=logger).execute()
+            return sum(plan.actions.values()), plan.bytes_to_copy
+
+        return {
+            "shape": dataclasses.asdict(shape),
+            "files": len(files),
+            "mutated": mutated,
+            "phases": {
+                "walk": measure(walk),
+                "compare_size_mtime": measure(lambda: compare(False)),
+                "compare_sha256": measure(lambda: compare(True)),
+                "apply": measure(apply),
+            },
+        }
+
+
+def git_commit() -> Optional[str]:
+    """Return the commit of the benchmarked tree, None outside a git repository"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, check=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    """Print the result of each shape as a single JSON document"""
+    mutation = Mutation(changed=args.changed, deleted=args.deleted, renamed=args.renamed)
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "seed": args.seed,
+        "mutation": dataclasses.asdict(mutation),
+        "shapes": {},
+    }
+
+    for name in args.shapes:
+        shape = SHAPES[name]
+        shape = dataclasses.replace(shape, files_per_folder=shape.files_per_folder * args.scale)
+        result["shapes"][name] = bench_shape(shape, mutation, args.seed, args.work_dir)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shapes", nargs="+", default=list(SHAPES), choices=list(SHAPES),
+        help="shapes of the trees to benchmark")
+    parser.add_argument("--scale", type=int, default=1,
+        help="multiply the files per folder of every shape")
+    parser.add_argument("--changed", type=float, default=10.0,
+        help="percentage of source files changed after the copy")
+    parser.add_argument("--deleted", type=float, default=5.0,
+        help="percentage of source files deleted after the copy")
+    parser.add_argument("--renamed", type=float, default=5.0,
+        help="percentage of source files renamed after the copy")
+    parser.add_argument("--seed", type=int, default=0,
+        help="seed of names and contents, the same seed generates the same trees")
+    parser.add_argument("--work-dir", type=str, default=None,
+        help="folder of the generated trees, the system temporary folder by default")
+
+    main(parser.parse_args())
@@ -0,0 +1,141 @@
+"""
+Deterministic generator of synthetic folder trees for the benchmarks, the same
+shape and seed always create the same names, contents and last modified dates,
+so results of different commits are comparable
+"""
+
+import math
+import os
+import random
+import shutil
+from dataclasses import dataclass
+from typing import Dict, List
+
+# last modified date of all generated files, changed files are one minute newer
+BASE_MTIME = 1_600_000_000
+# max size of the random block repeated to fill the content of each file
+BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass
+class TreeShape:
+    """Shape of a synthetic tree, every folder has the same files and sub folders"""
+    depth: int
+    fan_out: int
+    files_per_folder: int
+    file_size: int
+    # only the first block of each file has data, the rest is a hole
+    sparse: bool = False
+
+
+SHAPES: Dict[str, TreeShape] = {
+    "deep": TreeShape(depth=16, fan_out=1, files_per_folder=20, file_size=4096),
+    "wide": TreeShape(depth=1, fan_out=100, files_per_folder=20, file_size=4096),
+    "tiny": TreeShape(depth=2, fan_out=8, files_per_folder=50, file_size=256),
+    "huge": TreeShape(depth=0, fan_out=0, files_per_folder=4, file_size=64 * 1024 * 1024),
+    "sparse": TreeShape(
+        depth=0, fan_out=0, files_per_folder=4, file_size=64 * 1024 * 1024, sparse=True
+    ),
+}
+
+
+@dataclass
+class Mutation:
+    """Percentages of the source files changed, deleted and renamed after the copy"""
+    changed: float = 10.0
+    deleted: float = 5.0
+    renamed: float = 5.0
+
+
+def generate_tree(root: str, shape: TreeShape, seed: int = 0) -> List[str]:
+    """
+    Create the tree of the shape inside root
+
+    return: paths of the files created, relative to root and sorted
+    """
+    rng = random.Random(seed)
+    files = []
+    folders = [""]
+    level = [""]
+
+    for _ in range(shape.depth):
+        level = [
+            os.path.join(folder, f"folder_{number}")
+            for folder in level
+            for number in range(shape.fan_out)
+        ]
+        folders += level
+
+    for folder in folders:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+        for number in range(shape.files_per_folder):
+            path = os.path.join(folder, f"file_{number}.bin")
+            write_file(os.path.join(root, path), shape, _block(rng, shape))
+            files.append(path)
+
+    return sorted(files)
+
+
+def _block(rng: random.Random, shape: TreeShape) -> bytes:
+    """Return the random block of a file, never larger than the file"""
+    return rng.randbytes(min(BLOCK_SIZE, shape.file_size))
+
+
+def write_file(path: str, shape: TreeShape, block: bytes) -> None:
+    """Write a file of the shape size with the block repeated, or a sparse file"""
+    with open(path, "wb") as file:
+        if shape.sparse:
+            file.write(block)
+            file.truncate(shape.file_size)
+        else:
+            remaining = shape.file_size
+            while remaining > 0:
+                remaining -= file.write(block[:remaining])
+
+    os.utime(path, ns=(BASE_MTIME * 10**9, BASE_MTIME * 10**9))
+
+
+def copy_tree(source: str, destination: str) -> None:
+    """Copy the tree keeping the last modified dates, so both sides are in sync"""
+    shutil.copytree(source, destination, copy_function=shutil.copy2, dirs_exist_ok=True)
+
+
+def mutate_tree(
+    root: str, files: List[str], shape: TreeShape, mutation: Mutation, seed: int = 0
+) -> Dict[str, int]:
+    """
+    Change, delete and rename a percentage of the files (rounded up), the changed
+    files keep the size with a different content and a newer last modified date
+
+    return: number of files changed, deleted and renamed
+    """
+    rng = random.Random(seed + 1)
+    picked = list(files)
+    rng.shuffle(picked)
+    counts = {}
+    start = 0
+
+    for name, percent in (
+        ("changed", mutation.changed),
+        ("deleted", mutation.deleted),
+        ("renamed", mutation.renamed),
+    ):
+        count = math.ceil(len(files) * percent / 100)
+        counts[name] = count
+
+        for path in picked[start:start + count]:
+            full_path = os.path.join(root, path)
+
+            if name == "changed":
+                write_file(full_path, shape, _block(rng, shape))
+                mtime_ns = (BASE_MTIME + 60) * 10**9
+                os.utime(full_path, ns=(mtime_ns, mtime_ns))
+            elif name == "deleted":
+                os.remove(full_path)
+            else:
+                os.rename(full_path, full_path + ".renamed")
+
+        start += count
+
+    return counts
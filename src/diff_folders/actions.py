@@ -0,0 +1,93 @@
+"""
+This module has the records of sync actions, a single action record and a
+columnar batch of the actions of a folder, used when many actions are kept in
+memory instead of applied as they are found
+"""
+
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import (Dict, Generator, Iterable, Iterator, List, Optional,
+                    Tuple)
+
+from settings import DiffActionsEnum
+
+ACTIONS: List[DiffActionsEnum] = list(DiffActionsEnum)
+ACTION_CODES: Dict[DiffActionsEnum, int] = {
+    action: code for code, action in enumerate(ACTIONS)
+}
+
+
+@dataclass(slots=True)
+class GetActionResponse:
+    """Data response with required action to keep destination synced"""
+    common_root: str
+    name: str
+    action: DiffActionsEnum
+    # destination path moved to common_root/name by a move action, or linked to
+    # common_root/name by a link action
+    origin: Optional[str] = None
+
+
+class ActionBatch:
+    """
+    Actions of a single folder stored by columns, the folder path is kept once
+    and each action takes a name reference and a one byte action code
+    """
+
+    __slots__ = ("common_root", "names", "codes", "origins")
+
+    def __init__(self, common_root: str) -> None:
+        """Folder of the actions, interned to be shared with other batches"""
+        self.common_root = sys.intern(common_root)
+        self.names: List[str] = []
+        self.codes = array("B")
+        # origins by the action position, only moves and links have one
+        self.origins: Dict[int, str] = {}
+
+    def append(self, action: GetActionResponse) -> None:
+        """Add an action of the batch folder"""
+        if action.origin is not None:
+            self.origins[len(self.names)] = action.origin
+
+        self.names.append(action.name)
+        self.codes.append(ACTION_CODES[action.action])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getstate__(self) -> Tuple[str, List[str], array, Dict[int, str]]:
+        """Columns sent between processes, the batches of the sharded scan"""
+        return self.common_root, self.names, self.codes, self.origins
+
+    def __setstate__(self, state: Tuple[str, List[str], array, Dict[int, str]]) -> None:
+        common_root, self.names, self.codes, self.origins = state
+        self.common_root = sys.intern(common_root)
+
+    def __iter__(self) -> Iterator[GetActionResponse]:
+        """Yield the actions as records, created only while they are used"""
+        for position, name in enumerate(self.names):
+            yield GetActionResponse(
+                common_root=self.common_root,
+                name=name,
+                action=ACTIONS[self.codes[position]],
+                origin=self.origins.get(position),
+            )
+
+
+def batch_actions(
+    actions: Iterable[GetActionResponse]
+) -> Generator[ActionBatch, None, None]:
+    """Group the consecutive actions of the same folder in batches"""
+    batch = None
+
+    for action in actions:
+        if batch is None or action.common_root != batch.common_root:
+            if batch is not None:
+                yield batch
+            batch = ActionBatch(action.common_root)
+
+        batch.append(action)
+
+    if batch is not None:
+        yield batch
@@ -0,0 +1,126 @@
+"""
+Module to compare the content of two files with the same size reading as little
+as possible, sampled blocks are compared first and then both files are read in
+lock-step until the first different chunk, only the data extents when both files
+are sparse
+"""
+
+import os
+from typing import Any, Optional
+
+from diff_folders.hashing import update_zeros
+from file_system.sparse import data_extents
+from settings import (COMPARE_CHUNK_MAX, COMPARE_CHUNK_MIN, COMPARE_SAMPLE_SIZE,
+                      SPARSE_ZEROS_SIZE)
+
+
+def samples_differ(src_fd: int, dst_fd: int, size: int) -> bool:
+    """
+    Compare the head, middle and tail blocks of both files, small files are not
+    sampled since the lock-step comparison reads them in a few chunks
+
+    return: True if any sample is different
+    """
+    if size <= COMPARE_SAMPLE_SIZE * 3:
+        return False
+
+    for offset in (0, (size - COMPARE_SAMPLE_SIZE) // 2, size - COMPARE_SAMPLE_SIZE):
+        if os.pread(src_fd, COMPARE_SAMPLE_SIZE, offset) != os.pread(
+            dst_fd, COMPARE_SAMPLE_SIZE, offset
+        ):
+            return True
+
+    return False
+
+
+def stream_differ(fsrc, fdst, hasher: Optional[Any] = None) -> bool:
+    """
+    Read both files from the start in lock-step stopping on the first different
+    chunk, the chunk size doubles on every read until COMPARE_CHUNK_MAX. The hasher
+    (when given) is updated with the source content, so it holds the digest of
+    both files when the whole content is equal
+
+    return: True if the content is different
+    """
+    fsrc.seek(0)
+    fdst.seek(0)
+    chunk = COMPARE_CHUNK_MIN
+    src_buffer = bytearray(chunk)
+    dst_buffer = bytearray(chunk)
+
+    while True:
+        read = fsrc.readinto(src_buffer)
+        dst_read = fdst.readinto(dst_buffer)
+
+        if read != dst_read:
+            return True
+
+        if not read:
+            return False
+
+        # bytearray comparison is a memcmp, slices only for the last chunk
+        if read == chunk:
+            if src_buffer != dst_buffer:
+                return True
+        elif src_buffer[:read] != dst_buffer[:read]:
+            return True
+
+        if hasher is not None:
+            hasher.update(memoryview(src_buffer)[:read])
+
+        if chunk < COMPARE_CHUNK_MAX:
+            chunk = min(chunk * 2, COMPARE_CHUNK_MAX)
+            src_buffer = bytearray(chunk)
+            dst_buffer = bytearray(chunk)
+
+
+def extents_differ(fsrc, fdst, size: int, hasher: Optional[Any] = None) -> bool:
+    """
+    Compare two sparse files by their data extents, files with different data
+    extents are different, and otherwise only the data extents are read in
+    lock-step, the holes of both files are not read. The hasher (when given) is
+    updated with the source content, zeros for the holes
+
+    return: True if the content is different
+    """
+    extents = list(data_extents(fsrc.fileno(), size))
+    if extents != list(data_extents(fdst.fileno(), size)):
+        return True
+
+    zeros = memoryview(bytes(SPARSE_ZEROS_SIZE)) if hasher is not None else None
+    offset = 0
+
+    for start, end in extents:
+        if hasher is not None:
+            update_zeros(hasher, zeros, start - offset)
+
+        if _range_differ(fsrc.fileno(), fdst.fileno(), start, end, hasher):
+            return True
+        offset = end
+
+    if hasher is not None:
+        update_zeros(hasher, zeros, size - offset)
+
+    return False
+
+
+def _range_differ(
+    src_fd: int, dst_fd: int, start: int, end: int, hasher: Optional[Any]
+) -> bool:
+    """Read a range of both files in lock-step, the chunk size doubles on every read"""
+    chunk = COMPARE_CHUNK_MIN
+
+    while start < end:
+        length = min(chunk, end - start)
+        data = os.pread(src_fd, length, start)
+
+        if not data or data != os.pread(dst_fd, length, start):
+            return True
+
+        if hasher is not None:
+            hasher.update(data)
+
+        start += len(data)
+        chunk = min(chunk * 2, COMPARE_CHUNK_MAX)
+
+    return False
@@ -0,0 +1,62 @@
+"""
+This module keeps the listing of source folders from the previous scan, a folder
+with the same last modified date can reuse the listing instead of reading it again
+"""
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional
+
+
+@dataclass
+class CachedFolder:
+    """Listing of a source folder on the last scan"""
+    mtime_ns: int
+    folders: FrozenSet[str]
+    files: FrozenSet[str]
+    links: FrozenSet[str]
+
+
+class SourceDirCache:
+    """
+    In memory cache of source folders listing, kept between sync loops. The
+    listings of a scan are staged and only kept when the actions of the scan
+    were applied, a listing kept while its actions failed would hide them
+    """
+
+    def __init__(self) -> None:
+        self._folders: Dict[str, CachedFolder] = {}
+        self._staged: Dict[str, CachedFolder] = {}
+
+    def get(self, common_root: str, mtime_ns: int) -> Optional[CachedFolder]:
+        """Return the cached listing when the folder was not modified since the scan"""
+        cached = self._folders.get(common_root)
+
+        if cached is None or cached.mtime_ns != mtime_ns:
+            return None
+
+        return cached
+
+    def stage(self, common_root: str, cached: CachedFolder) -> None:
+        """Keep the listing of a folder for the next scan, once the scan is committed"""
+        self._staged[common_root] = cached
+
+    def commit(self) -> None:
+        """Keep the listings staged by the scan"""
+        self._folders.update(self._staged)
+        self._staged.clear()
+
+    def rollback(self) -> None:
+        """Drop the listings staged by the scan"""
+        self._staged.clear()
+
+    def discard(self, common_root: str) -> None:
+        """Remove a folder listing, forcing the next scan to read it"""
+        self._folders.pop(common_root, None)
+        self._staged.pop(common_root, None)
+
+    def retain(self, common_roots: Iterable[str]) -> None:
+        """Drop the folders that were not found on the last complete scan"""
+        seen = set(common_roots)
+        self._folders = {
+            root: cached for root, cached in self._folders.items() if root in seen
+        }
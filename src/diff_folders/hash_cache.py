@@ -0,0 +1,101 @@
+"""
+This module keeps a persistent cache of files content digest, a digest is valid
+while the file keeps the same identity (device and inode), size and last
+modified date, avoiding to read files that were not modified since last hash
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# version of the cache table, a cache file with an older version is discarded
+SCHEMA_VERSION = 1
+
+
+class HashCache:
+    """
+    SQLite cache of files digest with least recently used eviction, each digest
+    records the algorithm that produced it
+    """
+
+    def __init__(self, cache_path: str, max_entries: int, algorithm: str = "sha256") -> None:
+        """
+        Open (or create) the cache file, keeping at most max_entries digests, only
+        digests of the given algorithm are returned
+        """
+        self._max_entries = max_entries
+        self._algorithm = algorithm
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(cache_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        if self._connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._connection.execute("DROP TABLE IF EXISTS hashes")
+            self._connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "dev INTEGER NOT NULL, inode INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, algorithm TEXT NOT NULL, digest TEXT NOT NULL, "
+            "last_used INTEGER NOT NULL, PRIMARY KEY (dev, inode))"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes (last_used)"
+        )
+        self._connection.commit()
+
+    def get(self, st: os.stat_result) -> Optional[str]:
+        """Return the cached digest of a file when it was not modified since hashed"""
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, self._algorithm)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest FROM hashes "
+                "WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ? AND algorithm = ?",
+                key,
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._connection.execute(
+                "UPDATE hashes SET last_used = ? WHERE dev = ? AND inode = ?",
+                (time.time_ns(), st.st_dev, st.st_ino),
+            )
+
+        return row[0]
+
+    def put(self, st: os.stat_result, digest: str) -> None:
+        """Store the digest of a file with the stat taken before hashing it"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, self._algorithm,
+                    digest, time.time_ns()
+                ),
+            )
+
+    def commit(self) -> None:
+        """Evict the least recently used digests above the limit and persist changes"""
+        with self._lock:
+            count = self._connection.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+            if count > self._max_entries:
+                self._connection.execute(
+                    "DELETE FROM hashes WHERE rowid IN ("
+                    "SELECT rowid FROM hashes ORDER BY last_used LIMIT ?)",
+                    (count - self._max_entries,),
+                )
+
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Persist pending changes and close the cache file"""
+        self.commit()
+
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,122 @@
+"""
+Module to generate the digest of files content without allocating a new buffer per
+chunk read, large files can be hashed from a memory map and the holes of sparse
+files are hashed from a zeros buffer
+"""
+
+import hashlib
+import mmap
+import os
+from typing import Any, Callable, Dict, Optional
+
+from file_system.sparse import data_extents, is_sparse
+from settings import HASH_BUFFER_SIZE, SPARSE_ZEROS_SIZE, HashAlgorithmEnum
+
+# constructors keyed by the algorithm value
+HASH_ALGORITHMS: Dict[str, Callable[[], Any]] = {
+    HashAlgorithmEnum.SHA256.value: hashlib.sha256,
+    HashAlgorithmEnum.SHA1.value: hashlib.sha1,
+    HashAlgorithmEnum.SHA512.value: hashlib.sha512,
+    HashAlgorithmEnum.SHA3_256.value: hashlib.sha3_256,
+    HashAlgorithmEnum.BLAKE2B.value: hashlib.blake2b,
+    HashAlgorithmEnum.BLAKE2S.value: hashlib.blake2s,
+    HashAlgorithmEnum.MD5.value: hashlib.md5,
+}
+
+
+def new_hasher(algorithm: HashAlgorithmEnum) -> Any:
+    """Return a new hash object of the algorithm"""
+    return HASH_ALGORITHMS[algorithm.value]()
+
+
+def file_digest(
+    path: str,
+    algorithm: HashAlgorithmEnum = HashAlgorithmEnum.SHA256,
+    mmap_min_size: Optional[int] = None,
+) -> str:
+    """
+    Read a file content by chunks generating its digest, the holes of sparse files
+    are hashed from a zeros buffer without reading them
+
+    mmap_min_size: files from this size are hashed from a memory map without
+    copying the content, a file truncated by another process while mapped kills
+    the process with SIGBUS, so the memory map is only used when given
+    """
+    with open(path, "rb", buffering=0) as f:
+        st = os.fstat(f.fileno())
+
+        if is_sparse(st):
+            hasher = new_hasher(algorithm)
+            _sparse_update(hasher, f, st.st_size)
+            return hasher.hexdigest()
+
+        if mmap_min_size is not None and st.st_size >= mmap_min_size:
+            hasher = new_hasher(algorithm)
+            if _mmap_update(hasher, f):
+                return hasher.hexdigest()
+
+        # available from python 3.11
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, HASH_ALGORITHMS[algorithm.value]).hexdigest()
+
+        hasher = new_hasher(algorithm)
+        _buffered_update(hasher, f, bytearray(HASH_BUFFER_SIZE), st.st_size)
+
+    return hasher.hexdigest()
+
+
+def _mmap_update(hasher, f) -> bool:
+    """
+    Update the hash with memoryview slices of a memory map of the file
+
+    return: False if the file can not be mapped
+    """
+    try:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return False
+
+    with mapped:
+        if hasattr(mapped, "madvise"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+        with memoryview(mapped) as view:
+            for offset in range(0, len(view), HASH_BUFFER_SIZE):
+                hasher.update(view[offset:offset + HASH_BUFFER_SIZE])
+
+    return True
+
+
+def _buffered_update(hasher, f, buffer: bytearray, length: int) -> None:
+    """Update the hash with length bytes from the current position of the file"""
+    view = memoryview(buffer)
+
+    while length > 0:
+        read = f.readinto(view[:min(length, len(buffer))])
+        if not read:
+            break
+        hasher.update(view[:read])
+        length -= read
+
+
+def _sparse_update(hasher, f, size: int) -> None:
+    """Update the hash with the data extents of a file and zeros on its holes"""
+    zeros = memoryview(bytes(SPARSE_ZEROS_SIZE))
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    offset = 0
+
+    for start, end in data_extents(f.fileno(), size):
+        update_zeros(hasher, zeros, start - offset)
+        f.seek(start)
+        _buffered_update(hasher, f, buffer, end - start)
+        offset = end
+
+    update_zeros(hasher, zeros, size - offset)
+
+
+def update_zeros(hasher, zeros: memoryview, length: int) -> None:
+    """Update the hash with length zeros"""
+    while length > 0:
+        chunk = min(length, len(zeros))
+        hasher.update(zeros[:chunk])
+        length -= chunk
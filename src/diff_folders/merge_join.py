@@ -0,0 +1,125 @@
+"""
+This module diffs the files of folders too large to hold their names in memory,
+the names are sorted in runs spilled to temporary files and both sides are read
+in sorted order and merge joined, instead of diffing sets of names
+"""
+
+import heapq
+import os
+import struct
+import tempfile
+from typing import BinaryIO, Generator, Iterable, List, Tuple
+
+# length prefix of each name written on a run
+_LENGTH = struct.Struct("<I")
+# bytes read from a run on each read
+RUN_READ_SIZE = 1024 * 64
+
+
+class SortedNames:
+    """
+    Names added in any order and iterated in the order of the encoded names (the
+    order of the state index), every run of names is sorted and spilled to a
+    temporary file, iterating merges the runs. The names can be iterated more
+    than once until closed
+    """
+
+    def __init__(self, run_size: int) -> None:
+        """Names kept in memory before the run is spilled to a temporary file"""
+        self._run_size = run_size
+        self._buffer: List[str] = []
+        self._runs: List[BinaryIO] = []
+
+    def add(self, name: str) -> None:
+        """Add a name, spilling the run when it is full"""
+        self._buffer.append(name)
+
+        if len(self._buffer) >= self._run_size:
+            self._spill()
+
+    def __iter__(self) -> Generator[str, None, None]:
+        self._buffer.sort(key=os.fsencode)
+        runs = [_read_run(run) for run in self._runs]
+
+        yield from heapq.merge(*runs, self._buffer, key=os.fsencode)
+
+    def close(self) -> None:
+        """Remove the temporary files of the runs"""
+        for run in self._runs:
+            run.close()
+        self._runs.clear()
+        self._buffer.clear()
+
+    def _spill(self) -> None:
+        """Write the sorted names of the buffer on a new temporary file"""
+        run = tempfile.TemporaryFile()
+
+        for name in sorted(self._buffer, key=os.fsencode):
+            encoded = os.fsencode(name)
+            run.write(_LENGTH.pack(len(encoded)))
+            run.write(encoded)
+        run.flush()
+
+        self._runs.append(run)
+        self._buffer.clear()
+
+
+def _read_run(run: BinaryIO) -> Generator[str, None, None]:
+    """
+    Read the names of a run by positional reads, the runs of a folder are read
+    concurrently by the merge and each iteration has its own offset
+    """
+    offset = 0
+    pending = b""
+
+    while True:
+        block = os.pread(run.fileno(), RUN_READ_SIZE, offset)
+        if not block:
+            return
+        offset += len(block)
+        data = pending + block
+        position = 0
+
+        while position + _LENGTH.size <= len(data):
+            (length,) = _LENGTH.unpack_from(data, position)
+            end = position + _LENGTH.size + length
+            if end > len(data):
+                break
+            yield os.fsdecode(data[position + _LENGTH.size:end])
+            position = end
+
+        pending = data[position:]
+
+
+def merge_join(
+    source: Iterable[str], destination: Iterable[str]
+) -> Generator[Tuple[str, bool, bool], None, None]:
+    """
+    Join two iterables of unique names sorted by the encoded names, yielding each
+    name with if it exists on source and if it exists on destination
+    """
+    missing = object()
+    source_names = iter(source)
+    destination_names = iter(destination)
+    src = next(source_names, missing)
+    dest = next(destination_names, missing)
+
+    while src is not missing and dest is not missing:
+        if src == dest:
+            yield src, True, True
+            src = next(source_names, missing)
+            dest = next(destination_names, missing)
+        elif os.fsencode(src) < os.fsencode(dest):
+            yield src, True, False
+            src = next(source_names, missing)
+        else:
+            yield dest, False, True
+            dest = next(destination_names, missing)
+
+    while src is not missing:
+        yield src, True, False
+        src = next(source_names, missing)
+
+    while dest is not missing:
+        yield dest, False, True
+        dest = next(destination_names, missing)
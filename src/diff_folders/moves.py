@@ -0,0 +1,310 @@
+"""
+This module detects files and folders moved or renamed on source, matching the
+entries deleted from destination with the entries created from source, so the
+destination entry is moved instead of deleted and copied again
+"""
+
+import dataclasses
+import hashlib
+import os
+from collections import defaultdict
+from itertools import chain
+from typing import (Callable, Dict, Generator, Iterable, List, Optional, Set,
+                    Tuple)
+
+from diff_folders.actions import ActionBatch, GetActionResponse
+from settings import DiffActionsEnum, FolderSettingsDataClass
+
+HELD_ACTIONS = {
+    DiffActionsEnum.CREATE_FILE,
+    DiffActionsEnum.DELETE_FILE,
+    DiffActionsEnum.CREATE_FOLDER,
+    DiffActionsEnum.DELETE_FOLDER,
+    # a link waits the creation of its origin
+    DiffActionsEnum.LINK_FILE,
+}
+
+# files count and digest of the names, sizes and last modified dates of a folder tree
+Fingerprint = Tuple[int, str]
+
+
+class MoveDetector:  # pylint: disable=too-few-public-methods
+    """
+    Hold the create and delete actions until the scan ends and replace the created
+    entries that match a deleted entry with a move action
+    """
+
+    def __init__(
+        self,
+        folder_settings: FolderSettingsDataClass,
+        symlink: bool = False,
+        same_content: Optional[Callable[[str, str], bool]] = None,
+    ) -> None:
+        """
+        Settings of source and destination, files are matched by size and last
+        modified date and, when same_content is given, by the result of
+        same_content(path, origin) too
+        """
+        self._folder_settings = folder_settings
+        self._symlink = symlink
+        self._same_content = same_content
+        self._used: Set[str] = set()
+        self._used_parents: Set[str] = set()
+
+    def detect(
+        self, actions: Iterable[GetActionResponse]
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Yield the actions replacing creates by moves, the actions that do not
+        create or delete are yielded as they come, the others after the scan
+        """
+        batches = []
+
+        for action in actions:
+            if action.action not in HELD_ACTIONS:
+                yield action
+                continue
+
+            if not batches or batches[-1].common_root != action.common_root:
+                batches.append(ActionBatch(action.common_root))
+            batches[-1].append(action)
+
+        yield from self._resolve(batches)
+
+    def _resolve(
+        self, batches: List[ActionBatch]
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Match the held actions and yield them in the scan order, the created
+        entries inside a moved folder are dropped and the deleted folders that had
+        entries moved out are deleted at the end
+        """
+        # held actions are kept by columns and read as records on each pass
+        held = _Held(batches)
+        self._used.clear()
+        self._used_parents.clear()
+
+        if not any(
+            action.action in (DiffActionsEnum.CREATE_FILE, DiffActionsEnum.CREATE_FOLDER)
+            for action in held
+        ):
+            yield from held
+            return
+
+        deleted_files, deleted_folders = self._deleted_candidates(held)
+
+        if not deleted_files and not deleted_folders:
+            yield from held
+            return
+
+        moves = self._match(held, deleted_files, deleted_folders)
+        postponed = []
+        postponed_paths = set()
+
+        for action in held:
+            path = os.path.join(action.common_root, action.name)
+
+            if _is_moved(path, moves):
+                continue
+
+            if action.action in (DiffActionsEnum.DELETE_FILE, DiffActionsEnum.DELETE_FOLDER):
+                # a destination entry on the path of a move is deleted before it
+                if path in self._used:
+                    continue
+                if path in self._used_parents:
+                    postponed.append(action)
+                    postponed_paths.add(path)
+                else:
+                    yield action
+            elif path in moves:
+                yield moves[path]
+            elif path in self._used or path in postponed_paths:
+                # an entry replacing a moved or deleted entry waits for it to leave
+                postponed.append(action)
+            else:
+                yield action
+
+        yield from postponed
+
+    def _deleted_candidates(
+        self, held: Iterable[GetActionResponse]
+    ) -> Tuple[Dict[Tuple[int, int], List[str]], Dict[Fingerprint, List[str]]]:
+        """
+        Index the deleted destination files by size and last modified date, and
+        the deleted folders (and their sub folders) by fingerprint
+        """
+        deleted_files = defaultdict(list)
+        deleted_folders = defaultdict(list)
+
+        for action in held:
+            path = os.path.join(action.common_root, action.name)
+
+            if action.action == DiffActionsEnum.DELETE_FILE:
+                key = self._file_key(self._folder_settings.destination, path)
+                if key is not None:
+                    deleted_files[key].append(path)
+
+            elif action.action == DiffActionsEnum.DELETE_FOLDER:
+                files = {}
+                prints = tree_fingerprints(
+                    self._folder_settings.destination, path, False, files
+                )
+                for folder, fingerprint in prints.items():
+                    if fingerprint[0]:
+                        deleted_folders[fingerprint].append(folder)
+
+                for file_path, st in files.items():
+                    if st.st_size:
+                        deleted_files[(st.st_size, st.st_mtime_ns)].append(file_path)
+
+        return deleted_files, deleted_folders
+
+    def _match(
+        self,
+        held: Iterable[GetActionResponse],
+        deleted_files: Dict[Tuple[int, int], List[str]],
+        deleted_folders: Dict[Fingerprint, List[str]],
+    ) -> Dict[str, GetActionResponse]:
+        """
+        Return the move action of each created path matched with a deleted one,
+        created folders are matched first by the parent folders
+        """
+        moves = {}
+        source_prints: Dict[str, Fingerprint] = {}
+
+        for action in held:
+            path = os.path.join(action.common_root, action.name)
+
+            if _is_moved(path, moves):
+                continue
+
+            origin = None
+            if action.action == DiffActionsEnum.CREATE_FOLDER and deleted_folders:
+                if path not in source_prints:
+                    source_prints.update(
+                        tree_fingerprints(self._folder_settings.source, path, self._symlink)
+                    )
+                origin = self._take(deleted_folders.get(source_prints.get(path), ()))
+                move_action = DiffActionsEnum.MOVE_FOLDER
+
+            elif action.action == DiffActionsEnum.CREATE_FILE and deleted_files:
+                key = self._file_key(self._folder_settings.source, path)
+                origin = self._take(deleted_files.get(key, ()), path)
+                move_action = DiffActionsEnum.MOVE_FILE
+
+            if origin is not None:
+                moves[path] = dataclasses.replace(action, action=move_action, origin=origin)
+
+        return moves
+
+    def _take(self, origins: Iterable[str], path: Optional[str] = None) -> Optional[str]:
+        """
+        Return the first origin still available and mark it as used, an origin is
+        not available when it, a parent folder or a sub path was already moved
+        """
+        for origin in origins:
+            if origin in self._used_parents or any(
+                parent in self._used for parent in _parents(origin, include_self=True)
+            ):
+                continue
+
+            if path is not None and self._same_content is not None \
+                    and not self._same_content(path, origin):
+                continue
+
+            self._used.add(origin)
+            self._used_parents.update(_parents(origin))
+            return origin
+
+        return None
+
+    @staticmethod
+    def _file_key(root: str, path: str) -> Optional[Tuple[int, int]]:
+        """Return the size and last modified date of a not empty file"""
+        try:
+            st = os.stat(os.path.join(root, path))
+        except OSError:
+            return None
+
+        if not st.st_size:
+            return None
+
+        return st.st_size, st.st_mtime_ns
+
+
+def tree_fingerprints(
+    root: str,
+    path: str,
+    followlinks: bool,
+    files: Optional[Dict[str, os.stat_result]] = None,
+) -> Dict[str, Fingerprint]:
+    """
+    Return the fingerprint of a folder and all its sub folders, the fingerprint
+    covers the names, sizes and last modified dates of all files in the tree
+
+    files: filled with the stat of each file of the tree
+    """
+    prints = {}
+
+    for dir_path, dir_names, file_names in os.walk(
+        os.path.join(root, path), topdown=False, followlinks=followlinks
+    ):
+        folder = os.path.relpath(dir_path, root)
+        count = 0
+        names = []
+
+        for name in file_names:
+            try:
+                st = os.stat(os.path.join(dir_path, name))
+            except OSError:
+                continue
+            names.append(f"f/{name}/{st.st_size}/{st.st_mtime_ns}")
+            count += 1
+            if files is not None:
+                files[os.path.join(folder, name)] = st
+
+        for name in dir_names:
+            child = prints.get(os.path.join(folder, name))
+            if child is None:
+                # symlink folder not followed
+                names.append(f"l/{name}")
+            else:
+                names.append(f"d/{name}/{child[1]}")
+                count += child[0]
+
+        digest = hashlib.sha256(
+            "\0".join(sorted(names)).encode(errors="surrogateescape")
+        ).hexdigest()
+        prints[folder] = (count, digest)
+
+    return prints
+
+
+class _Held:  # pylint: disable=too-few-public-methods
+    """Iterable of the actions of held batches, each pass creates the records again"""
+
+    def __init__(self, batches: List[ActionBatch]) -> None:
+        self._batches = batches
+
+    def __iter__(self):
+        return chain.from_iterable(self._batches)
+
+
+def _is_moved(path: str, moves: Dict[str, GetActionResponse]) -> bool:
+    """Check if path is inside a folder already moved"""
+    return any(
+        parent in moves and moves[parent].action == DiffActionsEnum.MOVE_FOLDER
+        for parent in _parents(path)
+    )
+
+
+def _parents(path: str, include_self: bool = False) -> List[str]:
+    """Return the parent folders of a path, up to the first level"""
+    parents = [path] if include_self else []
+    path = os.path.dirname(path)
+
+    while path:
+        parents.append(path)
+        path = os.path.dirname(path)
+
+    return parents
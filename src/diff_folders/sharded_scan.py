@@ -0,0 +1,175 @@
+"""
+This module splits the scan of the folders tree in work units scanned and diffed by
+a pool of processes, using more than one core on the comparison of large trees.
+
+a unit is a sub folder of source at the shard depth, scanned with its sub folders
+by a worker process, which returns the actions as batches of each folder and the
+folders left when the unit scanned too many folders. The coordinator and the
+workers only exchange scan targets and action batches, both compact and without
+references to the state of a process
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
+from typing import Deque, Generator, Iterable, List, Optional, Set, Tuple
+
+from diff_folders.actions import ActionBatch, GetActionResponse, batch_actions
+from diff_folders.walk_tree import DiffResponse, DiffTree, ScanTarget, folder_depth
+from settings import (IN_FLIGHT_PER_WORKER, SHARD_UNIT_FOLDERS,
+                      FolderSettingsDataClass, SyncOptionsDataClass)
+
+# diff tree of a worker process, created once by the pool initializer
+_worker_tree: Optional["ShardedDiffTree"] = None
+
+
+class ShardedDiffTree(DiffTree):  # pylint: disable=too-few-public-methods
+    """
+    Diff tree scanning the whole tree on shard worker processes, targeted scans
+    run on the calling process. The workers have no state index, hash cache or
+    cached source folders, and hard links are detected within each unit. The
+    worker processes are started on the first scan and kept until closed
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _worker_pool(self) -> ProcessPoolExecutor:
+        """Return the pool of worker processes, started on the first call"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._options.shard_workers,
+                # forking a process with the log listener thread could copy held locks
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._folder_settings, self._options),
+            )
+
+        return self._pool
+
+    def _diff_actions(
+        self, verify: bool, targets: Optional[Iterable[ScanTarget]]
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Yield the actions of the units as they are completed, the actions of a
+        folder come before the actions of its sub folders units, which are only
+        submitted after the folder unit is completed
+        """
+        if targets is not None:
+            yield from super()._diff_actions(verify, targets)
+            return
+
+        units = deque([ScanTarget(common_root="", recursive=True)])
+        in_flight: Set[Future] = set()
+        window = self._options.shard_workers * IN_FLIGHT_PER_WORKER
+        pool = self._worker_pool()
+
+        try:
+            while units or in_flight:
+                while units and len(in_flight) < window:
+                    in_flight.add(pool.submit(_scan_unit, units.popleft()))
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    batches, split = future.result()
+                    units.extend(split)
+
+                    for batch in batches:
+                        yield from batch
+        except BrokenProcessPool:
+            # a worker process died, the next scan starts new processes
+            self.close()
+            raise
+        finally:
+            # units of a scan stopped early are not scanned, the pool is kept
+            for future in in_flight:
+                future.cancel()
+
+    def scan_unit(self, unit: ScanTarget) -> Tuple[List[ActionBatch], List[ScanTarget]]:
+        """
+        Scan and diff a unit folder with its sub folders, the sub folders at the
+        shard depth and the folders left after scanning the unit folders limit
+        are not scanned, they are returned as new units
+
+        return: batches of the unit actions and the new units
+        """
+        self._links.clear()
+        split: List[ScanTarget] = []
+        diff_scan = self._unit_scan_generator(unit, split)
+        batches = list(batch_actions(self._scan_actions(diff_scan, self._must_update)))
+
+        return batches, split
+
+    def _unit_scan_generator(
+        self, unit: ScanTarget, split: List[ScanTarget]
+    ) -> Generator[DiffResponse, None, None]:
+        """Yield the diff of each folder of the unit depth first, adding the new units to split"""
+        scan_start_ns = time.time_ns()
+        pending: Deque[ScanTarget] = deque([unit])
+        scanned = 0
+
+        while pending:
+            if scanned >= SHARD_UNIT_FOLDERS:
+                split.extend(pending)
+                return
+
+            target = pending.pop()
+            scanned += 1
+            result = self._scan_folder(target, scan_start_ns, refresh=False, use_index=False)
+            if result is None:
+                continue
+
+            listing, diff = result
+            if diff is not None:
+                yield diff
+
+            for folder in listing.folders:
+                if not self._options.symlink and folder in listing.links:
+                    continue
+
+                sub_folder = ScanTarget(
+                    common_root=sys.intern(os.path.join(target.common_root, folder)),
+                    recursive=True,
+                )
+                if folder_depth(sub_folder) == self._options.shard_depth:
+                    split.append(sub_folder)
+                else:
+                    pending.append(sub_folder)
+
+
+def _init_worker(
+    folder_settings: FolderSettingsDataClass, options: SyncOptionsDataClass
+) -> None:
+    """Create the diff tree of a worker process"""
+    global _worker_tree  # pylint: disable=global-statement
+    _worker_tree = ShardedDiffTree(folder_settings=folder_settings, options=options)
+    threading.Thread(target=_exit_with_parent, daemon=True).start()
+
+
+def _exit_with_parent() -> None:
+    """
+    Exit the worker process when the sync process dies, a killed sync process
+    does not shut down the pool and the idle workers would be left running
+    """
+    multiprocessing.connection.wait([multiprocessing.parent_process().sentinel])
+    os._exit(1)
+
+
+def _scan_unit(unit: ScanTarget) -> Tuple[List[ActionBatch], List[ScanTarget]]:
+    """Scan a unit on a worker process"""
+    return _worker_tree.scan_unit(unit)
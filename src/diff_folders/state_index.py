@@ -0,0 +1,253 @@
+"""
+This module keeps a persistent index of what was last written on destination,
+once the sync is the only writer of destination the diff can rely on this index
+instead of scanning and reading the metadata of every destination file
+"""
+
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Generator, Iterable, List, Optional, Set, Tuple
+
+# files read from the index on each page of a sorted listing
+INDEX_PAGE_SIZE = 10_000
+# version of the entries table, an index with another version is rebuilt
+INDEX_SCHEMA = "2"
+
+
+@dataclass
+class IndexRecord:
+    """Last known state of an entry written on destination"""
+    is_dir: bool
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+class SyncStateIndex:
+    """
+    SQLite index with the entries written on destination by the sync, the roots
+    and names are stored as the bytes of the file system names, so names that are
+    not valid UTF-8 are kept too, and are sorted by those bytes
+    """
+
+    def __init__(self, index_path: str, destination: str) -> None:
+        """
+        Open (or create) the index file, an index built for another destination
+        is discarded to force a full verification
+        """
+        self._destination = destination
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(index_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = 'schema'"
+        ).fetchone()
+        if row is None or row[0] != INDEX_SCHEMA:
+            self._connection.execute("DROP TABLE IF EXISTS entries")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema', ?)",
+                (INDEX_SCHEMA,),
+            )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "root BLOB NOT NULL, name BLOB NOT NULL, is_dir INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL, "
+            "PRIMARY KEY (root, name)) WITHOUT ROWID"
+        )
+
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = 'destination'"
+        ).fetchone()
+        if row is None or row[0] != str(destination):
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('destination', ?)",
+                (str(destination),),
+            )
+        self._connection.commit()
+
+    def is_empty(self) -> bool:
+        """Check if the index has no entries, which means a full scan is required"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM entries LIMIT 1"
+            ).fetchone() is None
+
+    def list_folder(
+        self, common_root: str, files: bool = True
+    ) -> Tuple[Set[str], Set[str]]:
+        """
+        Return the folders and files recorded inside a destination folder
+
+        files: list the files too, otherwise only the folders are listed and the
+        files can be read in sorted order by sorted_files
+        """
+        folders, file_names = set(), set()
+        query = "SELECT name, is_dir FROM entries WHERE root = ?"
+        if not files:
+            query += " AND is_dir = 1"
+
+        with self._lock:
+            rows = self._connection.execute(query, (os.fsencode(common_root),)).fetchall()
+
+        for name, is_dir in rows:
+            if is_dir:
+                folders.add(os.fsdecode(name))
+            else:
+                file_names.add(os.fsdecode(name))
+
+        return folders, file_names
+
+    def sorted_files(self, common_root: str) -> Iterable[str]:
+        """
+        Return the files recorded inside a destination folder, read in the order
+        of the encoded names
+        """
+        return _SortedFiles(self, common_root)
+
+    def files_page(self, common_root: str, after: Optional[str]) -> List[str]:
+        """Return the next page of files of a folder sorted by encoded name, after a name"""
+        query = "SELECT name FROM entries WHERE root = ? AND is_dir = 0"
+        params = [os.fsencode(common_root)]
+        if after is not None:
+            query += " AND name > ?"
+            params.append(os.fsencode(after))
+
+        with self._lock:
+            rows = self._connection.execute(
+                query + " ORDER BY name LIMIT ?", (*params, INDEX_PAGE_SIZE)
+            ).fetchall()
+
+        return [os.fsdecode(row[0]) for row in rows]
+
+    def get(self, common_root: str, name: str) -> Optional[IndexRecord]:
+        """Return the recorded state of a destination entry"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT is_dir, size, mtime_ns, inode FROM entries "
+                "WHERE root = ? AND name = ?",
+                (os.fsencode(common_root), os.fsencode(name)),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return IndexRecord(is_dir=bool(row[0]), size=row[1], mtime_ns=row[2], inode=row[3])
+
+    def record(self, path: str) -> None:
+        """Record the current state of a destination path just written by the sync"""
+        destination_path = os.path.join(self._destination, path)
+        root, name = os.path.split(os.fsencode(os.path.normpath(path)))
+        st = os.stat(destination_path)
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    root, name, int(os.path.isdir(destination_path)),
+                    st.st_size, st.st_mtime_ns, st.st_ino
+                ),
+            )
+
+    def forget(self, path: str) -> None:
+        """Remove a destination path and everything recorded below it"""
+        path = os.fsencode(os.path.normpath(path))
+        root, name = os.path.split(path)
+
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM entries WHERE root = ? AND name = ?", (root, name)
+            )
+            # "0" is the character after "/", the range selects all sub folders
+            self._connection.execute(
+                "DELETE FROM entries WHERE root = ? OR (root >= ? AND root < ?)",
+                (path, path + b"/", path + b"0"),
+            )
+
+    def move(self, origin: str, path: str) -> None:
+        """Move the entries recorded on origin and below it to path"""
+        recorded_path = path
+        origin = os.fsencode(os.path.normpath(origin))
+        path = os.fsencode(os.path.normpath(path))
+        origin_root, origin_name = os.path.split(origin)
+        root, name = os.path.split(path)
+
+        with self._lock:
+            self._connection.execute(
+                "UPDATE OR REPLACE entries SET root = ?, name = ? WHERE root = ? AND name = ?",
+                (root, name, origin_root, origin_name),
+            )
+            # the sub folders keep the part of the root after origin, the bytes
+            # concatenated as text are cast back to a blob unchanged
+            self._connection.execute(
+                "UPDATE OR REPLACE entries SET root = CAST(? || substr(root, ?) AS BLOB) "
+                "WHERE root = ? OR (root >= ? AND root < ?)",
+                (path, len(origin) + 1, origin, origin + b"/", origin + b"0"),
+            )
+
+        self.record(recorded_path)
+
+    def rebuild(self) -> None:
+        """Replace all entries with the current state of destination"""
+        with self._lock:
+            self._connection.execute("DELETE FROM entries")
+
+            for dest_root, dest_folders, dest_files in os.walk(self._destination):
+                common_root = os.path.relpath(dest_root, self._destination)
+                common_root = b"" if common_root == "." else os.fsencode(common_root)
+
+                rows = []
+                for names, is_dir in ((dest_folders, 1), (dest_files, 0)):
+                    for name in names:
+                        st = os.stat(os.path.join(dest_root, name))
+                        rows.append(
+                            (
+                                common_root, os.fsencode(name), is_dir,
+                                st.st_size, st.st_mtime_ns, st.st_ino
+                            )
+                        )
+
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+
+            self._connection.commit()
+
+    def commit(self) -> None:
+        """Persist the pending changes of the index"""
+        with self._lock:
+            self._connection.commit()
+
+    def close(self) -> None:
+        """Persist pending changes and close the index file"""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
+
+
+class _SortedFiles:  # pylint: disable=too-few-public-methods
+    """
+    Files of a folder recorded on the index in sorted order, read by pages so the
+    listing is not held in memory, each iteration reads the index again
+    """
+
+    def __init__(self, index: SyncStateIndex, common_root: str) -> None:
+        self._index = index
+        self._common_root = common_root
+
+    def __iter__(self) -> Generator[str, None, None]:
+        after = None
+
+        while True:
+            page = self._index.files_page(self._common_root, after)
+            yield from page
+
+            if len(page) < INDEX_PAGE_SIZE:
+                return
+            after = page[-1]
@@ -3,32 +3,56 @@ This module will walk through a source folder tree in order to get the
 differences from destination, with the control level of how deep will be the diff
 """
 
-import hashlib
 import os
-from dataclasses import dataclass
-from typing import Generator, List, Optional
-
-from settings import BUF_SIZE, DiffActionsEnum, FolderSettingsDataClass
-
-
-@dataclass
+import sys
+import time
+from collections import deque
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from dataclasses import dataclass, field
+from typing import (Callable, Deque, Dict, Generator, Iterable, List, Optional,
+                    Set, Tuple)
+
+from diff_folders.actions import GetActionResponse
+from diff_folders.content_compare import (extents_differ, samples_differ,
+                                          stream_differ)
+from diff_folders.dir_cache import CachedFolder, SourceDirCache
+from diff_folders.hash_cache import HashCache
+from diff_folders.hashing import file_digest, new_hasher
+from diff_folders.merge_join import SortedNames, merge_join
+from diff_folders.moves import MoveDetector
+from diff_folders.state_index import SyncStateIndex
+from file_system.sparse import is_sparse
+from settings import (DIR_MTIME_RACY_NS, IN_FLIGHT_PER_WORKER,
+                      MERGE_JOIN_MIN_FILES, SORT_RUN_SIZE, DiffActionsEnum,
+                      FolderSettingsDataClass, ScanModeEnum,
+                      SyncOptionsDataClass)
+from utils.memory_profile import MemoryProfiler
+from utils.metrics import SyncMetrics
+
+
+@dataclass(slots=True)
 class BaseStructure:
     """Base structure for holde tree folders information"""
     folders: List[str]
     files: List[str]
+    # DirEntry of files from the scan, empty when listed from a cache or index
+    entries: Dict[str, os.DirEntry] = field(default_factory=dict)
+    # files in sorted order of a folder diffed by merge join, files is empty
+    sorted_files: Optional[Iterable[str]] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class SourceStructure(BaseStructure):
     """Structure of source"""
 
 
-@dataclass
+@dataclass(slots=True)
 class DestinationStructure(BaseStructure):
     """Structure of destination"""
 
 
-@dataclass
+@dataclass(slots=True)
 class DiffResponse:
     """Data response of diff between source and destination"""
     common_root: str
@@ -36,32 +60,64 @@ class DiffResponse:
     destination: DestinationStructure
 
 
-@dataclass
-class GetActionResponse:
-    """Data response with required action to keep destination synced"""
+@dataclass(slots=True)
+class FolderListing:
+    """Folders, files and symlink folders names of a folder with the files DirEntry"""
+    folders: Set[str]
+    files: Set[str]
+    links: Set[str]
+    entries: Dict[str, os.DirEntry] = field(default_factory=dict)
+    # files of a folder with more files than the merge join min, files is empty
+    sorted_files: Optional[Iterable[str]] = None
+
+
+@dataclass(slots=True)
+class ScanTarget:
+    """Folder to scan on a targeted sync, with or without its sub folders"""
     common_root: str
-    name: str
-    action: DiffActionsEnum
+    recursive: bool = False
 
 
-class DiffTree:  # pylint: disable=too-few-public-methods
+class DiffTree:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
     """Scan folders tree to identify the differences and required sync actions"""
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         folder_settings: FolderSettingsDataClass,
-        sha256: bool = False,
-        symlink: bool = False,
+        options: Optional[SyncOptionsDataClass] = None,
+        state_index: Optional[SyncStateIndex] = None,
+        hash_cache: Optional[HashCache] = None,
+        metrics: Optional[SyncMetrics] = None,
+        profiler: Optional[MemoryProfiler] = None,
     ) -> None:
         """
         Settings of source and destination and strategy of diff files
-        (sha256 or file size + last modified date)
+        (content hash or file size + last modified date)
+
+        when a state index is given the destination is read from the index instead
+        of the file system, unless a verification scan is requested, and when a
+        hash cache is given the digest of not modified files is not computed again.
+        With metrics the latency of each folder scan and file compare is recorded,
+        and with a profiler their memory
         """
         self._folder_settings = folder_settings
-        self._must_update = self._is_diff_sha256 if sha256 else self._is_diff_size_mtime
-        self._symlink = symlink
-
-    def get_actions(self) -> Optional[Generator[GetActionResponse, None, None]]:
+        self._options = options or SyncOptionsDataClass()
+        self._must_update = (
+            self._is_diff_sha256 if self._options.sha256 else self._is_diff_size_mtime
+        )
+        self._state_index = state_index
+        self._hash_cache = hash_cache
+        self._metrics = metrics
+        self._profiler = profiler
+        self._dir_cache = None
+        if self._options.scan_mode != ScanModeEnum.FULL:
+            self._dir_cache = SourceDirCache()
+        # first path seen on the scan of each source inode with many hard links
+        self._links: Dict[Tuple[int, int], str] = {}
+
+    def get_actions(
+        self, verify: bool = False, targets: Optional[Iterable[ScanTarget]] = None
+    ) -> Optional[Generator[GetActionResponse, None, None]]:
         """
         Method to get actions create, delete or update doing a diff between
         source and destination.
@@ -69,83 +125,629 @@ class DiffTree:  # pylint: disable=too-few-public-methods
         comparing the filename combined with filesize plus last modified date, the
         objective is identify if update action is required without opening and reading
         all files
+
+        verify: ignore the state index and the cached source folders, scanning both
+        source and destination file system
+        targets: scan only the given folders instead of all folders tree
+
+        when move detection is enabled the create and delete actions are yielded
+        after the scan, with the moved entries as move actions
         """
-        diff_scan = self._scan_tree_generator()
+        actions = self._diff_actions(verify, targets)
 
-        for diff in diff_scan:
-            files_create = diff.source.files - diff.destination.files
-            for file_create in files_create:
-                yield GetActionResponse(
-                   common_root=diff.common_root,
-                   name=file_create,
-                   action=DiffActionsEnum.CREATE_FILE,
-                )
+        if not self._options.detect_moves:
+            yield from actions
+            return
 
-            files_delete = diff.destination.files - diff.source.files
-            for file_delete in files_delete:
-                yield GetActionResponse(
-                   common_root=diff.common_root,
-                   name=file_delete,
-                   action=DiffActionsEnum.DELETE_FILE,
-                )
+        same_content = self._same_content if self._options.sha256 else None
+        detector = MoveDetector(
+            self._folder_settings, symlink=self._options.symlink, same_content=same_content
+        )
+        yield from detector.detect(actions)
+
+    def _diff_actions(
+        self, verify: bool, targets: Optional[Iterable[ScanTarget]]
+    ) -> Generator[GetActionResponse, None, None]:
+        """Yield the actions of each folder diff as the folders tree is scanned"""
+        self._links.clear()
+        use_index = self._state_index is not None and not verify
+        diff_scan = self._scan_tree_generator(
+            use_index=use_index, verify=verify, targets=targets
+        )
+        must_update = self._must_update
+
+        if use_index and not self._options.sha256:
+            must_update = self._is_diff_index
+
+        if self._metrics is not None:
+            must_update = self._metrics.timed("compare", must_update)
+        if self._profiler is not None:
+            must_update = self._profiler.profiled("compare", must_update)
+
+        yield from self._scan_actions(diff_scan, must_update)
+
+    def _scan_actions(
+        self, diff_scan: Iterable[DiffResponse], must_update: Callable[..., bool]
+    ) -> Generator[GetActionResponse, None, None]:
+        """Yield the actions of each folder diff, checking the updates on hash workers"""
+        if not self._options.sha256 or self._options.hash_workers <= 1:
+            for diff in diff_scan:
+                yield from self._get_diff_actions(diff, must_update)
+            return
+
+        # sha256 comparisons run on a thread pool, hashlib releases the GIL while
+        # hashing, and update actions are yielded as the comparisons complete
+        with ThreadPoolExecutor(max_workers=self._options.hash_workers) as pool:
+            pending = set()
+
+            for diff in diff_scan:
+                yield from self._get_diff_actions(diff, must_update, pool, pending)
+
+            while pending:
+                yield from self._completed_checks(pending)
 
-            files_check = diff.source.files - files_create
+    def _get_diff_actions(
+        self,
+        diff: DiffResponse,
+        must_update: Callable[..., bool],
+        pool: Optional[ThreadPoolExecutor] = None,
+        pending: Optional[Set[Future]] = None,
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Method to get the actions required to sync a single folder, the folders
+        deleted come first since a file of source can have the name of a folder
+        of destination, and the files deleted come before the folders created
+
+        pool: submit the update checks to the pool adding the futures to pending,
+        instead of checking the files one by one
+        """
+        for folder_delete in diff.destination.folders - diff.source.folders:
+            yield GetActionResponse(
+               common_root=diff.common_root,
+               name=folder_delete,
+               action=DiffActionsEnum.DELETE_FOLDER,
+            )
+
+        if diff.source.sorted_files is None:
+            yield from self._file_actions(diff, must_update, pool, pending)
+        else:
+            yield from self._joined_file_actions(diff, must_update, pool, pending)
+
+        for folder_create in diff.source.folders - diff.destination.folders:
+            yield GetActionResponse(
+               common_root=diff.common_root,
+               name=folder_create,
+               action=DiffActionsEnum.CREATE_FOLDER,
+            )
+
+
+    def _file_actions(
+        self,
+        diff: DiffResponse,
+        must_update: Callable[..., bool],
+        pool: Optional[ThreadPoolExecutor] = None,
+        pending: Optional[Set[Future]] = None,
+    ) -> Generator[GetActionResponse, None, None]:
+        """Get the files actions of a folder by the differences of the names sets"""
+        files_create = diff.source.files - diff.destination.files
+        files_check = diff.source.files - files_create
+
+        # names already on destination are preferred as origin of the links, and
+        # are updated before the links to them are created
+        if self._options.hard_links:
+            links = {}
             for file_check in files_check:
-                if self._must_update(
-                    common_root=diff.common_root, filename=file_check
-                ):
+                origin = self._link_origin(diff, file_check)
+                if origin is not None:
+                    links[file_check] = origin
+
+            for file_check in files_check - links.keys():
+                yield from self._update_actions(diff, file_check, must_update, pool, pending)
+            yield from self._drain_checks(pending)
+
+            for file_check, origin in links.items():
+                yield from self._relink_actions(
+                    diff, file_check, origin, must_update, pool, pending
+                )
+            yield from self._drain_checks(pending)
+            files_check = ()
+
+        for file_create in files_create:
+            yield self._create_action(diff, file_create)
+
+        for file_delete in diff.destination.files - diff.source.files:
+            yield GetActionResponse(
+               common_root=diff.common_root,
+               name=file_delete,
+               action=DiffActionsEnum.DELETE_FILE,
+            )
+
+        for file_check in files_check:
+            yield from self._update_actions(diff, file_check, must_update, pool, pending)
+
+    def _joined_file_actions(
+        self,
+        diff: DiffResponse,
+        must_update: Callable[..., bool],
+        pool: Optional[ThreadPoolExecutor] = None,
+        pending: Optional[Set[Future]] = None,
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Get the files actions of a folder merge joining the sorted source and
+        destination files, the actions are yielded in the files order
+        """
+        try:
+            # with hard links the files on both sides are checked on a first pass,
+            # the link origins are updated before the links to them are created
+            if self._options.hard_links:
+                yield from self._joined_check_actions(diff, must_update, pool, pending)
+
+            for filename, on_source, on_destination in merge_join(
+                diff.source.sorted_files, diff.destination.sorted_files
+            ):
+                if not on_destination:
+                    yield self._create_action(diff, filename)
+                elif not on_source:
                     yield GetActionResponse(
                        common_root=diff.common_root,
-                       name=file_check,
-                       action=DiffActionsEnum.UPDATE_FILE,
+                       name=filename,
+                       action=DiffActionsEnum.DELETE_FILE,
+                    )
+                elif not self._options.hard_links:
+                    yield from self._update_actions(
+                        diff, filename, must_update, pool, pending
                     )
+        finally:
+            for sorted_files in (diff.source.sorted_files, diff.destination.sorted_files):
+                if isinstance(sorted_files, SortedNames):
+                    sorted_files.close()
 
-            folders_create = diff.source.folders - diff.destination.folders
-            for folder_create in folders_create:
-                yield GetActionResponse(
-                   common_root=diff.common_root,
-                   name=folder_create,
-                   action=DiffActionsEnum.CREATE_FOLDER,
-                )
+    def _joined_check_actions(
+        self,
+        diff: DiffResponse,
+        must_update: Callable[..., bool],
+        pool: Optional[ThreadPoolExecutor] = None,
+        pending: Optional[Set[Future]] = None,
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Check the files on both sides of a merge joined folder, the files that are
+        links origins are checked before the links to them
+        """
+        links = {}
+        for filename, on_source, on_destination in merge_join(
+            diff.source.sorted_files, diff.destination.sorted_files
+        ):
+            if not (on_source and on_destination):
+                continue
+
+            origin = self._link_origin(diff, filename)
+            if origin is None:
+                yield from self._update_actions(diff, filename, must_update, pool, pending)
+            else:
+                links[filename] = origin
+        yield from self._drain_checks(pending)
+
+        for filename, origin in links.items():
+            yield from self._relink_actions(diff, filename, origin, must_update, pool, pending)
+        yield from self._drain_checks(pending)
+
+    def _create_action(self, diff: DiffResponse, filename: str) -> GetActionResponse:
+        """Return the action of a file missing on destination, a link or a copy"""
+        origin = self._link_origin(diff, filename)
+
+        if origin is not None:
+            return GetActionResponse(
+               common_root=diff.common_root,
+               name=filename,
+               action=DiffActionsEnum.LINK_FILE,
+               origin=origin,
+            )
+
+        return GetActionResponse(
+           common_root=diff.common_root,
+           name=filename,
+           action=DiffActionsEnum.CREATE_FILE,
+        )
 
-            folders_delete = diff.destination.folders - diff.source.folders
-            for folder_delete in folders_delete:
-                yield GetActionResponse(
-                   common_root=diff.common_root,
-                   name=folder_delete,
-                   action=DiffActionsEnum.DELETE_FOLDER,
+    def _update_actions(  # pylint: disable=too-many-arguments
+        self,
+        diff: DiffResponse,
+        filename: str,
+        must_update: Callable[..., bool],
+        pool: Optional[ThreadPoolExecutor] = None,
+        pending: Optional[Set[Future]] = None,
+        origin: Optional[str] = None,
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Check a file on source and destination, submitting the check to the pool
+        and yielding the completed checks when the pool is full
+
+        origin: link origin of the file, a changed file is linked to the origin
+        instead of updated
+        """
+        source_entry = diff.source.entries.get(filename)
+        destination_entry = diff.destination.entries.get(filename)
+
+        if pool is not None:
+            pending.add(
+                pool.submit(
+                    self._check_update,
+                    must_update,
+                    (diff.common_root, filename, origin),
+                    (source_entry, destination_entry),
                 )
+            )
+            if len(pending) >= self._options.hash_workers * IN_FLIGHT_PER_WORKER:
+                yield from self._completed_checks(pending)
+        elif must_update(
+            common_root=diff.common_root,
+            filename=filename,
+            source_entry=source_entry,
+            destination_entry=destination_entry,
+        ):
+            yield _changed_file_action(diff.common_root, filename, origin)
+
+    def _relink_actions(  # pylint: disable=too-many-arguments
+        self,
+        diff: DiffResponse,
+        filename: str,
+        origin: str,
+        must_update: Callable[..., bool],
+        pool: Optional[ThreadPoolExecutor] = None,
+        pending: Optional[Set[Future]] = None,
+    ) -> Generator[GetActionResponse, None, None]:
+        """
+        Check a file on both sides that is a hard link to an origin on source, the
+        file is linked again to the origin when it is another file on destination,
+        or when it changed, since the update of the origin replaces the origin file
+        """
+        try:
+            st = entry_stat(
+                diff.destination.entries.get(filename),
+                self._folder_settings.destination,
+                diff.common_root,
+                filename,
+            )
+            origin_st = os.stat(os.path.join(self._folder_settings.destination, origin))
+            linked = (st.st_dev, st.st_ino) == (origin_st.st_dev, origin_st.st_ino)
+        except OSError:
+            linked = False
+
+        if linked:
+            yield from self._update_actions(
+                diff, filename, must_update, pool, pending, origin=origin
+            )
+        else:
+            yield _changed_file_action(diff.common_root, filename, origin)
+
+    def _link_origin(self, diff: DiffResponse, filename: str) -> Optional[str]:
+        """
+        Return the path of the first name seen on the scan of a source file with
+        many hard links, recording the path when it is the first name
+        """
+        if not self._options.hard_links:
+            return None
+
+        try:
+            st = entry_stat(
+                diff.source.entries.get(filename),
+                self._folder_settings.source,
+                diff.common_root,
+                filename,
+            )
+        except OSError:
+            return None
 
+        if st.st_nlink <= 1:
+            return None
 
-    def _scan_tree_generator(self) -> Generator[DiffResponse, None, None]:
-        """Method that will get differences by file and folder name
-        between source and destination, scanning all levels folders tree"""
+        path = os.path.join(diff.common_root, filename)
+        origin = self._links.setdefault((st.st_dev, st.st_ino), path)
+
+        return None if origin == path else origin
+
+    @staticmethod
+    def _check_update(
+        must_update: Callable[..., bool],
+        file: Tuple[str, str, Optional[str]],
+        entries: Tuple[Optional[os.DirEntry], Optional[os.DirEntry]],
+    ) -> Optional[GetActionResponse]:
+        """
+        Return the update action of a file when it must be updated
 
-        for src_root, src_folders, src_files in os.walk(
-            self._folder_settings.source, followlinks=self._symlink
+        file: common root, name and link origin of the file
+        """
+        common_root, filename, origin = file
+        if not must_update(
+            common_root=common_root,
+            filename=filename,
+            source_entry=entries[0],
+            destination_entry=entries[1],
         ):
-            common_root = self._get_common_root(src_root)
-            destination_path = os.path.join(
-                self._folder_settings.destination, common_root
+            return None
+
+        return _changed_file_action(common_root, filename, origin)
+
+    @staticmethod
+    def _completed_checks(
+        pending: Set[Future]
+    ) -> Generator[GetActionResponse, None, None]:
+        """Wait at least one update check to complete and yield the update actions"""
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        pending.difference_update(done)
+
+        for future in done:
+            action = future.result()
+            if action is not None:
+                yield action
+
+    @classmethod
+    def _drain_checks(
+        cls, pending: Optional[Set[Future]]
+    ) -> Generator[GetActionResponse, None, None]:
+        """Wait all pending update checks and yield the update actions"""
+        while pending:
+            yield from cls._completed_checks(pending)
+
+    def _scan_tree_generator(
+        self,
+        use_index: bool = False,
+        verify: bool = False,
+        targets: Optional[Iterable[ScanTarget]] = None,
+    ) -> Generator[DiffResponse, None, None]:
+        """Method that will get differences by file and folder name
+        between source and destination, scanning all levels folders tree
+
+        on incremental scan mode a folder with the same last modified date of the
+        previous scan reuses the cached listing, and on trust-dirs mode the folder
+        is not yielded at all, only its sub folders are visited.
+
+        use_index: list destination folders from the state index
+        verify: read all source folders ignoring the cached listings
+        targets: scan only the given folders instead of all folders tree, targets
+        folders are always read, and only the recursive targets have their sub
+        folders visited
+        """
+        scan_start_ns = time.time_ns()
+        refresh = verify or targets is not None
+        seen = []
+
+        if targets is None:
+            pending = deque([ScanTarget(common_root="", recursive=True)])
+        else:
+            pending = deque(targets)
+            # the serial scan takes the last pending folder, the targets are
+            # reversed to be scanned in the given order, parents first
+            if self._options.scan_workers <= 1:
+                pending.reverse()
+
+        def scan_folder(target: ScanTarget):
+            return self._scan_folder(target, scan_start_ns, refresh, use_index)
+
+        if self._metrics is not None:
+            scan_folder = self._metrics.timed("scan", scan_folder)
+        if self._profiler is not None:
+            scan_folder = self._profiler.profiled("scan", scan_folder, depth=folder_depth)
+
+        for target, scanned in self._scan_folders(pending, scan_folder):
+            if scanned is None:
+                continue
+
+            listing, diff = scanned
+            seen.append(target.common_root)
+
+            if diff is not None:
+                yield diff
+
+            # sub folders are queued only after the actions of the folder
+            if target.recursive:
+                pending.extend(
+                    ScanTarget(
+                        # the folder path is shared by all actions of the folder
+                        common_root=sys.intern(os.path.join(target.common_root, folder)),
+                        recursive=True,
+                    )
+                    for folder in listing.folders
+                    if self._options.symlink or folder not in listing.links
+                )
+
+        if self._dir_cache is not None and targets is None:
+            self._dir_cache.retain(seen)
+
+    def _scan_folders(
+        self,
+        pending: Deque[ScanTarget],
+        scan_folder: Callable[[ScanTarget], Optional[Tuple[FolderListing, DiffResponse]]],
+    ) -> Generator[Tuple[ScanTarget, Optional[Tuple[FolderListing, DiffResponse]]], None, None]:
+        """
+        Yield each pending folder with the result of scan_folder, the caller adds
+        the sub folders to pending while iterating.
+
+        a serial scan goes depth first, with scan workers the next pending folders
+        are listed concurrently on a thread pool, breadth first
+        """
+        if self._options.scan_workers <= 1:
+            while pending:
+                target = pending.pop()
+                yield target, scan_folder(target)
+            return
+
+        window = self._options.scan_workers * IN_FLIGHT_PER_WORKER
+
+        with ThreadPoolExecutor(max_workers=self._options.scan_workers) as pool:
+            in_flight = deque()
+
+            while pending or in_flight:
+                while pending and len(in_flight) < window:
+                    target = pending.popleft()
+                    in_flight.append((target, pool.submit(scan_folder, target)))
+
+                target, future = in_flight.popleft()
+                yield target, future.result()
+
+    def _scan_folder(
+        self, target: ScanTarget, scan_start_ns: int, refresh: bool, use_index: bool
+    ) -> Optional[Tuple[FolderListing, Optional[DiffResponse]]]:
+        """
+        List a source folder and the same folder on destination, returning the
+        source listing and the diff response.
+
+        the diff response is None when the folder is trusted as not modified, and
+        None is returned when the source folder can not be read
+        """
+        try:
+            src_listing, unchanged = self._list_source(
+                target.common_root, scan_start_ns, refresh
             )
+        except OSError:
+            return None
+
+        if unchanged and self._options.scan_mode == ScanModeEnum.TRUST_DIRS:
+            return src_listing, None
+
+        dest_listing = self._list_destination(
+            target.common_root, use_index, sorted_files=src_listing.sorted_files is not None
+        )
+
+        source = SourceStructure(
+            folders=src_listing.folders,
+            files=src_listing.files,
+            entries=src_listing.entries,
+        )
+        destination = DestinationStructure(
+            folders=dest_listing.folders,
+            files=dest_listing.files,
+            entries=dest_listing.entries,
+        )
+
+        # a side too large is merge joined, the other side is sorted in memory
+        if src_listing.sorted_files is not None or dest_listing.sorted_files is not None:
+            for structure, listing in ((source, src_listing), (destination, dest_listing)):
+                structure.sorted_files = listing.sorted_files
+                if listing.sorted_files is None:
+                    structure.sorted_files = sorted(listing.files, key=os.fsencode)
+                    structure.files = set()
 
-            destination_walk = os.walk(destination_path)
+        diff = DiffResponse(
+            common_root=target.common_root, source=source, destination=destination
+        )
+
+        return src_listing, diff
 
-            try:
-                _, dest_folders, dest_files = next(destination_walk)
-            except StopIteration:
-                dest_folders, dest_files = [], []
+    def _list_destination(
+        self, common_root: str, use_index: bool, sorted_files: bool = False
+    ) -> FolderListing:
+        """
+        Return the listing of a destination folder, from the state index or scan
 
-            source = SourceStructure(folders=set(src_folders), files=set(src_files))
-            destination = DestinationStructure(
-                folders=set(dest_folders), files=set(dest_files)
+        sorted_files: the files recorded on the state index are read in sorted
+        order while diffed instead of listed
+        """
+        if use_index and sorted_files:
+            dest_folders, _ = self._state_index.list_folder(common_root, files=False)
+            return FolderListing(
+                folders=dest_folders,
+                files=set(),
+                links=set(),
+                sorted_files=self._state_index.sorted_files(common_root),
             )
 
-            yield DiffResponse(
-                common_root=common_root, source=source, destination=destination
+        if use_index:
+            dest_folders, dest_files = self._state_index.list_folder(common_root)
+            return FolderListing(folders=dest_folders, files=dest_files, links=set())
+
+        destination_path = os.path.join(self._folder_settings.destination, common_root)
+
+        try:
+            return self._read_folder(destination_path)
+        except OSError:
+            return FolderListing(folders=set(), files=set(), links=set())
+
+    def _list_source(
+        self, common_root: str, scan_start_ns: int, refresh: bool
+    ) -> Tuple[FolderListing, bool]:
+        """
+        Return the listing of a source folder and if the listing came from the
+        cache of the previous scan
+
+        refresh: read the folder even when the cached listing is still valid
+        """
+        src_root = os.path.join(self._folder_settings.source, common_root)
+
+        if self._dir_cache is None:
+            return self._read_folder(src_root), False
+
+        mtime_ns = os.stat(src_root).st_mtime_ns
+        cached = None if refresh else self._dir_cache.get(common_root, mtime_ns)
+
+        if cached is not None:
+            listing = FolderListing(
+                folders=cached.folders, files=cached.files, links=cached.links
             )
+            return listing, True
+
+        listing = self._read_folder(src_root)
+
+        # the files of a folder diffed by merge join are not held in memory
+        if mtime_ns < scan_start_ns - DIR_MTIME_RACY_NS and listing.sorted_files is None:
+            self._dir_cache.stage(
+                common_root,
+                CachedFolder(
+                    mtime_ns=mtime_ns,
+                    folders=frozenset(listing.folders),
+                    files=frozenset(listing.files),
+                    links=frozenset(listing.links),
+                ),
+            )
+        else:
+            self._dir_cache.discard(common_root)
+
+        return listing, False
 
-    def _is_diff_size_mtime(self, common_root: str, filename:str) -> bool:
+    @staticmethod
+    def _read_folder(path: str) -> FolderListing:
+        """
+        Read the folders, files and symlink folders names of a folder, keeping the
+        DirEntry of files to reuse its cached stat on the comparison
+
+        when the folder has more files than the merge join min, the files are moved
+        to sorted names spilled to disk and the DirEntry are not kept
+        """
+        listing = FolderListing(folders=set(), files=set(), links=set())
+
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    listing.folders.add(entry.name)
+                    if entry.is_symlink():
+                        listing.links.add(entry.name)
+                elif listing.sorted_files is not None:
+                    listing.sorted_files.add(entry.name)
+                else:
+                    listing.files.add(entry.name)
+                    listing.entries[entry.name] = entry
+
+                    if len(listing.files) > MERGE_JOIN_MIN_FILES:
+                        listing.sorted_files = SortedNames(SORT_RUN_SIZE)
+                        for name in listing.files:
+                            listing.sorted_files.add(name)
+                        listing.files = set()
+                        listing.entries = {}
+
+        return listing
+
+    def _is_diff_size_mtime(
+        self,
+        common_root: str,
+        filename: str,
+        source_entry: Optional[os.DirEntry] = None,
+        destination_entry: Optional[os.DirEntry] = None,
+    ) -> bool:
         """
         This method will compare file from source and destination checking by filesize
         and last modified date in order to evaluate if the file need to be updated
@@ -156,53 +758,204 @@ class DiffTree:  # pylint: disable=too-few-public-methods
 
         return: True if the file should be update and false if the file is synced
         """
-        source_file_path = os.path.join(
-            self._folder_settings.source, common_root, filename
+        src_st = entry_stat(
+            source_entry, self._folder_settings.source, common_root, filename
         )
-        destination_file_path = os.path.join(
-            self._folder_settings.destination, common_root, filename
+        dest_st = entry_stat(
+            destination_entry, self._folder_settings.destination, common_root, filename
         )
 
-        src_st = os.stat(source_file_path)
-        dest_st = os.stat(destination_file_path)
-
         return src_st.st_size != dest_st.st_size or src_st.st_mtime != dest_st.st_mtime
 
+    def _is_diff_index(
+        self,
+        common_root: str,
+        filename: str,
+        source_entry: Optional[os.DirEntry] = None,
+        destination_entry: Optional[os.DirEntry] = None,  # pylint: disable=unused-argument
+    ) -> bool:
+        """
+        This method will compare file from source with the state recorded on the
+        index when the file was written on destination, by filesize and last
+        modified date, without reading anything from destination
+
+        return: True if the file should be update and false if the file is synced
+        """
+        record = self._state_index.get(common_root, filename)
+
+        if record is None or record.is_dir:
+            return True
+
+        src_st = entry_stat(
+            source_entry, self._folder_settings.source, common_root, filename
+        )
+
+        return src_st.st_size != record.size or src_st.st_mtime_ns != record.mtime_ns
 
-    def _is_diff_sha256(self, common_root: str, filename:str) -> bool:
+    def _is_diff_sha256(
+        self,
+        common_root: str,
+        filename: str,
+        source_entry: Optional[os.DirEntry] = None,
+        destination_entry: Optional[os.DirEntry] = None,
+    ) -> bool:
         """
-        This method will compare both files reading all content and generating
-        his sha256 in order to check if the file have the same content
+        This method will compare both files content in tiers, stopping on the first
+        tier that finds a difference: the size, the cached digests of both files,
+        the head, middle and tail samples and then the whole content read in
+        lock-step, or the data extents when both files are sparse. Each file is
+        read at most once
 
         return: True if the file should be update and false if the file is synced
         """
+        src_path = os.path.join(self._folder_settings.source, common_root, filename)
+        dest_path = os.path.join(self._folder_settings.destination, common_root, filename)
+        src_st = entry_stat(source_entry, src_path)
+        dest_st = entry_stat(destination_entry, dest_path)
+
+        if src_st.st_size != dest_st.st_size:
+            return True
+
+        src_digest = dest_digest = None
+        if self._hash_cache is not None:
+            src_digest = self._hash_cache.get(src_st)
+            dest_digest = self._hash_cache.get(dest_st)
+
+            if src_digest is not None and dest_digest is not None:
+                return src_digest != dest_digest
+
+        with open(src_path, "rb", buffering=0) as fsrc, \
+                open(dest_path, "rb", buffering=0) as fdst:
+            if samples_differ(fsrc.fileno(), fdst.fileno(), src_st.st_size):
+                return True
+
+            # with one digest cached, hashing the other file reads a single file
+            if src_digest is not None:
+                return src_digest != self.file_hash(dest_path, dest_st)
+            if dest_digest is not None:
+                return dest_digest != self.file_hash(src_path, src_st)
+
+            return self._stream_differ(fsrc, fdst, src_st, dest_st)
+
+    def _stream_differ(
+        self, fsrc, fdst, src_st: os.stat_result, dest_st: os.stat_result
+    ) -> bool:
+        """
+        Compare both files in lock-step, only the data extents when both files are
+        sparse. When the hash cache is enabled and the whole content is equal the
+        digest computed on the way is cached for both
+        """
+        sparse = is_sparse(src_st) and is_sparse(dest_st)
 
-        def file_hash(file):
-            sha256 = hashlib.sha256()
-            with open(file, 'rb') as f:
-                while True:
-                    data = f.read(BUF_SIZE)
+        def differ(hasher=None) -> bool:
+            if sparse:
+                return extents_differ(fsrc, fdst, src_st.st_size, hasher)
+            return stream_differ(fsrc, fdst, hasher)
 
-                    if not data:
-                        break
+        if self._hash_cache is None:
+            return differ()
 
-                    sha256.update(data)
+        hasher = new_hasher(self._options.hash_algorithm)
+        if differ(hasher):
+            return True
 
-            return sha256.hexdigest()
+        digest = hasher.hexdigest()
+        self._hash_cache.put(src_st, digest)
+        self._hash_cache.put(dest_st, digest)
 
-        source_file_path = os.path.join(
-            self._folder_settings.source, common_root, filename
-        )
-        destination_file_path = os.path.join(
-            self._folder_settings.destination, common_root, filename
-        )
+        return False
+
+    def end_scan(self, applied: bool, failed_roots: Iterable[str] = ()) -> None:
+        """
+        Keep the source folders listing of the scan for the next scan when its
+        actions were applied, the folders with failed actions are read again
+
+        applied: the actions were applied, otherwise all listings of the scan are
+        dropped
+        failed_roots: folders of the actions that failed
+        """
+        if self._dir_cache is None:
+            return
+
+        for common_root in failed_roots:
+            self._dir_cache.discard(common_root)
 
-        return file_hash(source_file_path) != file_hash(destination_file_path)
+        if applied:
+            self._dir_cache.commit()
+        else:
+            self._dir_cache.rollback()
 
+    def close(self) -> None:
+        """Release the resources kept between scans, nothing kept by the diff tree"""
 
-    def _get_common_root(self, root):
+    def remember_copy(self, path: str) -> None:
         """
-        Remove the absolute path from source to keep the common root for both
-        source and destination
+        Store on hash cache the digest of a file just copied to destination, the
+        source digest is reused when source was not modified after the copy
         """
-        return root.replace(self._folder_settings.source, "").removeprefix("/")
+        if self._hash_cache is None or not self._options.sha256:
+            return
+
+        source_file_path = os.path.join(self._folder_settings.source, path)
+        dest_st = os.stat(os.path.join(self._folder_settings.destination, path))
+        src_st = os.stat(source_file_path)
+
+        if src_st.st_size == dest_st.st_size and src_st.st_mtime_ns == dest_st.st_mtime_ns:
+            self._hash_cache.put(dest_st, self.file_hash(source_file_path))
+
+    def _same_content(self, path: str, origin: str) -> bool:
+        """Check if a source file has the same digest of a destination file"""
+        return self.file_hash(
+            os.path.join(self._folder_settings.source, path)
+        ) == self.file_hash(os.path.join(self._folder_settings.destination, origin))
+
+    def file_hash(self, path: str, st: Optional[os.stat_result] = None) -> str:
+        """Return the digest of a file, from the hash cache when it is not modified"""
+        if self._hash_cache is None:
+            return file_digest(
+                path, self._options.hash_algorithm, self._options.hash_mmap_min_size
+            )
+
+        st = st or os.stat(path)
+        digest = self._hash_cache.get(st)
+
+        if digest is None:
+            digest = file_digest(
+                path, self._options.hash_algorithm, self._options.hash_mmap_min_size
+            )
+            self._hash_cache.put(st, digest)
+
+        return digest
+
+
+def entry_stat(entry: Optional[os.DirEntry], *paths: str) -> os.stat_result:
+    """Return the stat of a file, cached on the DirEntry from the scan when available"""
+    if entry is not None:
+        return entry.stat()
+
+    return os.stat(os.path.join(*paths))
+
+
+def _changed_file_action(
+    common_root: str, filename: str, origin: Optional[str]
+) -> GetActionResponse:
+    """Return the action of a changed file, a link to its origin or an update"""
+    if origin is not None:
+        return GetActionResponse(
+           common_root=common_root,
+           name=filename,
+           action=DiffActionsEnum.LINK_FILE,
+           origin=origin,
+        )
+
+    return GetActionResponse(
+       common_root=common_root, name=filename, action=DiffActionsEnum.UPDATE_FILE
+    )
+
+
+def folder_depth(target: ScanTarget) -> int:
+    """Return the depth of a folder on the tree, source root is depth 0"""
+    if not target.common_root:
+        return 0
+
+    return target.common_root.count(os.sep) + 1
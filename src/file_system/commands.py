@@ -4,31 +4,47 @@ File system module to manage the files and folders of source and destination
 
 import os
 import shutil
+import stat
+import threading
+from collections import Counter
 from logging import Logger
+from typing import Dict, Optional
 
 from file_system.exceptions import (BlockCreateFolderOnSource,
                                     BlockDeleteOfDestinationFolder,
-                                    BlockDeleteOnSource,
+                                    BlockDeleteOnSource, BlockLinkOnSource,
+                                    BlockMoveOnSource,
                                     DestinationPathDoesNotExist,
                                     ErrorOnCreateFolder, ErrorOnDelete,
-                                    ErrorOnDeleteFolder, FileNotFoundOnDelete,
+                                    ErrorOnDeleteFolder, ErrorOnLink, ErrorOnMove,
+                                    FileNotFoundOnDelete,
                                     FileOrDirectoryNotFound,
                                     FolderNotFoundOnDelete,
                                     SourceAndDestinationAreEquals,
                                     SourcePathDoesNotExist)
-from settings import FolderSettingsDataClass
+from file_system.copy_engine import copy_file
+from file_system.dedup import DedupStore
+from file_system.delta import delta_update
+from settings import (DELTA_BLOCK_SIZE, DELTA_MIN_SIZE, CopyMethodEnum,
+                      FolderSettingsDataClass)
 
 
-class FileSystemCommands:
+class FileSystemCommands:  # pylint: disable=too-many-instance-attributes
     """
     Class to handle file system commands
     """
 
     def __init__(
-        self, folder_settings: FolderSettingsDataClass, logger: Logger
+        self,
+        folder_settings: FolderSettingsDataClass,
+        logger: Logger,
+        delta: bool = False,
+        dedup_store: Optional[DedupStore] = None,
     ) -> None:
         """
-        Define source and destination root path and logger
+        Define source and destination root path and logger, with delta the update
+        of large files rewrites only the blocks different from source, and with a
+        dedup store the files are links to the blobs of the store
 
         :raises:
             SourcePathDoesNotExist: if source does not exist.
@@ -37,27 +53,100 @@ class FileSystemCommands:
         self._source = folder_settings.source
         self._destination = folder_settings.destination
         self._logger = logger
+        self._delta = delta
+        self._dedup_store = dedup_store
+        self._copy_methods = Counter()
+        self._copied_bytes = 0
+        self._lock = threading.Lock()
 
         self._check_root_folders()
 
 
-    def create_file(self, path: str) -> None:
+    def create_file(self, path: str) -> int:
         """
         Create a specific file from source to destination, source file and destination
         directory must exist
 
+        return: size of the file copied
+
         :raises:
             FileOrDirectoryNotFound: if file or directory is not found.
         """
         source_path = os.path.normpath(os.path.join(self._source, path))
         destination_path = os.path.normpath(os.path.join(self._destination, path))
+        self._unlink_hard_link(destination_path)
 
         try:
-            shutil.copy2(source_path, destination_path)
+            if self._dedup_store is None:
+                method = copy_file(source_path, destination_path)
+            else:
+                method = self._dedup_store.add(source_path, destination_path)
         except FileNotFoundError as err:
             self._logger.warning("Error on copy file: %s - %s", err.filename, err.strerror)
             raise FileOrDirectoryNotFound from err
 
+        return self._count_copy(method, destination_path)
+
+
+    def update_file(self, path: str) -> int:
+        """
+        Update a file on destination with the source content, large files are
+        updated in place when delta is enabled
+
+        return: size of the file updated
+
+        :raises:
+            FileOrDirectoryNotFound: if file or directory is not found.
+        """
+        source_path = os.path.normpath(os.path.join(self._source, path))
+        destination_path = os.path.normpath(os.path.join(self._destination, path))
+
+        if not self._delta or self._dedup_store is not None \
+                or not self._is_delta_candidate(source_path, destination_path):
+            return self.create_file(path)
+
+        try:
+            written = delta_update(source_path, destination_path, DELTA_BLOCK_SIZE)
+        except FileNotFoundError as err:
+            self._logger.warning("Error on update file: %s - %s", err.filename, err.strerror)
+            raise FileOrDirectoryNotFound from err
+
+        self._logger.debug("delta update of %s wrote %s bytes", path, written)
+
+        return self._count_copy(CopyMethodEnum.DELTA, destination_path)
+
+
+    def pop_copy_methods(self) -> Dict[str, int]:
+        """Return how many files were copied by each copy method, resetting the counts"""
+        with self._lock:
+            copy_methods = dict(self._copy_methods)
+            self._copy_methods.clear()
+
+        return copy_methods
+
+
+    def pop_copied_bytes(self) -> int:
+        """Return the size of the files copied, resetting the count"""
+        with self._lock:
+            copied_bytes = self._copied_bytes
+            self._copied_bytes = 0
+
+        return copied_bytes
+
+
+    def _count_copy(self, method: CopyMethodEnum, destination_path: str) -> int:
+        """Count the file copied by the copy method and return its size"""
+        try:
+            size = os.stat(destination_path).st_size
+        except OSError:
+            size = 0
+
+        with self._lock:
+            self._copy_methods[method.value] += 1
+            self._copied_bytes += size
+
+        return size
+
 
     def delete_file(self, path: str) -> None:
         """
@@ -136,6 +225,84 @@ class FileSystemCommands:
             raise ErrorOnDeleteFolder from err
 
 
+    def move(self, path: str, origin: str) -> None:
+        """
+        Move a file or folder inside destination from origin to path, keeping its
+        content instead of deleting and copying it again
+
+        :raises:
+            BlockMoveOnSource: block move to source.
+            ErrorOnMove: when a os error happen on move
+        """
+        origin_path = os.path.normpath(os.path.join(self._destination, origin))
+        destination_path = os.path.normpath(os.path.join(self._destination, path))
+
+        # Security check to block move to source
+        if destination_path.startswith(self._source):
+            raise BlockMoveOnSource
+
+        try:
+            os.rename(origin_path, destination_path)
+        except OSError as err:
+            self._logger.warning("Error on move: %s - %s.", err.filename, err.strerror)
+            raise ErrorOnMove from err
+
+
+    def link_file(self, path: str, origin: str) -> None:
+        """
+        Create a hard link on destination path to the destination origin file, the
+        same inode shared by both names on source
+
+        :raises:
+            BlockLinkOnSource: block link on source.
+            ErrorOnLink: when a os error happen on link
+        """
+        origin_path = os.path.normpath(os.path.join(self._destination, origin))
+        destination_path = os.path.normpath(os.path.join(self._destination, path))
+
+        # Security check to block link on source
+        if destination_path.startswith(self._source):
+            raise BlockLinkOnSource
+
+        try:
+            # a name linked again replaces the file it was split to
+            if os.path.lexists(destination_path):
+                os.unlink(destination_path)
+            os.link(origin_path, destination_path)
+        except OSError as err:
+            self._logger.warning("Error on link: %s - %s.", err.filename, err.strerror)
+            raise ErrorOnLink from err
+
+
+    @staticmethod
+    def _unlink_hard_link(destination_path: str) -> None:
+        """
+        Remove a destination file with other hard links before it is written, the
+        copy writes in place and would change the content of the other names
+        """
+        try:
+            if os.lstat(destination_path).st_nlink > 1:
+                os.unlink(destination_path)
+        except FileNotFoundError:
+            pass
+
+
+    @staticmethod
+    def _is_delta_candidate(source_path: str, destination_path: str) -> bool:
+        """Check if source and destination are regular files large enough for delta"""
+        try:
+            src_st = os.stat(source_path)
+            dest_st = os.lstat(destination_path)
+        except FileNotFoundError:
+            return False
+
+        return (
+            stat.S_ISREG(dest_st.st_mode)
+            and dest_st.st_nlink == 1
+            and min(src_st.st_size, dest_st.st_size) >= DELTA_MIN_SIZE
+        )
+
+
     def _check_root_folders(self):
         """
         Check settings of source and destination
@@ -0,0 +1,193 @@
+"""
+Module to copy files content with kernel side system calls (copy_file_range and
+sendfile) when available, falling back to a user space copy with a reused buffer
+"""
+
+import errno
+import os
+import shutil
+import stat
+
+from file_system.sparse import data_extents, is_sparse
+from settings import (COPY_BUFFER_MAX, COPY_BUFFER_MIN, COPY_CHUNK_MAX,
+                      COPY_CHUNK_MIN, CopyMethodEnum)
+
+# errors raised when the system call is not supported for the pair of files,
+# e.g. different file systems on old kernels or special file systems
+FALLBACK_ERRNOS = {
+    errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+    errno.EBADF, errno.EPERM,
+}
+
+
+def copy_file(source_path: str, destination_path: str) -> CopyMethodEnum:
+    """
+    Copy file content and metadata from source to destination, the same result
+    of shutil.copy2 for files. Sparse files have only the data extents copied,
+    keeping the holes on destination
+
+    return: the method used to copy the content
+
+    :raises:
+        shutil.SpecialFileError: if source is not a regular file.
+    """
+    check_regular_file(source_path, os.stat(source_path))
+
+    with open(source_path, "rb", buffering=0) as fsrc:
+        st = os.fstat(fsrc.fileno())
+
+        with open(destination_path, "wb", buffering=0) as fdst:
+            if is_sparse(st):
+                method = copy_sparse(fsrc.fileno(), fdst.fileno(), st.st_size)
+            else:
+                method = copy_content(fsrc, fdst, st.st_size)
+
+    shutil.copystat(source_path, destination_path)
+
+    return method
+
+
+def check_regular_file(path: str, st: os.stat_result) -> None:
+    """
+    Raise SpecialFileError, as shutil.copyfile does, when the file is a named pipe,
+    socket or device, opening a named pipe would block until a writer opens it
+    """
+    if not stat.S_ISREG(st.st_mode):
+        raise shutil.SpecialFileError(f"`{path}` is not a regular file")
+
+
+def copy_content(fsrc, fdst, size: int, offset: int = 0) -> CopyMethodEnum:
+    """
+    Copy the content of fsrc into fdst from the offset until the end of the file,
+    trying copy_file_range, then sendfile and then a buffered copy. A method that
+    fails in the middle of the copy is continued by the next one from the same
+    offset
+
+    return: the method that completed the copy
+    """
+    chunk = min(max(size, COPY_CHUNK_MIN), COPY_CHUNK_MAX)
+
+    if hasattr(os, "copy_file_range"):
+        try:
+            return _copy_file_range(fsrc.fileno(), fdst.fileno(), chunk, offset, size)
+        except _PartialCopy as err:
+            offset = err.offset
+
+    if hasattr(os, "sendfile"):
+        try:
+            return _sendfile(fsrc.fileno(), fdst.fileno(), chunk, offset)
+        except _PartialCopy as err:
+            offset = err.offset
+
+    buffer_size = min(max(size, COPY_BUFFER_MIN), COPY_BUFFER_MAX)
+    return _buffered_copy(fsrc, fdst, buffer_size, offset)
+
+
+def copy_sparse(src_fd: int, dst_fd: int, size: int) -> CopyMethodEnum:
+    """
+    Copy only the data extents of source at the same offsets on destination, the
+    skipped ranges and the final truncate leave holes on destination
+    """
+    buffer = None
+
+    for start, end in data_extents(src_fd, size):
+        offset = start
+
+        if hasattr(os, "copy_file_range") and buffer is None:
+            try:
+                while offset < end:
+                    copied = os.copy_file_range(src_fd, dst_fd, end - offset, offset, offset)
+                    # some file systems report an empty file instead of an error,
+                    # the rest of the extent is copied by the buffered copy
+                    if copied == 0:
+                        break
+                    offset += copied
+            except OSError as err:
+                if err.errno not in FALLBACK_ERRNOS:
+                    raise
+
+            if offset >= end:
+                continue
+
+        buffer = buffer or bytearray(COPY_BUFFER_MAX)
+        view = memoryview(buffer)
+
+        while offset < end:
+            read = os.preadv(src_fd, [view[:min(end - offset, len(buffer))]], offset)
+            if read == 0:
+                break
+            written = 0
+            while written < read:
+                written += os.pwrite(dst_fd, view[written:read], offset + written)
+            offset += read
+
+    os.ftruncate(dst_fd, size)
+
+    return CopyMethodEnum.SPARSE
+
+
+class _PartialCopy(Exception):
+    """Raise when a copy method is not supported, with the offset already copied"""
+
+    def __init__(self, offset: int) -> None:
+        super().__init__(offset)
+        self.offset = offset
+
+
+def _copy_file_range(
+    src_fd: int, dst_fd: int, chunk: int, offset: int, size: int
+) -> CopyMethodEnum:
+    """Copy inside the kernel, allowing reflinks and server side copy"""
+    start = offset
+
+    while True:
+        try:
+            copied = os.copy_file_range(src_fd, dst_fd, chunk, offset, offset)
+        except OSError as err:
+            if err.errno in FALLBACK_ERRNOS:
+                raise _PartialCopy(offset) from err
+            raise
+
+        if copied == 0:
+            # some file systems report an empty file instead of an error
+            if offset == start and size > start:
+                raise _PartialCopy(offset)
+            return CopyMethodEnum.COPY_FILE_RANGE
+
+        offset += copied
+
+
+def _sendfile(src_fd: int, dst_fd: int, chunk: int, offset: int) -> CopyMethodEnum:
+    """Copy through the kernel page cache without user space buffers"""
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+
+    while True:
+        try:
+            copied = os.sendfile(dst_fd, src_fd, offset, chunk)
+        except OSError as err:
+            if err.errno in FALLBACK_ERRNOS:
+                raise _PartialCopy(offset) from err
+            raise
+
+        if copied == 0:
+            return CopyMethodEnum.SENDFILE
+
+        offset += copied
+
+
+def _buffered_copy(fsrc, fdst, buffer_size: int, offset: int) -> CopyMethodEnum:
+    """Copy with a single reused buffer, without allocating a new one per chunk"""
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    fsrc.seek(offset)
+    fdst.seek(offset)
+
+    while True:
+        read = fsrc.readinto(buffer)
+
+        if not read:
+            return CopyMethodEnum.BUFFERED
+
+        written = 0
+        while written < read:
+            written += fdst.write(view[written:read])
@@ -0,0 +1,117 @@
+"""
+Module of the content addressed store of a deduplicated destination, each file
+content is stored once as a blob named by its digest and the destination files are
+hard links to the blobs, so the number of links of a blob is its reference count
+"""
+
+import os
+import threading
+import uuid
+from typing import Callable
+
+from file_system.copy_engine import check_regular_file, copy_file
+from file_system.exceptions import InvalidDedupStore
+from settings import CopyMethodEnum, FolderSettingsDataClass
+
+OBJECTS_FOLDER = "objects"
+TMP_FOLDER = "tmp"
+
+
+class DedupStore:
+    """Store of blobs linked by the destination files with the same content"""
+
+    def __init__(
+        self,
+        store_path: str,
+        folder_settings: FolderSettingsDataClass,
+        file_hash: Callable[..., str],
+    ) -> None:
+        """
+        Create the store folders, file_hash(path, st) returns the digest of a
+        source file
+
+        :raises:
+            InvalidDedupStore: if the store is inside source or destination or is
+            on another file system, hard links can not cross file systems.
+        """
+        self._store_path = os.path.abspath(store_path)
+        self._file_hash = file_hash
+        self._lock = threading.Lock()
+
+        destination = os.path.abspath(folder_settings.destination)
+        for root in (os.path.abspath(folder_settings.source), destination):
+            if self._store_path == root or self._store_path.startswith(root + os.sep):
+                raise InvalidDedupStore
+
+        os.makedirs(os.path.join(self._store_path, OBJECTS_FOLDER), exist_ok=True)
+        os.makedirs(os.path.join(self._store_path, TMP_FOLDER), exist_ok=True)
+
+        if os.stat(self._store_path).st_dev != os.stat(destination).st_dev:
+            raise InvalidDedupStore
+
+    def add(self, source_path: str, destination_path: str) -> CopyMethodEnum:
+        """
+        Link destination path to the blob with the source content, the content is
+        copied to a new blob only when there is no blob with the same digest
+
+        return: DEDUP when an existing blob was linked, otherwise the copy method
+
+        :raises:
+            shutil.SpecialFileError: if source is not a regular file.
+        """
+        st = os.stat(source_path)
+        check_regular_file(source_path, st)
+        blob_path = self._blob_path(self._file_hash(source_path, st))
+
+        if os.path.exists(blob_path):
+            method = CopyMethodEnum.DEDUP
+        else:
+            tmp_path = os.path.join(self._store_path, TMP_FOLDER, uuid.uuid4().hex)
+            method = copy_file(source_path, tmp_path)
+            new_st = os.stat(source_path)
+
+            # source modified while copied, the content may not match the digest
+            if (new_st.st_size, new_st.st_mtime_ns) != (st.st_size, st.st_mtime_ns):
+                os.replace(tmp_path, destination_path)
+                return method
+
+            self._store_blob(tmp_path, blob_path)
+
+        if os.path.lexists(destination_path):
+            os.unlink(destination_path)
+        os.link(blob_path, destination_path)
+
+        return method
+
+    def collect(self) -> int:
+        """
+        Remove the blobs not linked by any destination file
+
+        return: number of bytes released
+        """
+        released = 0
+
+        with os.scandir(os.path.join(self._store_path, OBJECTS_FOLDER)) as prefixes:
+            for prefix in prefixes:
+                with os.scandir(prefix.path) as blobs:
+                    for blob in blobs:
+                        st = blob.stat(follow_symlinks=False)
+                        if st.st_nlink == 1:
+                            os.unlink(blob.path)
+                            released += st.st_size
+
+        return released
+
+    def _store_blob(self, tmp_path: str, blob_path: str) -> None:
+        """Move a new blob to its place, keeping the blob stored first on a race"""
+        with self._lock:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+            if os.path.exists(blob_path):
+                os.unlink(tmp_path)
+            else:
+                os.rename(tmp_path, blob_path)
+
+    def _blob_path(self, digest: str) -> str:
+        """Return the path of a blob, grouped in folders by the digest prefix"""
+        return os.path.join(self._store_path, OBJECTS_FOLDER, digest[:2], digest)
@@ -0,0 +1,69 @@
+"""
+Module to update a destination file in place, writing only the blocks that are
+different from source instead of rewriting all the file content
+"""
+
+import os
+import shutil
+
+from file_system.copy_engine import copy_content
+from settings import DELTA_MAX_CHANGED_RATIO, DELTA_MIN_SIZE
+
+
+def delta_update(source_path: str, destination_path: str, block_size: int) -> int:
+    """
+    Compare source and destination block by block rewriting on destination only
+    the different blocks, and truncate destination to the source size.
+
+    when more than DELTA_MAX_CHANGED_RATIO of the blocks compared are different
+    the rest of the file is copied without comparing, once reading destination
+    would cost more than rewriting it
+
+    return: number of bytes written on destination
+    """
+    src_buffer = bytearray(block_size)
+    dst_buffer = bytearray(block_size)
+    src_view = memoryview(src_buffer)
+    offset = written = 0
+
+    with open(source_path, "rb", buffering=0) as fsrc, \
+            open(destination_path, "r+b", buffering=0) as fdst:
+        while True:
+            read = fsrc.readinto(src_buffer)
+
+            if not read:
+                break
+
+            dst_read = fdst.readinto(dst_buffer)
+
+            # bytearray comparison is a memcmp, slices only for the last block
+            if read == block_size:
+                same = dst_read == read and src_buffer == dst_buffer
+            else:
+                same = dst_read == read and src_buffer[:read] == dst_buffer[:read]
+
+            if not same:
+                block_written = 0
+                while block_written < read:
+                    block_written += os.pwrite(
+                        fdst.fileno(), src_view[block_written:read], offset + block_written
+                    )
+                written += read
+
+            offset += read
+
+            if dst_read != read:
+                fdst.seek(offset)
+
+            if offset >= DELTA_MIN_SIZE and written > offset * DELTA_MAX_CHANGED_RATIO:
+                size = os.fstat(fsrc.fileno()).st_size
+                copy_content(fsrc, fdst, size, offset)
+                written += size - offset
+                offset = size
+                break
+
+        fdst.truncate(offset)
+
+    shutil.copystat(source_path, destination_path)
+
+    return written
@@ -53,3 +53,26 @@ class BlockDeleteOfDestinationFolder(FileSystemBaseException):
 
 class ErrorOnDeleteFolder(FileSystemBaseException):
     """Raise when a error happen on delete folder"""
+
+
+class ErrorOnMove(FileSystemBaseException):
+    """Raise when a error happen on move a file or folder inside destination"""
+
+
+class BlockMoveOnSource(FileSystemBaseException):
+    """Raise when a move operation to source is blocked"""
+
+
+class ErrorOnLink(FileSystemBaseException):
+    """Raise when a error happen on create a hard link inside destination"""
+
+
+class BlockLinkOnSource(FileSystemBaseException):
+    """Raise when a link operation on source is blocked"""
+
+
+class InvalidDedupStore(FileSystemBaseException):
+    """
+    Raise when the dedup store is inside source or destination, or is not on the
+    destination file system
+    """
@@ -0,0 +1,43 @@
+"""
+Module to find the data extents of sparse files with SEEK_DATA and SEEK_HOLE, so
+holes are neither read nor written
+"""
+
+import errno
+import os
+from typing import Generator, Tuple
+
+# block unit of st_blocks
+STAT_BLOCK_SIZE = 512
+
+
+def is_sparse(st: os.stat_result) -> bool:
+    """Check if a file allocates less blocks than its size, which means it has holes"""
+    return hasattr(os, "SEEK_DATA") and st.st_blocks * STAT_BLOCK_SIZE < st.st_size
+
+
+def data_extents(fd: int, size: int) -> Generator[Tuple[int, int], None, None]:
+    """
+    Yield the (start, end) offsets of the data extents of a file, all the file is
+    a single extent when the file system does not support SEEK_DATA
+    """
+    offset = 0
+
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as err:
+            if err.errno == errno.ENXIO:
+                # no data after offset, the rest of the file is a hole
+                return
+            if err.errno == errno.EINVAL and offset == 0:
+                yield 0, size
+                return
+            raise
+
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        if start >= end:
+            return
+
+        yield start, end
+        offset = end
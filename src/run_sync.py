@@ -7,26 +7,79 @@ __version__ = "0.1.0"
 __license__ = "MIT"
 
 import argparse
+import sys
 import threading
 import time
 
-from settings import FolderSettingsDataClass
+from settings import (FolderSettingsDataClass, HashAlgorithmEnum,
+                      ScanModeEnum, SyncOptionsDataClass)
 from setup_logger import setup_logger
 from sync.controller import SyncController
+from watch.exceptions import WatchBaseException
+from watch.inotify import InotifyWatcher
 
 
 def main(args):
     """ Main entry point to start thread looping """
     settings = FolderSettingsDataClass(source=args.source, destination=args.destination)
-    logger = setup_logger("sync_logger", args.log)
+    logger = setup_logger(
+        "sync_logger",
+        args.log,
+        action_log=args.action_log,
+        action_rate=args.log_action_rate,
+        # the plan is written to stdout, its lines are not mixed with the log
+        stream=sys.stderr if args.plan else sys.stdout,
+    )
+    options = SyncOptionsDataClass(
+        sha256=args.sha256 or args.hash is not None,
+        symlink=args.symlink,
+        state_index=args.state_index,
+        verify_every=args.verify_every,
+        scan_mode=ScanModeEnum(args.scan_mode),
+        workers=args.workers,
+        hash_workers=args.hash_workers,
+        scan_workers=args.scan_workers,
+        delta=args.delta,
+        hash_cache=args.hash_cache,
+        hash_cache_size=args.hash_cache_size,
+        hash_algorithm=HashAlgorithmEnum(args.hash or HashAlgorithmEnum.SHA256.value),
+        hash_mmap_min_size=args.hash_mmap_min_size,
+        detect_moves=args.detect_moves,
+        hard_links=args.hard_links,
+        dedup_store=args.dedup_store,
+        throughput_history=args.throughput_history,
+        metrics_prom=args.metrics_prom,
+        metrics_log=args.metrics_log,
+        interval=args.interval,
+        profile_memory=args.profile_memory,
+        shard_workers=args.shard_workers,
+        shard_depth=args.shard_depth,
+    )
 
     sync_controller = SyncController(
         folder_settings=settings,
         logger=logger,
-        sha256=args.sha256,
-        symlink=args.symlink,
+        options=options,
     )
 
+    # the shard worker processes are stopped and the index files closed on exit
+    try:
+        if args.plan:
+            sync_controller.plan(sys.stdout)
+        else:
+            sync_loop(sync_controller, args)
+    finally:
+        sync_controller.close()
+
+
+def sync_loop(sync_controller, args):
+    """ Sync on every interval, or on changes notified by inotify with watch """
+    if args.watch:
+        try:
+            watch(sync_controller, args)
+        except WatchBaseException as err:
+            print("Error on watch, fallback to interval loop", err.__class__)
+
     while True:
         try:
             sync_controller.execute()
@@ -37,6 +90,38 @@ def main(args):
         time.sleep(args.interval)
 
 
+def watch(sync_controller, args):
+    """ Sync the source folders with changes notified by inotify """
+    watcher = InotifyWatcher(source=args.source, symlink=args.symlink)
+
+    try:
+        sync_until_complete(sync_controller, args.interval)
+
+        # targets is None when inotify lost events, which requires a full scan
+        for targets in watcher.changes():
+            sync_until_complete(sync_controller, args.interval, targets)
+    finally:
+        watcher.close()
+
+
+def sync_until_complete(sync_controller, interval, targets=None):
+    """
+    Sync the targets, a sync that fails is retried after the interval with a full
+    scan, since the folders of the failed targets would not be notified again.
+    While the syncs fail the watch works as the interval loop
+    """
+    while True:
+        try:
+            if not sync_controller.execute(targets=targets):
+                return
+        except Exception as err:  #pylint: disable=broad-exception-caught
+            print("Error on execution", err.__class__)
+
+        print(f"interval sleep of {interval}")
+        time.sleep(interval)
+        targets = None
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
 
@@ -50,8 +135,90 @@ if __name__ == "__main__":
     parser.add_argument("-s", "--sha256", action="store_true", default=False,
         help="diff files using sha256 hash strategy")
     # Optional argument
+    parser.add_argument("--hash", default=None,
+        choices=[algorithm.value for algorithm in HashAlgorithmEnum],
+        help="diff files using hash strategy with the given algorithm")
+    # Optional argument
     parser.add_argument("-l", "--symlink", action="store_true", default=False,
         help="follow symlink, be aware it could lead to infinite loop recursion")
+    # Optional argument
+    parser.add_argument("--state-index", type=str, default=None,
+        help="index file of destination state, avoid scanning destination on each loop")
+    # Optional argument
+    parser.add_argument("--verify-every", type=int, default=0,
+        help="full verification scan every N loops with --state-index or --scan-mode")
+    # Optional argument
+    parser.add_argument("--scan-mode", default=ScanModeEnum.FULL.value,
+        choices=[scan_mode.value for scan_mode in ScanModeEnum],
+        help="reuse listing of source folders not modified since the previous loop")
+
+    # Optional argument
+    parser.add_argument("--workers", type=int, default=1,
+        help="number of threads applying sync actions concurrently")
+    # Optional argument
+    parser.add_argument("--hash-workers", type=int, default=1,
+        help="number of threads comparing files with --sha256 or --hash")
+    # Optional argument
+    parser.add_argument("--scan-workers", type=int, default=1,
+        help="number of threads listing source and destination folders concurrently")
+    # Optional argument
+    parser.add_argument("--shard-workers", type=int, default=1,
+        help="number of processes scanning and diffing sub trees of source concurrently")
+    # Optional argument
+    parser.add_argument("--shard-depth", type=int, default=1,
+        help="depth of the source folders split in work units with --shard-workers")
+    # Optional argument
+    parser.add_argument("--hash-cache", type=str, default=None,
+        help="cache file of digests of files not modified since hashed")
+    # Optional argument
+    parser.add_argument("--hash-cache-size", type=int, default=1_000_000,
+        help="max number of digests kept on --hash-cache")
+    # Optional argument
+    parser.add_argument("--hash-mmap-min-size", type=int, default=None,
+        help="hash files from this size in bytes from a memory map, a file truncated "
+        "while hashed kills the sync with SIGBUS")
+    # Optional argument
+    parser.add_argument("-d", "--delta", action="store_true", default=False,
+        help="update large files in place writing only the changed blocks")
+    # Optional argument
+    parser.add_argument("--detect-moves", action="store_true", default=False,
+        help="move files and folders renamed on source instead of copying them again")
+    # Optional argument
+    parser.add_argument("-H", "--hard-links", action="store_true", default=False,
+        help="recreate hard links of source files on destination instead of copies")
+    # Optional argument
+    parser.add_argument("--dedup-store", type=str, default=None,
+        help="store each file content once on this folder, destination files are "
+        "hard links to it (requires --sha256 or --hash)")
+    # Optional argument
+    parser.add_argument("--plan", action="store_true", default=False,
+        help="write the sync actions and totals as JSON lines to stdout without "
+        "changing destination, then exit, the log is written to stderr")
+    # Optional argument
+    parser.add_argument("--throughput-history", type=str, default=None,
+        help="file with the throughput of previous runs, used to estimate the "
+        "duration on --plan")
+    # Optional argument
+    parser.add_argument("--metrics-prom", type=str, default=None,
+        help="file replaced after each run with the metrics on Prometheus text format")
+    # Optional argument
+    parser.add_argument("--metrics-log", type=str, default=None,
+        help="file appended after each run with the metrics of the run as a JSON line")
+    # Optional argument
+    parser.add_argument("--profile-memory", type=str, default=None,
+        help="folder of tracemalloc snapshots and peak memory of each phase and "
+        "folder depth, dumped after each run")
+    # Optional argument
+    parser.add_argument("--action-log", type=str, default=None,
+        help="binary log with a record of each sync action, read it with "
+        "python -m utils.action_log")
+    # Optional argument
+    parser.add_argument("--log-action-rate", type=int, default=0,
+        help="max per action log lines per second, the lines over the rate are "
+        "summarized (default 0 logs all lines)")
+    # Optional argument
+    parser.add_argument("-w", "--watch", action="store_true", default=False,
+        help="sync on inotify events instead of interval loop (Linux only)")
 
     parser.add_argument(
         "--version",
@@ -59,5 +226,24 @@ if __name__ == "__main__":
         version="%(prog)s (version {__version__})")
 
     sync_args = parser.parse_args()
+    if sync_args.watch and not sys.platform.startswith("linux"):
+        parser.error("--watch is only supported on Linux")
+    # linked files share the last modified date, only the content can be compared
+    if sync_args.dedup_store and not (sync_args.sha256 or sync_args.hash):
+        parser.error("--dedup-store requires --sha256 or --hash")
+
+    # the shard workers do not share the state of the scan between loops
+    if sync_args.shard_workers > 1 and (
+        sync_args.state_index
+        or sync_args.hash_cache
+        or sync_args.scan_mode != ScanModeEnum.FULL.value
+    ):
+        parser.error(
+            "--shard-workers can not be used with --state-index, --hash-cache or --scan-mode"
+        )
+
     thread = threading.Thread(target=main, args=(sync_args, ))
     thread.start()
+    # the main thread must not finish, its exit shuts down the thread and process
+    # pools of concurrent.futures used by the workers options
+    thread.join()
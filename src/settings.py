@@ -3,6 +3,7 @@
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
+from typing import Optional
 
 
 @dataclass
@@ -12,6 +13,62 @@ class FolderSettingsDataClass:
     destination: Path
 
 
+class ScanModeEnum(Enum):
+    """Strategies to scan source folders between sync loops"""
+    FULL = "full"
+    INCREMENTAL = "incremental"
+    TRUST_DIRS = "trust-dirs"
+
+
+class HashAlgorithmEnum(Enum):
+    """Hash algorithms of the content diff strategy"""
+    SHA256 = "sha256"
+    SHA1 = "sha1"
+    SHA512 = "sha512"
+    SHA3_256 = "sha3_256"
+    BLAKE2B = "blake2b"
+    BLAKE2S = "blake2s"
+    MD5 = "md5"
+
+
+@dataclass
+class SyncOptionsDataClass:  # pylint: disable=too-many-instance-attributes
+    """Data structure of optional sync strategies"""
+    sha256: bool = False
+    symlink: bool = False
+    state_index: Optional[str] = None
+    verify_every: int = 0
+    scan_mode: ScanModeEnum = ScanModeEnum.FULL
+    workers: int = 1
+    hash_workers: int = 1
+    scan_workers: int = 1
+    delta: bool = False
+    hash_cache: Optional[str] = None
+    hash_cache_size: int = 1_000_000
+    hash_algorithm: HashAlgorithmEnum = HashAlgorithmEnum.SHA256
+    hash_mmap_min_size: Optional[int] = None
+    detect_moves: bool = False
+    hard_links: bool = False
+    dedup_store: Optional[str] = None
+    throughput_history: Optional[str] = None
+    metrics_prom: Optional[str] = None
+    metrics_log: Optional[str] = None
+    interval: float = 0
+    profile_memory: Optional[str] = None
+    shard_workers: int = 1
+    shard_depth: int = 1
+
+
+class CopyMethodEnum(Enum):
+    """Methods used to copy a file content"""
+    COPY_FILE_RANGE = "copy_file_range"
+    SENDFILE = "sendfile"
+    BUFFERED = "buffered"
+    SPARSE = "sparse"
+    DELTA = "delta"
+    DEDUP = "dedup"
+
+
 class DiffActionsEnum(Enum):
     """Outcome actions from a diff between source and destination"""
     CREATE_FILE = "create_file"
@@ -19,7 +76,77 @@ class DiffActionsEnum(Enum):
     DELETE_FILE = "delete_file"
     CREATE_FOLDER = "create_folder"
     DELETE_FOLDER = "delete_folder"
+    MOVE_FILE = "move_file"
+    MOVE_FOLDER = "move_folder"
+    LINK_FILE = "link_file"
+
+
+# settings of sha256 diff, files are read into a single reused buffer, or hashed
+# from a memory map from the hash_mmap_min_size option
+HASH_BUFFER_SIZE = 1024 * 1024
+# zeros buffer hashed in place of the holes of sparse files
+SPARSE_ZEROS_SIZE = 1024 * 1024 * 8
+
+# settings of content comparison, files larger than 3 samples have the head, middle
+# and tail samples compared first, then both files are read in lock-step with chunks
+# doubling from the min to the max size, most differences are found on first chunks
+COMPARE_SAMPLE_SIZE = 1024 * 64
+COMPARE_CHUNK_MIN = 1024 * 64
+COMPARE_CHUNK_MAX = 1024 * 1024 * 4
+
+# settings of file copy, chunks of kernel side copy and buffer of user space copy
+# are sized by the file size within the limits
+COPY_CHUNK_MIN = 1024 * 1024 * 8
+COPY_CHUNK_MAX = 1024 * 1024 * 1024
+COPY_BUFFER_MIN = 1024 * 64
+COPY_BUFFER_MAX = 1024 * 1024 * 8
+
+# settings of delta update, files smaller than the min size are fully copied, and
+# after min size compared the rest is fully copied when the changed ratio is higher
+DELTA_BLOCK_SIZE = 1024 * 1024
+DELTA_MIN_SIZE = 1024 * 1024 * 64
+DELTA_MAX_CHANGED_RATIO = 0.5
+
+# folders modified less than 1 second before the scan are not cached, a change in the
+# same clock tick of the scan would not update the folder last modified date
+DIR_MTIME_RACY_NS = 1_000_000_000
+
+# settings of watch mode, events are coalesced until no event arrives for the
+# debounce seconds, or at most max delay seconds after the first event
+WATCH_DEBOUNCE = 0.1
+WATCH_MAX_DELAY = 1.0
+
+# folders with more files than the merge join min are diffed by merge joining the
+# source and destination names in sorted order, the names are sorted in runs of the
+# sort run size spilled to temporary files, so memory does not grow with the folder
+MERGE_JOIN_MIN_FILES = 100_000
+SORT_RUN_SIZE = 100_000
+
+# sync runs kept on the throughput history, used to estimate the duration of a plan
+THROUGHPUT_HISTORY_RUNS = 20
+
+# upper bounds in seconds of the latency histogram buckets of each sync phase, and
+# ratio of the interval taken by a sync run that logs a warning
+LATENCY_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0
+)
+DURATION_WARN_RATIO = 0.8
+
+# settings of memory profile, frames kept of each allocation traceback, allocation
+# sites reported per phase and depth, and growth of the traced memory of a phase or
+# depth since its last snapshot to take a new snapshot
+MEMORY_PROFILE_FRAMES = 4
+MEMORY_PROFILE_TOP = 10
+MEMORY_PROFILE_SNAPSHOT_GROWTH = 1.25
+
+# log handlers are flushed when the log queue is drained, or after this interval in
+# seconds while records keep coming
+LOG_FLUSH_INTERVAL = 1.0
 
+# folders scanned by a work unit of the sharded scan, the folders left to scan on the
+# subtree of the unit are split in new units to be taken by any shard worker
+SHARD_UNIT_FOLDERS = 1_000
 
-# settings of sha256 diff
-BUF_SIZE = 1024 * 64
+# actions submitted to the parallel executor, sha256 comparisons or folders listing
+# submitted to the thread pool waiting for a worker, per worker
+IN_FLIGHT_PER_WORKER = 4
@@ -1,20 +1,56 @@
 """Module to setup logger"""
 
+import atexit
 import logging
+import queue
 import sys
+from typing import Optional, TextIO
+
+from utils.action_log import ActionLogHandler
+from utils.log_queue import (BufferedFileHandler, BufferedStreamHandler,
+                             DeferredQueueHandler, SyncLogListener)
 
 formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
 
 
-def setup_logger(name, log_file, level=logging.INFO):
-    """Dynamically logger setup"""
+def setup_logger(
+    name,
+    log_file,
+    level=logging.INFO,
+    action_log: Optional[str] = None,
+    action_rate: int = 0,
+    stream: Optional[TextIO] = None,
+):
+    """
+    Dynamically logger setup, the records are queued and written to the log file
+    and stdout by a listener thread
 
-    handler = logging.FileHandler(log_file)
+    action_log: binary log with a record of each sync action
+    action_rate: max per action lines per second on the log file and stdout, the
+    lines over the rate are summarized, 0 writes all lines
+    stream: stream of the log lines instead of stdout
+    """
+    handler = BufferedFileHandler(log_file)
     handler.setFormatter(formatter)
+    stream_handler = BufferedStreamHandler(stream or sys.stdout)
+
+    action_handler = None
+    if action_log:
+        action_handler = ActionLogHandler(action_log)
+
+    log_queue = queue.SimpleQueue()
+    listener = SyncLogListener(
+        log_queue,
+        [handler, stream_handler],
+        action_handler=action_handler,
+        action_rate=action_rate,
+    )
+    listener.start()
+    # the queued records are written before the process exits
+    atexit.register(listener.stop)
 
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    logger.addHandler(handler)
-    logger.addHandler(logging.StreamHandler(sys.stdout))
+    logger.addHandler(DeferredQueueHandler(log_queue))
 
     return logger
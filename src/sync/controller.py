@@ -3,53 +3,311 @@ Module that will control sync actions interacting with DiffTree and FileSystemCo
 """
 
 import os
+import time
 from logging import Logger
+from typing import Generator, Iterable, List, Optional, TextIO
 
-from diff_folders.walk_tree import DiffTree
+from diff_folders.hash_cache import HashCache
+from diff_folders.sharded_scan import ShardedDiffTree
+from diff_folders.state_index import SyncStateIndex
+from diff_folders.walk_tree import DiffTree, GetActionResponse, ScanTarget
 from file_system.commands import FileSystemCommands
-from settings import DiffActionsEnum, FolderSettingsDataClass
-from utils.memory_usage import memory_usage
-from utils.timeit import timeit
+from file_system.dedup import DedupStore
+from settings import (DURATION_WARN_RATIO, DiffActionsEnum,
+                      FolderSettingsDataClass, SyncOptionsDataClass)
+from sync.executor import ActionFailure, ParallelExecutor
+from sync.plan import PlanStats, write_plan, write_summary
+from sync.throughput import ThroughputHistory
+from utils.memory_profile import MemoryProfiler
+from utils.metrics import SyncMetrics
 
+# actions that remove destination links, which can leave dedup blobs unused
+UNLINK_ACTIONS = {
+    DiffActionsEnum.UPDATE_FILE,
+    DiffActionsEnum.DELETE_FILE,
+    DiffActionsEnum.DELETE_FOLDER,
+    DiffActionsEnum.LINK_FILE,
+}
 
-class SyncController:  #pylint: disable=too-few-public-methods
+# phase of the metrics of each action
+ACTION_PHASES = {
+    DiffActionsEnum.CREATE_FILE: "copy",
+    DiffActionsEnum.UPDATE_FILE: "copy",
+    DiffActionsEnum.DELETE_FILE: "delete",
+    DiffActionsEnum.DELETE_FOLDER: "delete",
+    DiffActionsEnum.CREATE_FOLDER: "mkdir",
+    DiffActionsEnum.MOVE_FILE: "move",
+    DiffActionsEnum.MOVE_FOLDER: "move",
+    DiffActionsEnum.LINK_FILE: "link",
+}
+
+
+class SyncController:  #pylint: disable=too-few-public-methods,too-many-instance-attributes
     """Class to execute sync operations between source and destination"""
 
     def __init__(
         self,
         folder_settings: FolderSettingsDataClass,
         logger: Logger,
-        sha256: bool = False,
-        symlink: bool = False
+        options: Optional[SyncOptionsDataClass] = None,
     ) -> None:
         """
         Initialize DiffTree and FileSystemCommands modules with source and destination
         settings
         """
-        self._diff_client = DiffTree(
-            folder_settings=folder_settings, sha256=sha256, symlink=symlink
+        options = options or SyncOptionsDataClass()
+        self._state_index = None
+        if options.state_index:
+            self._state_index = SyncStateIndex(
+                index_path=options.state_index, destination=folder_settings.destination
+            )
+        self._hash_cache = None
+        if options.hash_cache:
+            self._hash_cache = HashCache(
+                cache_path=options.hash_cache,
+                max_entries=options.hash_cache_size,
+                algorithm=options.hash_algorithm.value,
+            )
+        self._throughput = None
+        if options.throughput_history:
+            self._throughput = ThroughputHistory(history_path=options.throughput_history)
+        self._metrics = SyncMetrics()
+        self._profiler = None
+        self._apply = self._apply_action
+        if options.profile_memory:
+            self._profiler = MemoryProfiler(dump_dir=options.profile_memory)
+            self._apply = self._profiler.profiled("apply", self._apply_action)
+        self._metrics_prom = options.metrics_prom
+        self._metrics_log = options.metrics_log
+        self._interval = options.interval
+        self._verify_every = options.verify_every
+        self._executions = 0
+        self._executor = None
+        if options.workers > 1:
+            self._executor = ParallelExecutor(
+                apply_action=self._apply, workers=options.workers
+            )
+
+        diff_tree = ShardedDiffTree if options.shard_workers > 1 else DiffTree
+        self._diff_client = diff_tree(
+            folder_settings=folder_settings,
+            options=options,
+            state_index=self._state_index,
+            hash_cache=self._hash_cache,
+            metrics=self._metrics,
+            profiler=self._profiler,
         )
+        self._dedup_store = None
+        if options.dedup_store:
+            self._dedup_store = DedupStore(
+                store_path=options.dedup_store,
+                folder_settings=folder_settings,
+                file_hash=self._diff_client.file_hash,
+            )
+        # set when destination links were removed, the dedup store is collected
+        self._unlinked = False
         self._commands_client = FileSystemCommands(
-            folder_settings=folder_settings, logger=logger
+            folder_settings=folder_settings,
+            logger=logger,
+            delta=options.delta,
+            dedup_store=self._dedup_store,
         )
         self._logger = logger
+        self._folder_settings = folder_settings
+        self._actions_count = 0
         self._map_actions = {
             DiffActionsEnum.CREATE_FILE: self._commands_client.create_file,
-            DiffActionsEnum.UPDATE_FILE: self._commands_client.create_file,
+            DiffActionsEnum.UPDATE_FILE: self._commands_client.update_file,
             DiffActionsEnum.DELETE_FILE: self._commands_client.delete_file,
             DiffActionsEnum.CREATE_FOLDER: self._commands_client.create_folder,
             DiffActionsEnum.DELETE_FOLDER: self._commands_client.delete_folder,
+            DiffActionsEnum.MOVE_FILE: self._commands_client.move,
+            DiffActionsEnum.MOVE_FOLDER: self._commands_client.move,
+            DiffActionsEnum.LINK_FILE: self._commands_client.link_file,
         }
 
-    @memory_usage
-    @timeit
-    def execute(self):
-        """Start diff scan in source to execute sync actions into destination"""
+    def execute(
+        self, targets: Optional[Iterable[ScanTarget]] = None
+    ) -> List[ActionFailure]:
+        """
+        Start diff scan in source to execute sync actions into destination
+
+        targets: sync only the given source folders, otherwise all folders tree
+
+        return: actions that failed, with parallel workers the execution does not
+        stop on the first error
+        """
+        verify = False
+        if targets is None:
+            verify = self._must_verify()
+            self._executions += 1
+
+        failures = []
+        started = time.monotonic()
+        if self._profiler is not None:
+            self._profiler.start_run()
+        actions = self._count_actions(
+            self._diff_client.get_actions(verify=verify, targets=targets)
+        )
+
+        applied = False
+        try:
+            if self._executor is None:
+                for diff in actions:
+                    self._apply(diff)
+            else:
+                failures = self._executor.run(actions)
+            applied = True
+        finally:
+            # source folders with failed actions are read again on the next scan
+            self._diff_client.end_scan(
+                applied, (root for failure in failures for root in _action_roots(failure.action))
+            )
+            if self._state_index:
+                self._state_index.commit()
+            if self._hash_cache:
+                self._hash_cache.commit()
+
+        self._metrics.count_copy_methods(self._commands_client.pop_copy_methods())
+        self._end_run(time.monotonic() - started, len(failures))
+
+        if self._dedup_store is not None and self._unlinked:
+            self._unlinked = False
+            released = self._dedup_store.collect()
+            self._logger.info("sync dedup store released %s bytes", released)
+
+        for failure in failures:
+            self._logger.warning(
+                "sync %s failed on %s - %s",
+                failure.action.action.value,
+                os.path.join(failure.action.common_root, failure.action.name),
+                failure.error.__class__.__name__,
+            )
+
+        if self._state_index and verify:
+            self._state_index.rebuild()
+
+        return failures
+
+    def plan(self, output: TextIO) -> PlanStats:
+        """
+        Write the actions of a sync as JSON lines without applying them on
+        destination, followed by the totals and, with a throughput history, the
+        estimated duration of the sync
+        """
+        actions = self._diff_client.get_actions(verify=self._must_verify())
+        stats = write_plan(actions, self._folder_settings, output)
+        self._diff_client.end_scan(applied=False)
+
+        if self._throughput is not None:
+            stats.estimated_seconds = self._throughput.estimate(
+                sum(stats.actions.values()), stats.bytes_to_copy
+            )
+
+        write_summary(stats, output)
+
+        return stats
+
+    def close(self) -> None:
+        """Stop the shard worker processes and close the state index and hash cache"""
+        self._diff_client.close()
+        if self._state_index:
+            self._state_index.close()
+        if self._hash_cache:
+            self._hash_cache.close()
+
+    def _end_run(self, seconds: float, failures: int) -> None:
+        """
+        Record the throughput, metrics and memory profile of the run, warning when
+        the run takes most of the interval between runs
+        """
+        copied_bytes = self._commands_client.pop_copied_bytes()
+        if self._throughput is not None and self._actions_count:
+            self._throughput.record(self._actions_count, copied_bytes, seconds)
+
+        record = self._metrics.end_run(seconds, failures, self._interval)
+        if self._metrics_prom:
+            self._metrics.write_prometheus(self._metrics_prom)
+        if self._metrics_log:
+            self._metrics.append_json(self._metrics_log, record)
+
+        if self._profiler is not None:
+            summary = self._profiler.end_run()
+            self._logger.info("sync memory peak %s bytes", summary["peak_bytes"])
+
+        if self._interval and seconds >= self._interval * DURATION_WARN_RATIO:
+            self._logger.warning(
+                "sync run took %.1f seconds, close to the interval of %s seconds",
+                seconds,
+                self._interval,
+            )
+
+    def _count_actions(
+        self, actions: Iterable[GetActionResponse]
+    ) -> Generator[GetActionResponse, None, None]:
+        """Yield the actions counting them, the count is used on throughput history"""
+        self._actions_count = 0
+
+        for action in actions:
+            self._actions_count += 1
+            yield action
+
+    def _apply_action(self, diff: GetActionResponse) -> None:
+        """Execute a single sync action on destination"""
+        callable_action = self._map_actions.get(diff.action)
+
+        if callable_action:
+            path = os.path.join(diff.common_root, diff.name)
+            started = time.perf_counter()
+            if diff.origin is None:
+                copied = callable_action(path=path)
+            else:
+                copied = callable_action(path=path, origin=diff.origin)
+            self._metrics.observe(ACTION_PHASES[diff.action], time.perf_counter() - started)
+            self._metrics.count_action(diff.action.value, copied or 0)
+            self._record_state(diff.action, path, diff.origin)
+
+            if diff.action in UNLINK_ACTIONS:
+                self._unlinked = True
+
+            if diff.action in (DiffActionsEnum.CREATE_FILE, DiffActionsEnum.UPDATE_FILE):
+                self._diff_client.remember_copy(path)
+            self._logger.info(
+                "sync %s complete on %s",
+                diff.action.value,
+                path,
+                extra={"sync_action": diff.action, "sync_path": path, "sync_origin": diff.origin},
+            )
+
+    def _must_verify(self) -> bool:
+        """
+        Check if the execution must scan source and destination file system instead
+        of trusting the state index and the cached source folders
+        """
+        if self._state_index is not None and self._state_index.is_empty():
+            return True
+
+        return self._verify_every > 0 and self._executions % self._verify_every == 0
+
+    def _record_state(
+        self, action: DiffActionsEnum, path: str, origin: Optional[str] = None
+    ) -> None:
+        """Keep the state index updated with the action applied on destination"""
+        if self._state_index is None:
+            return
+
+        if action in (DiffActionsEnum.DELETE_FILE, DiffActionsEnum.DELETE_FOLDER):
+            self._state_index.forget(path)
+        elif action in (DiffActionsEnum.MOVE_FILE, DiffActionsEnum.MOVE_FOLDER):
+            self._state_index.move(origin, path)
+        else:
+            self._state_index.record(path)
+
 
-        for diff in self._diff_client.get_actions():
-            callable_action = self._map_actions.get(diff.action)
+def _action_roots(action: GetActionResponse) -> List[str]:
+    """Return the source folders of an action, the folder of the origin too"""
+    roots = [action.common_root]
+    if action.origin is not None:
+        roots.append(os.path.dirname(action.origin))
 
-            if callable_action:
-                path = os.path.join(diff.common_root, diff.name)
-                callable_action(path=path)
-                self._logger.info("sync %s complete on %s", diff.action.value, path)
+    return roots
@@ -0,0 +1,113 @@
+"""
+Module that runs sync actions concurrently, keeping the order between actions that
+depend on each other
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List
+
+from diff_folders.walk_tree import GetActionResponse
+from settings import IN_FLIGHT_PER_WORKER, DiffActionsEnum
+
+
+@dataclass
+class ActionFailure:
+    """Sync action that raised an error on execution"""
+    action: GetActionResponse
+    error: Exception
+
+
+class ParallelExecutor:  # pylint: disable=too-few-public-methods
+    """
+    Run sync actions on a thread pool, an action waits the previous action on the
+    same path and the action on its parent folder (the folder creation) to finish.
+    Actions with an origin wait the previous action on the origin too, and a folder
+    delete waits the actions still running inside the folder
+    """
+
+    def __init__(
+        self, apply_action: Callable[[GetActionResponse], None], workers: int
+    ) -> None:
+        """Callable used to apply a single action and the number of worker threads"""
+        self._apply_action = apply_action
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._failures: List[ActionFailure] = []
+
+    def run(self, actions: Iterable[GetActionResponse]) -> List[ActionFailure]:
+        """
+        Run all actions collecting the failures instead of stopping on the first
+        error, the number of actions waiting for a worker is bounded
+
+        return: list of actions that failed
+        """
+        self._pending = {}
+        self._failures = []
+        in_flight = threading.BoundedSemaphore(self._workers * IN_FLIGHT_PER_WORKER)
+
+        with ThreadPoolExecutor(max_workers=self._workers) as pool:
+            for action in actions:
+                path = os.path.join(action.common_root, action.name)
+
+                keys = [path] if action.origin is None else [path, action.origin]
+
+                with self._lock:
+                    dependencies = self._dependencies(action, path)
+
+                in_flight.acquire()  # pylint: disable=consider-using-with
+                future = pool.submit(self._run_action, action, dependencies)
+
+                with self._lock:
+                    for key in keys:
+                        self._pending[key] = future
+
+                future.add_done_callback(
+                    lambda done, keys=keys: self._release(done, keys, in_flight)
+                )
+
+        return self._failures
+
+    def _dependencies(self, action: GetActionResponse, path: str) -> List[Future]:
+        """Return the pending futures an action must wait, called with the lock"""
+        keys = [action.common_root, path]
+        if action.origin is not None:
+            keys.append(action.origin)
+
+        dependencies = [self._pending[key] for key in keys if key in self._pending]
+
+        # the in flight window bounds the pending actions scanned here
+        if action.action == DiffActionsEnum.DELETE_FOLDER:
+            dependencies.extend(
+                future for key, future in self._pending.items()
+                if key.startswith(path + "/")
+            )
+
+        return dependencies
+
+    def _run_action(self, action: GetActionResponse, dependencies: List[Future]) -> None:
+        """
+        Wait the dependencies and apply the action, dependencies were submitted
+        before this action so they are already running or finished
+        """
+        wait(dependencies)
+
+        try:
+            self._apply_action(action)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            with self._lock:
+                self._failures.append(ActionFailure(action=action, error=err))
+
+    def _release(
+        self, future: Future, keys: List[str], in_flight: threading.BoundedSemaphore
+    ) -> None:
+        """Forget a finished action and release its in flight slot"""
+        with self._lock:
+            for key in keys:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+
+        in_flight.release()
@@ -0,0 +1,113 @@
+"""
+Module that writes the plan of a sync, the actions the diff would apply without
+touching destination, with the totals of the plan
+"""
+
+import json
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, TextIO
+
+from diff_folders.actions import GetActionResponse
+from settings import DiffActionsEnum, FolderSettingsDataClass
+
+
+@dataclass
+class PlanStats:
+    """Totals of a sync plan"""
+    actions: Dict[str, int] = field(default_factory=dict)
+    bytes_to_copy: int = 0
+    bytes_to_delete: int = 0
+    estimated_seconds: Optional[float] = None
+
+
+def write_plan(
+    actions: Iterable[GetActionResponse],
+    folder_settings: FolderSettingsDataClass,
+    output: TextIO,
+) -> PlanStats:
+    """
+    Write each action as a JSON line as the diff yields it, with the bytes the
+    action copies from source or deletes from destination
+
+    return: the totals of the actions, not yet written
+    """
+    counts = Counter()
+    stats = PlanStats()
+
+    for action in actions:
+        path = os.path.join(action.common_root, action.name)
+        size = _action_bytes(action.action, path, folder_settings)
+        counts[action.action.value] += 1
+
+        if action.action in (DiffActionsEnum.DELETE_FILE, DiffActionsEnum.DELETE_FOLDER):
+            stats.bytes_to_delete += size
+        else:
+            stats.bytes_to_copy += size
+
+        output.write(
+            json.dumps(
+                {
+                    "action": action.action.value,
+                    "path": path,
+                    "origin": action.origin,
+                    "bytes": size,
+                }
+            ) + "\n"
+        )
+
+    stats.actions = dict(counts)
+
+    return stats
+
+
+def write_summary(stats: PlanStats, output: TextIO) -> None:
+    """Write the totals of the plan as the last JSON line"""
+    output.write(
+        json.dumps(
+            {
+                "summary": {
+                    "actions": stats.actions,
+                    "bytes_to_copy": stats.bytes_to_copy,
+                    "bytes_to_delete": stats.bytes_to_delete,
+                    "estimated_seconds": stats.estimated_seconds,
+                }
+            }
+        ) + "\n"
+    )
+
+
+def _action_bytes(
+    action: DiffActionsEnum, path: str, folder_settings: FolderSettingsDataClass
+) -> int:
+    """
+    Return the bytes copied by a create or update (the whole file, even when the
+    delta update writes less) or released by a delete, moves and links copy nothing
+    """
+    try:
+        if action in (DiffActionsEnum.CREATE_FILE, DiffActionsEnum.UPDATE_FILE):
+            return os.stat(os.path.join(folder_settings.source, path)).st_size
+        if action == DiffActionsEnum.DELETE_FILE:
+            return os.lstat(os.path.join(folder_settings.destination, path)).st_size
+    except OSError:
+        return 0
+
+    if action == DiffActionsEnum.DELETE_FOLDER:
+        return _tree_bytes(os.path.join(folder_settings.destination, path))
+
+    return 0
+
+
+def _tree_bytes(folder_path: str) -> int:
+    """Return the size of all files inside a folder tree"""
+    total = 0
+
+    for dir_path, _, file_names in os.walk(folder_path):
+        for name in file_names:
+            try:
+                total += os.lstat(os.path.join(dir_path, name)).st_size
+            except OSError:
+                continue
+
+    return total
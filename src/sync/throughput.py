@@ -0,0 +1,94 @@
+"""
+Module that keeps the throughput measured on previous sync runs, used to estimate
+how long a planned sync will take
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+from settings import THROUGHPUT_HISTORY_RUNS
+
+
+@dataclass
+class RunThroughput:
+    """Actions applied, bytes copied and duration of a sync run"""
+    actions: int
+    bytes: int
+    seconds: float
+
+
+class ThroughputHistory:
+    """JSON file with the throughput of the last sync runs"""
+
+    def __init__(self, history_path: str) -> None:
+        """History file, created on the first recorded run"""
+        self._history_path = history_path
+
+    def runs(self) -> List[RunThroughput]:
+        """Return the recorded runs, an unreadable history has no runs"""
+        try:
+            with open(self._history_path, encoding="utf-8") as history:
+                return [RunThroughput(**run) for run in json.load(history)]
+        except (OSError, ValueError, TypeError):
+            return []
+
+    def record(self, actions: int, bytes_copied: int, seconds: float) -> None:
+        """Record a sync run, keeping only the last runs"""
+        runs = self.runs()
+        runs.append(RunThroughput(actions=actions, bytes=bytes_copied, seconds=seconds))
+        runs = runs[-THROUGHPUT_HISTORY_RUNS:]
+
+        # written on a temporary file and replaced, a reader never sees half a file
+        temp_path = f"{self._history_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as history:
+            json.dump([asdict(run) for run in runs], history)
+        os.replace(temp_path, self._history_path)
+
+    def estimate(self, actions: int, bytes_to_copy: int) -> Optional[float]:
+        """
+        Return the estimated seconds to apply the actions copying the bytes, the
+        duration of a run is modeled as a cost per action plus a cost per byte,
+        fitted by least squares on the recorded runs
+
+        return: None when there is no recorded run
+        """
+        runs = [run for run in self.runs() if run.actions and run.seconds > 0]
+
+        if not runs:
+            return None
+
+        per_action, per_byte = _fit(runs)
+
+        return actions * per_action + bytes_to_copy * per_byte
+
+
+def _fit(runs: List[RunThroughput]) -> Tuple[float, float]:
+    """
+    Return the seconds per action and per byte that best fit the runs, when the
+    runs do not tell apart both costs (same ratio of bytes per action, or a
+    negative cost) the seconds are attributed to the bytes copied, or to the
+    actions when no bytes were copied
+    """
+    sum_aa = sum(run.actions * run.actions for run in runs)
+    sum_ab = sum(run.actions * run.bytes for run in runs)
+    sum_bb = sum(run.bytes * run.bytes for run in runs)
+    sum_as = sum(run.actions * run.seconds for run in runs)
+    sum_bs = sum(run.bytes * run.seconds for run in runs)
+    determinant = sum_aa * sum_bb - sum_ab * sum_ab
+
+    if determinant > 0:
+        per_action = (sum_as * sum_bb - sum_bs * sum_ab) / determinant
+        per_byte = (sum_bs * sum_aa - sum_as * sum_ab) / determinant
+
+        if per_action >= 0 and per_byte >= 0:
+            return per_action, per_byte
+
+    total_seconds = sum(run.seconds for run in runs)
+    total_bytes = sum(run.bytes for run in runs)
+
+    if total_bytes:
+        return 0.0, total_seconds / total_bytes
+
+    return total_seconds / sum(run.actions for run in runs), 0.0
@@ -1,9 +1,13 @@
+import io
+import json
 import logging
 import os
+import shutil
 
 import pytest
 
-from src.settings import DiffActionsEnum, FolderSettingsDataClass
+from src.settings import (DiffActionsEnum, FolderSettingsDataClass,
+                          SyncOptionsDataClass)
 from src.sync.controller import SyncController
 from src.tests.conftest import create_tmp_file, create_tmp_folder
 
@@ -149,3 +153,343 @@ def test_execute_sync_delete_on_second_call(tmp_source, tmp_destination):
 
     assert len(os.listdir(str(tmp_source))) == 0
     assert len(os.listdir(str(tmp_destination))) == 0
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("detect_moves", [False, True])
+def test_execute_swaps_folder_and_file_names(
+    tmp_source, tmp_destination, workers, detect_moves
+):
+    create_tmp_file(tmp_source, "inner.txt", "inner content", "x")
+    create_tmp_file(tmp_source, "y", "file y")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(workers=workers, detect_moves=detect_moves)
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    assert sync_controller.execute() == []
+
+    # folder x is replaced by a file and file y by a folder with the file of x
+    os.rename(tmp_source / "x" / "inner.txt", tmp_source / "inner.txt")
+    os.rmdir(tmp_source / "x")
+    (tmp_source / "x").write_text("file x")
+    os.remove(tmp_source / "y")
+    os.mkdir(tmp_source / "y")
+    os.rename(tmp_source / "inner.txt", tmp_source / "y" / "inner.txt")
+
+    assert sync_controller.execute() == []
+
+    assert (tmp_destination / "x").read_text() == "file x"
+    assert (tmp_destination / "y" / "inner.txt").read_text() == "inner content"
+    assert sorted(os.listdir(tmp_destination)) == ["x", "y"]
+
+
+def test_execute_with_state_index_does_not_scan_destination(
+    tmp_path, tmp_source, tmp_destination
+):
+    file_name = "file_name.txt"
+    create_tmp_file(tmp_source, file_name, "Content")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(state_index=str(tmp_path / "index.db"))
+
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    sync_controller.execute()
+
+    assert file_name in os.listdir(str(tmp_destination))
+
+    # a file written on destination by someone else is unknown by the index
+    create_tmp_file(tmp_destination, "unknown.txt", "Content")
+    create_tmp_file(tmp_source, "new_file.txt", "Content")
+
+    sync_controller.execute()
+
+    assert "new_file.txt" in os.listdir(str(tmp_destination))
+    assert "unknown.txt" in os.listdir(str(tmp_destination))
+
+
+def test_execute_with_state_index_verify_every_loop(
+    tmp_path, tmp_source, tmp_destination
+):
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(
+        state_index=str(tmp_path / "index.db"), verify_every=1
+    )
+    create_tmp_file(tmp_source, "file_name.txt", "Content")
+
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    sync_controller.execute()
+
+    create_tmp_file(tmp_destination, "unknown.txt", "Content")
+
+    sync_controller.execute()
+
+    assert os.listdir(str(tmp_destination)) == ["file_name.txt"]
+
+
+def test_execute_with_parallel_workers(tmp_source, tmp_destination):
+    tmp_sub_folder = create_tmp_folder(create_tmp_folder(tmp_source, "sub_1"), "sub_2")
+
+    for file_create in LEVEL_1:
+        create_tmp_file(tmp_source, file_create["name"], file_create["content"])
+        create_tmp_file(tmp_sub_folder, file_create["name"], file_create["content"])
+        create_tmp_file(tmp_destination, "delete_" + file_create["name"], "content")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(workers=4)
+
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    failures = sync_controller.execute()
+
+    assert failures == []
+    assert sorted(os.listdir(str(tmp_destination))) == [
+        "file1.txt", "file2.txt", "file3.txt", "sub_1"
+    ]
+    assert sorted(os.listdir(os.path.join(str(tmp_destination), "sub_1/sub_2"))) == [
+        "file1.txt", "file2.txt", "file3.txt"
+    ]
+
+
+def test_execute_with_shard_workers(tmp_source, tmp_destination):
+    tmp_sub_folder = create_tmp_folder(create_tmp_folder(tmp_source, "sub_1"), "sub_2")
+
+    for file_create in LEVEL_1:
+        create_tmp_file(tmp_source, file_create["name"], file_create["content"])
+        create_tmp_file(tmp_sub_folder, file_create["name"], file_create["content"])
+    create_tmp_file(tmp_destination, "delete.txt", "content", "sub_1")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(shard_workers=2, shard_depth=1)
+
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    failures = sync_controller.execute()
+
+    assert failures == []
+    assert sorted(os.listdir(str(tmp_destination))) == [
+        "file1.txt", "file2.txt", "file3.txt", "sub_1"
+    ]
+    assert os.listdir(os.path.join(str(tmp_destination), "sub_1")) == ["sub_2"]
+    assert sorted(os.listdir(os.path.join(str(tmp_destination), "sub_1/sub_2"))) == [
+        "file1.txt", "file2.txt", "file3.txt"
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_execute_moves_renamed_folder(tmp_path, tmp_source, tmp_destination, workers):
+    tmp_sub_folder = create_tmp_folder(tmp_source, "sub_1")
+    for file_create in LEVEL_2:
+        create_tmp_file(tmp_sub_folder, file_create["name"], file_create["content"])
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(
+        detect_moves=True, workers=workers, state_index=str(tmp_path / "index.db")
+    )
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    sync_controller.execute()
+    inode = os.stat(os.path.join(str(tmp_destination), "sub_1/sub_file1.txt")).st_ino
+
+    os.rename(tmp_sub_folder, os.path.join(str(tmp_source), "sub_2"))
+    os.rename(
+        os.path.join(str(tmp_source), "sub_2/sub_file2.txt"),
+        os.path.join(str(tmp_source), "sub_file2.txt"),
+    )
+    failures = sync_controller.execute()
+
+    assert failures == []
+    assert sorted(os.listdir(str(tmp_destination))) == ["sub_2", "sub_file2.txt"]
+    assert os.listdir(os.path.join(str(tmp_destination), "sub_2")) == ["sub_file1.txt"]
+    assert os.stat(os.path.join(str(tmp_destination), "sub_2/sub_file1.txt")).st_ino == inode
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_execute_keeps_hard_links(tmp_source, tmp_destination, workers):
+    tmp_sub_folder = create_tmp_folder(tmp_source, "sub_1")
+    file = create_tmp_file(tmp_source, "file1.txt", "content file 1")
+    for count in range(5):
+        os.link(file, tmp_sub_folder / f"link{count}.txt")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(hard_links=True, workers=workers)
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    failures = sync_controller.execute()
+
+    assert failures == []
+    assert os.stat(os.path.join(str(tmp_destination), "file1.txt")).st_nlink == 6
+    assert os.stat(os.path.join(str(tmp_destination), "sub_1/link4.txt")).st_ino == (
+        os.stat(os.path.join(str(tmp_destination), "file1.txt")).st_ino
+    )
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+@pytest.mark.parametrize("sha256", [False, True])
+def test_execute_keeps_hard_links_of_modified_file(
+    tmp_source, tmp_destination, workers, sha256
+):
+    tmp_sub_folder = create_tmp_folder(tmp_source, "sub_1")
+    file = create_tmp_file(tmp_source, "file1.txt", "content file 1")
+    os.link(file, tmp_source / "link.txt")
+    os.link(file, tmp_sub_folder / "link.txt")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(hard_links=True, workers=workers, sha256=sha256)
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    sync_controller.execute()
+
+    with open(file, "a", encoding="utf-8") as source_file:
+        source_file.write(" modified")
+
+    for _ in range(2):
+        assert sync_controller.execute() == []
+
+        inodes = {
+            os.stat(os.path.join(str(tmp_destination), path)).st_ino
+            for path in ("file1.txt", "link.txt", "sub_1/link.txt")
+        }
+        assert len(inodes) == 1
+        assert (tmp_destination / "sub_1" / "link.txt").read_text() == (
+            "content file 1 modified"
+        )
+
+
+def test_execute_links_again_split_hard_links(tmp_source, tmp_destination):
+    file = create_tmp_file(tmp_source, "file1.txt", "content file 1")
+    os.link(file, tmp_source / "link.txt")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(hard_links=True)
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    sync_controller.execute()
+
+    # a copy in place of a link, as left by a previous sync
+    link = os.path.join(str(tmp_destination), "link.txt")
+    os.unlink(link)
+    shutil.copy2(file, link)
+
+    sync_controller.execute()
+
+    assert os.stat(link).st_ino == os.stat(os.path.join(str(tmp_destination), "file1.txt")).st_ino
+
+
+def test_execute_with_dedup_store(tmp_path, tmp_source, tmp_destination):
+    tmp_sub_folder = create_tmp_folder(tmp_source, "sub_1")
+    for file_create in LEVEL_1:
+        create_tmp_file(tmp_source, file_create["name"], file_create["content"])
+    for file_create in LEVEL_2:
+        create_tmp_file(tmp_sub_folder, file_create["name"], file_create["content"])
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(sha256=True, dedup_store=str(tmp_path / "store"))
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+    sync_controller.execute()
+
+    assert os.stat(os.path.join(str(tmp_destination), "file1.txt")).st_ino == (
+        os.stat(os.path.join(str(tmp_destination), "sub_1/sub_file1.txt")).st_ino
+    )
+    assert len(os.listdir(str(tmp_path / "store/objects"))) == 3
+
+    os.remove(os.path.join(str(tmp_source), "file3.txt"))
+    sync_controller.execute()
+
+    assert sum(
+        len(files) for _, _, files in os.walk(str(tmp_path / "store/objects"))
+    ) == 2
+
+
+def test_plan_does_not_change_destination(tmp_path, tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file1.txt", "content file 1")
+    history = str(tmp_path / "history.json")
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(throughput_history=history)
+    SyncController(folder_settings, logger, options).execute()
+
+    create_tmp_file(tmp_source, "file2.txt", "content file 2")
+    create_tmp_file(tmp_destination, "deleted.txt", "deleted")
+    output = io.StringIO()
+    stats = SyncController(folder_settings, logger, options).plan(output)
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert lines[:-1] == [
+        {"action": "create_file", "path": "file2.txt", "origin": None, "bytes": 14},
+        {"action": "delete_file", "path": "deleted.txt", "origin": None, "bytes": 7},
+    ]
+    summary = lines[-1]["summary"]
+    assert summary["actions"] == {"create_file": 1, "delete_file": 1}
+    assert summary["bytes_to_copy"] == stats.bytes_to_copy == 14
+    assert summary["bytes_to_delete"] == 7
+    assert summary["estimated_seconds"] > 0
+    assert sorted(os.listdir(tmp_destination)) == ["deleted.txt", "file1.txt"]
+
+
+def test_execute_writes_metrics(tmp_path, tmp_source, tmp_destination, caplog):
+    create_tmp_file(tmp_source, "file1.txt", "content file 1")
+    create_tmp_folder(tmp_source, "folder")
+    options = SyncOptionsDataClass(
+        metrics_prom=str(tmp_path / "sync.prom"),
+        metrics_log=str(tmp_path / "metrics.jsonl"),
+        # any run takes more than the warning ratio of this interval
+        interval=1e-9,
+    )
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    sync_controller = SyncController(folder_settings, logger, options)
+
+    with caplog.at_level(logging.WARNING):
+        sync_controller.execute()
+        sync_controller.execute()
+
+    runs = [
+        json.loads(line)
+        for line in (tmp_path / "metrics.jsonl").read_text().splitlines()
+    ]
+    assert runs[0]["actions"] == {"create_file": 1, "create_folder": 1}
+    assert runs[0]["bytes"]["create_file"] == 14
+    assert sum(runs[0]["copy_methods"].values()) == 1
+    assert set(runs[0]["phases"]) == {"scan", "copy", "mkdir"}
+    assert runs[1]["actions"] == {}
+    assert runs[1]["phases"]["compare"]["count"] == 1
+    prom = (tmp_path / "sync.prom").read_text()
+    assert 'sync_actions_total{action="create_file"} 1' in prom
+    assert "sync_copy_method_total{method=" in prom
+    assert "close to the interval" in caplog.text
@@ -0,0 +1,123 @@
+import os
+import json
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import run_sync
+from diff_folders.walk_tree import ScanTarget
+
+RUN_SYNC = os.path.join(os.path.dirname(__file__), "..", "..", "run_sync.py")
+
+
+def run_sync_until(tmp_path, source, destination, options, synced, timeout=20):
+    """Run the sync entry point until synced returns True or the timeout"""
+    process = subprocess.Popen(
+        [sys.executable, RUN_SYNC, str(source), str(destination), "1",
+         str(tmp_path / "sync.log"), *options],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    deadline = time.monotonic() + timeout
+
+    try:
+        while time.monotonic() < deadline and process.poll() is None:
+            if synced():
+                return True
+            time.sleep(0.1)
+        return synced()
+    finally:
+        process.kill()
+        output, _ = process.communicate()
+        assert "Error on execution" not in output
+
+
+@pytest.mark.parametrize(
+    "options", [[], ["--workers", "4"], ["--scan-workers", "4"], ["--shard-workers", "2"]]
+)
+def test_run_sync_copies_files(tmp_path, tmp_source, tmp_destination, options):
+    (tmp_source / "folder").mkdir()
+    (tmp_source / "folder" / "file.txt").write_text("content")
+
+    assert run_sync_until(
+        tmp_path,
+        tmp_source,
+        tmp_destination,
+        options,
+        lambda: (tmp_destination / "folder" / "file.txt").exists(),
+    )
+
+
+def test_run_sync_updates_changed_files_with_hash_workers(
+    tmp_path, tmp_source, tmp_destination
+):
+    for folder in (tmp_source, tmp_destination):
+        (folder / "a").mkdir()
+    (tmp_source / "a" / "f1").write_text("new content")
+    (tmp_destination / "a" / "f1").write_text("old content")
+
+    assert run_sync_until(
+        tmp_path,
+        tmp_source,
+        tmp_destination,
+        ["--sha256", "--hash-workers", "4"],
+        lambda: (tmp_destination / "a" / "f1").read_text() == "new content",
+    )
+
+
+def test_run_sync_plan_with_shard_workers(tmp_path, tmp_source, tmp_destination):
+    (tmp_source / "folder").mkdir()
+    (tmp_source / "folder" / "file.txt").write_text("content")
+
+    completed = subprocess.run(
+        [sys.executable, RUN_SYNC, str(tmp_source), str(tmp_destination), "1",
+         str(tmp_path / "sync.log"), "--plan", "--shard-workers", "2"],
+        capture_output=True,
+        check=True,
+        text=True,
+        timeout=20,
+    )
+
+    # the log lines are on stderr, every stdout line is part of the plan
+    plan = [json.loads(line) for line in completed.stdout.splitlines()]
+    summary = plan[-1]["summary"]
+    assert summary["actions"] == {"create_folder": 1, "create_file": 1}
+    assert os.listdir(str(tmp_destination)) == []
+
+
+class FailingController:
+    def __init__(self, failing_calls):
+        self.failing_calls = failing_calls
+        self.calls = []
+
+    def execute(self, targets=None):
+        self.calls.append(targets)
+        if len(self.calls) in self.failing_calls:
+            raise OSError("sync failed")
+        return []
+
+
+class FakeWatcher:
+    def __init__(self, source, symlink=False):
+        self.closed = False
+        FakeWatcher.instance = self
+
+    def changes(self):
+        yield [ScanTarget(common_root="folder", recursive=True)]
+
+    def close(self):
+        self.closed = True
+
+
+def test_watch_retries_failed_targets_with_full_scan(monkeypatch):
+    monkeypatch.setattr(run_sync, "InotifyWatcher", FakeWatcher)
+    controller = FailingController(failing_calls={2})
+
+    run_sync.watch(controller, SimpleNamespace(source="", symlink=False, interval=0))
+
+    assert controller.calls == [None, [ScanTarget(common_root="folder", recursive=True)], None]
+    assert FakeWatcher.instance.closed
@@ -0,0 +1,47 @@
+import pickle
+import sys
+
+from diff_folders.actions import ActionBatch, GetActionResponse, batch_actions
+from settings import DiffActionsEnum
+
+ACTIONS = [
+    GetActionResponse(common_root="", name="file.txt", action=DiffActionsEnum.CREATE_FILE),
+    GetActionResponse(
+        common_root="", name="moved", action=DiffActionsEnum.MOVE_FOLDER, origin="folder"
+    ),
+    GetActionResponse(
+        common_root="moved", name="old.txt", action=DiffActionsEnum.DELETE_FILE
+    ),
+    GetActionResponse(common_root="", name="other.txt", action=DiffActionsEnum.UPDATE_FILE),
+]
+
+
+def test_action_record_has_no_dict():
+    assert not hasattr(ACTIONS[0], "__dict__")
+
+
+def test_batch_keeps_actions():
+    batch = ActionBatch("")
+    for action in ACTIONS[:2]:
+        batch.append(action)
+
+    assert len(batch) == 2
+    assert list(batch) == ACTIONS[:2]
+
+
+def test_batch_actions_group_consecutive_folder_actions():
+    batches = list(batch_actions(ACTIONS))
+
+    assert [(batch.common_root, len(batch)) for batch in batches] == [
+        ("", 2), ("moved", 1), ("", 1)
+    ]
+    assert [action for batch in batches for action in batch] == ACTIONS
+
+
+def test_batch_pickles_columns():
+    batch = next(batch_actions(ACTIONS[:2]))
+
+    restored = pickle.loads(pickle.dumps(batch))
+
+    assert list(restored) == ACTIONS[:2]
+    assert restored.common_root is sys.intern("")
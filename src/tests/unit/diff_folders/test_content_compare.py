@@ -0,0 +1,163 @@
+import hashlib
+import os
+
+import pytest
+
+from diff_folders.content_compare import (extents_differ, samples_differ,
+                                          stream_differ)
+from diff_folders.hash_cache import HashCache
+from diff_folders.hashing import file_digest
+from file_system.sparse import is_sparse
+from diff_folders.walk_tree import DiffTree
+from settings import COMPARE_SAMPLE_SIZE, FolderSettingsDataClass, SyncOptionsDataClass
+from tests.conftest import create_tmp_file
+
+SIZE = COMPARE_SAMPLE_SIZE * 10
+MB = 1024 * 1024
+
+
+def write_files(tmp_source, tmp_destination, content_1, content_2):
+    source_file = tmp_source / "file.bin"
+    destination_file = tmp_destination / "file.bin"
+    source_file.write_bytes(content_1)
+    destination_file.write_bytes(content_2)
+
+    return source_file, destination_file
+
+
+def test_samples_differ_on_middle_block(tmp_source, tmp_destination):
+    content = os.urandom(SIZE)
+    changed = bytearray(content)
+    changed[SIZE // 2] ^= 0xff
+    source_file, destination_file = write_files(
+        tmp_source, tmp_destination, content, bytes(changed)
+    )
+
+    with open(source_file, "rb") as fsrc, open(destination_file, "rb") as fdst:
+        assert samples_differ(fsrc.fileno(), fdst.fileno(), SIZE)
+
+
+def test_stream_differ_outside_samples(tmp_source, tmp_destination):
+    content = os.urandom(SIZE)
+    changed = bytearray(content)
+    changed[COMPARE_SAMPLE_SIZE * 2] ^= 0xff
+    source_file, destination_file = write_files(
+        tmp_source, tmp_destination, content, bytes(changed)
+    )
+
+    with open(source_file, "rb", buffering=0) as fsrc, \
+            open(destination_file, "rb", buffering=0) as fdst:
+        assert not samples_differ(fsrc.fileno(), fdst.fileno(), SIZE)
+        assert stream_differ(fsrc, fdst)
+
+
+def test_stream_of_equal_files_hash_content(tmp_source, tmp_destination):
+    content = os.urandom(SIZE + 1)
+    source_file, destination_file = write_files(
+        tmp_source, tmp_destination, content, content
+    )
+    sha256 = hashlib.sha256()
+
+    with open(source_file, "rb", buffering=0) as fsrc, \
+            open(destination_file, "rb", buffering=0) as fdst:
+        assert not stream_differ(fsrc, fdst, sha256)
+
+    assert sha256.hexdigest() == hashlib.sha256(content).hexdigest()
+
+
+def test_equal_files_digest_is_cached_for_both(tmp_path, tmp_source, tmp_destination):
+    source_file = create_tmp_file(tmp_source, "file.txt", "content")
+    destination_file = create_tmp_file(tmp_destination, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+    diff_tree = DiffTree(
+        folder_settings=FolderSettingsDataClass(
+            source=str(tmp_source), destination=str(tmp_destination)
+        ),
+        options=SyncOptionsDataClass(sha256=True),
+        hash_cache=cache,
+    )
+
+    assert not diff_tree._is_diff_sha256(common_root="", filename="file.txt")
+
+    digest = hashlib.sha256(b"content").hexdigest()
+    assert cache.get(os.stat(source_file)) == digest
+    assert cache.get(os.stat(destination_file)) == digest
+
+
+def test_cached_digests_are_compared_without_reading(
+    tmp_path, tmp_source, tmp_destination
+):
+    source_file = create_tmp_file(tmp_source, "file.txt", "content")
+    destination_file = create_tmp_file(tmp_destination, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+    cache.put(os.stat(source_file), "digest 1")
+    cache.put(os.stat(destination_file), "digest 2")
+    diff_tree = DiffTree(
+        folder_settings=FolderSettingsDataClass(
+            source=str(tmp_source), destination=str(tmp_destination)
+        ),
+        options=SyncOptionsDataClass(sha256=True),
+        hash_cache=cache,
+    )
+
+    assert diff_tree._is_diff_sha256(common_root="", filename="file.txt")
+
+
+def write_sparse_file(path, extents):
+    with open(path, "wb") as f:
+        f.truncate(32 * MB)
+        for offset, data in extents:
+            f.seek(offset)
+            f.write(data)
+
+    if not is_sparse(os.stat(path)):
+        pytest.skip("file system does not support sparse files")
+
+    return path
+
+
+def test_extents_of_equal_sparse_files_hash_content(tmp_source, tmp_destination):
+    extents = [(4 * MB, b"data" * 1024), (20 * MB, b"more data" * 1024)]
+    source_file = write_sparse_file(tmp_source / "sparse.img", extents)
+    destination_file = write_sparse_file(tmp_destination / "sparse.img", extents)
+    sha256 = hashlib.sha256()
+
+    with open(source_file, "rb", buffering=0) as fsrc, \
+            open(destination_file, "rb", buffering=0) as fdst:
+        assert not extents_differ(fsrc, fdst, 32 * MB, sha256)
+
+    assert sha256.hexdigest() == file_digest(str(source_file))
+
+
+def test_sparse_files_with_other_extents_differ(tmp_source, tmp_destination):
+    source_file = write_sparse_file(tmp_source / "sparse.img", [(4 * MB, b"data")])
+    destination_file = write_sparse_file(
+        tmp_destination / "sparse.img", [(4 * MB, b"data"), (20 * MB, b"data")]
+    )
+
+    with open(source_file, "rb", buffering=0) as fsrc, \
+            open(destination_file, "rb", buffering=0) as fdst:
+        assert extents_differ(fsrc, fdst, 32 * MB)
+
+
+def test_sparse_files_differ_inside_extent(tmp_source, tmp_destination):
+    source_file = write_sparse_file(tmp_source / "sparse.img", [(4 * MB, b"data")])
+    destination_file = write_sparse_file(tmp_destination / "sparse.img", [(4 * MB, b"date")])
+
+    with open(source_file, "rb", buffering=0) as fsrc, \
+            open(destination_file, "rb", buffering=0) as fdst:
+        assert extents_differ(fsrc, fdst, 32 * MB)
+
+
+def test_diff_of_equal_sparse_files(tmp_source, tmp_destination):
+    extents = [(4 * MB, b"data" * 1024)]
+    write_sparse_file(tmp_source / "sparse.img", extents)
+    write_sparse_file(tmp_destination / "sparse.img", extents)
+    diff_tree = DiffTree(
+        folder_settings=FolderSettingsDataClass(
+            source=str(tmp_source), destination=str(tmp_destination)
+        ),
+        options=SyncOptionsDataClass(sha256=True),
+    )
+
+    assert not diff_tree._is_diff_sha256(common_root="", filename="sparse.img")
@@ -4,7 +4,8 @@ import shutil
 import pytest
 
 from diff_folders.walk_tree import DiffTree
-from settings import DiffActionsEnum, FolderSettingsDataClass
+from settings import (DiffActionsEnum, FolderSettingsDataClass,
+                      SyncOptionsDataClass)
 from tests.conftest import create_tmp_file, create_tmp_folder
 
 LEVEL_1  = [
@@ -158,3 +159,22 @@ def test_get_any_actions_when_both_folders_is_synced(tmp_source, tmp_destination
         count+=1
 
     assert count == 0
+
+
+def test_get_actions_update_with_sha256_hash_workers(tmp_source, tmp_destination):
+    for count in range(20):
+        create_tmp_file(tmp_source, f"file{count}.txt", f"content {count}")
+        create_tmp_file(tmp_destination, f"file{count}.txt", f"content {count % 2}")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(sha256=True, hash_workers=4)
+
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+    actions = list(diff_tree.get_actions())
+
+    assert {action.name for action in actions} == {
+        f"file{count}.txt" for count in range(2, 20)
+    }
+    assert {action.action for action in actions} == {DiffActionsEnum.UPDATE_FILE}
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from diff_folders import walk_tree
+from diff_folders.walk_tree import DiffTree
+from settings import DiffActionsEnum, FolderSettingsDataClass, SyncOptionsDataClass
+from tests.conftest import create_tmp_file, create_tmp_folder
+
+
+def get_actions(tmp_source, tmp_destination, hard_links):
+    diff_tree = DiffTree(
+        folder_settings=FolderSettingsDataClass(
+            source=str(tmp_source), destination=str(tmp_destination)
+        ),
+        options=SyncOptionsDataClass(hard_links=hard_links),
+    )
+
+    return [
+        (action.action, os.path.join(action.common_root, action.name), action.origin)
+        for action in diff_tree.get_actions()
+    ]
+
+
+def test_other_names_of_inode_are_linked(tmp_source, tmp_destination):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    os.link(file, create_tmp_folder(tmp_source, "folder") / "link.txt")
+
+    actions = get_actions(tmp_source, tmp_destination, hard_links=True)
+
+    assert actions == [
+        (DiffActionsEnum.CREATE_FILE, "file.txt", None),
+        (DiffActionsEnum.CREATE_FOLDER, "folder", None),
+        (DiffActionsEnum.LINK_FILE, "folder/link.txt", "file.txt"),
+    ]
+
+
+def test_new_name_is_linked_to_synced_name(tmp_source, tmp_destination):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    os.link(file, tmp_source / "link.txt")
+    create_tmp_file(tmp_destination, "file.txt", "content")
+    os.utime(tmp_destination / "file.txt", ns=(0, os.stat(file).st_mtime_ns))
+
+    actions = get_actions(tmp_source, tmp_destination, hard_links=True)
+
+    assert actions == [(DiffActionsEnum.LINK_FILE, "link.txt", "file.txt")]
+
+
+def test_hard_links_are_copied_by_default(tmp_source, tmp_destination):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    os.link(file, tmp_source / "link.txt")
+
+    actions = get_actions(tmp_source, tmp_destination, hard_links=False)
+
+    assert sorted(path for _, path, _ in actions) == ["file.txt", "link.txt"]
+    assert {action for action, _, _ in actions} == {DiffActionsEnum.CREATE_FILE}
+
+
+@pytest.mark.parametrize("merge_join_min_files", [100_000, 0])
+def test_changed_origin_is_updated_before_new_link(
+    tmp_source, tmp_destination, monkeypatch, merge_join_min_files
+):
+    monkeypatch.setattr(walk_tree, "MERGE_JOIN_MIN_FILES", merge_join_min_files)
+    file = create_tmp_file(tmp_source, "z_file.txt", "new content")
+    os.link(file, tmp_source / "a_link.txt")
+    create_tmp_file(tmp_destination, "z_file.txt", "old")
+
+    actions = get_actions(tmp_source, tmp_destination, hard_links=True)
+
+    assert actions == [
+        (DiffActionsEnum.UPDATE_FILE, "z_file.txt", None),
+        (DiffActionsEnum.LINK_FILE, "a_link.txt", "z_file.txt"),
+    ]
@@ -0,0 +1,87 @@
+import os
+
+from diff_folders.hash_cache import HashCache
+from diff_folders.hashing import file_digest
+from diff_folders.walk_tree import DiffTree
+from settings import FolderSettingsDataClass, SyncOptionsDataClass
+from tests.conftest import create_tmp_file
+
+
+def test_cached_digest_of_not_modified_file(tmp_path, tmp_source):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+
+    assert cache.get(os.stat(file)) is None
+
+    cache.put(os.stat(file), "digest")
+
+    assert cache.get(os.stat(file)) == "digest"
+
+
+def test_cached_digest_is_invalid_after_modification(tmp_path, tmp_source):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+    cache.put(os.stat(file), "digest")
+
+    file.write_text("new content")
+
+    assert cache.get(os.stat(file)) is None
+
+
+def test_least_recently_used_digests_are_evicted(tmp_path, tmp_source):
+    files = [
+        create_tmp_file(tmp_source, f"file{count}.txt", "content") for count in range(3)
+    ]
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=2)
+
+    for file in files:
+        cache.put(os.stat(file), file.name)
+    cache.get(os.stat(files[0]))
+    cache.commit()
+
+    assert cache.get(os.stat(files[0])) == "file0.txt"
+    assert cache.get(os.stat(files[1])) is None
+    assert cache.get(os.stat(files[2])) == "file2.txt"
+
+
+def test_cache_is_persisted(tmp_path, tmp_source):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+    cache.put(os.stat(file), "digest")
+    cache.close()
+
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+
+    assert cache.get(os.stat(file)) == "digest"
+
+
+def test_remember_copy_store_destination_digest(tmp_path, tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10)
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    diff_tree = DiffTree(
+        folder_settings=folder_settings,
+        options=SyncOptionsDataClass(sha256=True),
+        hash_cache=cache,
+    )
+    dest_file = tmp_destination / "file.txt"
+    dest_file.write_text("content")
+    os.utime(dest_file, ns=(0, os.stat(tmp_source / "file.txt").st_mtime_ns))
+
+    diff_tree.remember_copy("file.txt")
+
+    assert cache.get(os.stat(dest_file)) == file_digest(str(dest_file))
+    assert not diff_tree._is_diff_sha256(common_root="", filename="file.txt")
+
+
+def test_digest_of_other_algorithm_is_not_returned(tmp_path, tmp_source):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10, algorithm="sha256")
+    cache.put(os.stat(file), "digest")
+    cache.close()
+
+    cache = HashCache(str(tmp_path / "cache.db"), max_entries=10, algorithm="blake2b")
+
+    assert cache.get(os.stat(file)) is None
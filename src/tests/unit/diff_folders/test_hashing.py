@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+import pytest
+
+from diff_folders import hashing
+from diff_folders.hashing import file_digest
+from settings import HashAlgorithmEnum
+
+
+@pytest.mark.parametrize("mmap_min_size", [0, None])
+def test_sha256_mapped_and_buffered(tmp_source, monkeypatch, mmap_min_size):
+    monkeypatch.setattr(hashing, "HASH_BUFFER_SIZE", 1000)
+    content = os.urandom(1024 * 10 + 7)
+    file = tmp_source / "file.bin"
+    file.write_bytes(content)
+
+    assert file_digest(
+        str(file), mmap_min_size=mmap_min_size
+    ) == hashlib.sha256(content).hexdigest()
+
+
+def test_sha256_of_empty_file_is_not_mapped(tmp_source):
+    file = tmp_source / "file.bin"
+    file.write_bytes(b"")
+
+    assert file_digest(str(file), mmap_min_size=0) == hashlib.sha256(b"").hexdigest()
+
+
+def test_file_is_not_mapped_by_default(tmp_source, monkeypatch):
+    def mmap_update(hasher, f):
+        raise AssertionError("file mapped")
+
+    monkeypatch.setattr(hashing, "_mmap_update", mmap_update)
+    file = tmp_source / "file.bin"
+    file.write_bytes(b"content")
+
+    assert file_digest(str(file)) == hashlib.sha256(b"content").hexdigest()
+
+
+@pytest.mark.parametrize("algorithm", list(HashAlgorithmEnum))
+def test_file_digest_of_each_algorithm(tmp_source, algorithm):
+    content = os.urandom(1024 * 10)
+    file = tmp_source / "file.bin"
+    file.write_bytes(content)
+
+    assert file_digest(str(file), algorithm) == hashlib.new(
+        algorithm.value, content
+    ).hexdigest()
@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from diff_folders import state_index, walk_tree
+from diff_folders.merge_join import SortedNames, merge_join
+from diff_folders.state_index import SyncStateIndex
+from diff_folders.walk_tree import DiffTree
+from settings import DiffActionsEnum, FolderSettingsDataClass, SyncOptionsDataClass
+
+
+def actions_of(diff_tree, **kwargs):
+    return {
+        (os.path.join(action.common_root, action.name), action.action)
+        for action in diff_tree.get_actions(**kwargs)
+    }
+
+
+def write_files(folder, names, content="content"):
+    for name in names:
+        (folder / name).write_text(content)
+
+
+def test_sorted_names_spill_runs_and_iterate_sorted():
+    names = [f"file_{number:04}" for number in range(1000)]
+    # a name not valid utf-8 is kept as surrogate escape
+    names.append(os.fsdecode(b"invalid_\xff"))
+    # sorted after the surrogate escape by the encoded names, as on the state index
+    names.append("invalid_\U0001f600")
+    sorted_names = SortedNames(run_size=64)
+
+    for name in reversed(names):
+        sorted_names.add(name)
+
+    assert len(sorted_names._runs) == len(names) // 64
+    assert list(sorted_names) == sorted(names, key=os.fsencode)
+    # the runs are read again on each iteration
+    assert list(sorted_names) == sorted(names, key=os.fsencode)
+
+    sorted_names.close()
+    assert list(sorted_names) == []
+
+
+def test_merge_join_yields_names_of_both_sides():
+    joined = list(merge_join(["a", "b", "d"], ["b", "c", "d", "e"]))
+
+    assert joined == [
+        ("a", True, False),
+        ("b", True, True),
+        ("c", False, True),
+        ("d", True, True),
+        ("e", False, True),
+    ]
+    assert list(merge_join([], ["a"])) == [("a", False, True)]
+    assert list(merge_join(["a"], [])) == [("a", True, False)]
+
+
+@pytest.mark.parametrize("sha256", [False, True])
+def test_large_folder_merge_join_matches_sets_diff(
+    tmp_source, tmp_destination, monkeypatch, sha256
+):
+    write_files(tmp_source, [f"both_{number}" for number in range(30)])
+    write_files(tmp_destination, [f"both_{number}" for number in range(30)])
+    write_files(tmp_source, [f"new_{number}" for number in range(20)])
+    write_files(tmp_destination, [f"old_{number}" for number in range(20)])
+    write_files(tmp_destination, ["both_7"], "changed content")
+    (tmp_source / "folder").mkdir()
+    (tmp_destination / "old_folder").mkdir()
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(sha256=sha256, hash_workers=2)
+    expected = actions_of(DiffTree(folder_settings=folder_settings, options=options))
+
+    monkeypatch.setattr(walk_tree, "MERGE_JOIN_MIN_FILES", 10)
+    monkeypatch.setattr(walk_tree, "SORT_RUN_SIZE", 8)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+
+    assert actions_of(diff_tree) == expected
+    assert ("both_7", DiffActionsEnum.UPDATE_FILE) in expected
+    assert ("old_folder", DiffActionsEnum.DELETE_FOLDER) in expected
+
+
+def test_large_folder_merge_join_with_state_index(
+    tmp_path, tmp_source, tmp_destination, monkeypatch
+):
+    # names sorted differently as text and as encoded names
+    unordered = [os.fsdecode(b"invalid_\xff"), "invalid_\U0001f600"]
+    write_files(tmp_source, [f"file_{number}" for number in range(30)] + unordered)
+    write_files(tmp_destination, [f"file_{number}" for number in range(20)] + unordered)
+    write_files(tmp_destination, ["deleted"])
+
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+    index.rebuild()
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    expected = actions_of(DiffTree(folder_settings=folder_settings, state_index=index))
+
+    monkeypatch.setattr(walk_tree, "MERGE_JOIN_MIN_FILES", 10)
+    monkeypatch.setattr(state_index, "INDEX_PAGE_SIZE", 7)
+    diff_tree = DiffTree(folder_settings=folder_settings, state_index=index)
+
+    assert list(index.sorted_files("")) == sorted(os.listdir(tmp_destination), key=os.fsencode)
+    assert actions_of(diff_tree) == expected
+    assert ("deleted", DiffActionsEnum.DELETE_FILE) in expected
+    assert ("file_25", DiffActionsEnum.CREATE_FILE) in expected
+    # the names on both sides are joined, never created or deleted
+    assert {action for name, action in expected if name in unordered} <= {
+        DiffActionsEnum.UPDATE_FILE
+    }
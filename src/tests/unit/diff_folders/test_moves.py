@@ -0,0 +1,77 @@
+import os
+import shutil
+
+from diff_folders.walk_tree import DiffTree
+from settings import DiffActionsEnum, FolderSettingsDataClass, SyncOptionsDataClass
+from tests.conftest import create_tmp_file, create_tmp_folder
+
+
+def get_actions(tmp_source, tmp_destination, **options):
+    diff_tree = DiffTree(
+        folder_settings=FolderSettingsDataClass(
+            source=str(tmp_source), destination=str(tmp_destination)
+        ),
+        options=SyncOptionsDataClass(detect_moves=True, **options),
+    )
+
+    return [
+        (action.action, os.path.join(action.common_root, action.name), action.origin)
+        for action in diff_tree.get_actions()
+    ]
+
+
+def synced_tree(tmp_source, tmp_destination):
+    photos = create_tmp_folder(tmp_destination, "photos")
+    create_tmp_file(photos, "a.jpg", "content a")
+    create_tmp_file(photos, "b.jpg", "content b", sub_folders="2023")
+    create_tmp_file(tmp_destination, "notes.txt", "content notes")
+
+    shutil.rmtree(tmp_source)
+    shutil.copytree(tmp_destination, tmp_source)
+
+
+def test_renamed_folder_is_moved(tmp_source, tmp_destination):
+    synced_tree(tmp_source, tmp_destination)
+    os.rename(tmp_source / "photos", tmp_source / "archive")
+
+    assert get_actions(tmp_source, tmp_destination) == [
+        (DiffActionsEnum.MOVE_FOLDER, "archive", "photos"),
+    ]
+
+
+def test_renamed_file_is_moved(tmp_source, tmp_destination):
+    synced_tree(tmp_source, tmp_destination)
+    os.rename(tmp_source / "notes.txt", tmp_source / "photos" / "notes.txt")
+
+    assert get_actions(tmp_source, tmp_destination, sha256=True) == [
+        (DiffActionsEnum.MOVE_FILE, "photos/notes.txt", "notes.txt"),
+    ]
+
+
+def test_file_with_other_content_is_not_moved(tmp_source, tmp_destination):
+    synced_tree(tmp_source, tmp_destination)
+    os.rename(tmp_source / "notes.txt", tmp_source / "moved.txt")
+    (tmp_destination / "notes.txt").write_text("content other")
+    os.utime(
+        tmp_destination / "notes.txt", ns=(0, os.stat(tmp_source / "moved.txt").st_mtime_ns)
+    )
+
+    assert set(get_actions(tmp_source, tmp_destination, sha256=True)) == {
+        (DiffActionsEnum.CREATE_FILE, "moved.txt", None),
+        (DiffActionsEnum.DELETE_FILE, "notes.txt", None),
+    }
+
+
+def test_modified_folder_moves_files_before_delete(tmp_source, tmp_destination):
+    synced_tree(tmp_source, tmp_destination)
+    os.rename(tmp_source / "photos", tmp_source / "archive")
+    create_tmp_file(tmp_source / "archive", "c.jpg", "content c")
+
+    actions = get_actions(tmp_source, tmp_destination)
+
+    assert (DiffActionsEnum.MOVE_FOLDER, "archive/2023", "photos/2023") in actions
+    assert (DiffActionsEnum.MOVE_FILE, "archive/a.jpg", "photos/a.jpg") in actions
+    assert (DiffActionsEnum.CREATE_FILE, "archive/c.jpg", None) in actions
+    assert actions.index((DiffActionsEnum.CREATE_FOLDER, "archive", None)) == 0
+    assert actions[-1] == (DiffActionsEnum.DELETE_FOLDER, "photos", None)
+    assert len(actions) == 5
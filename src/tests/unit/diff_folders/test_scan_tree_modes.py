@@ -0,0 +1,217 @@
+import os
+
+import pytest
+
+from diff_folders.walk_tree import DiffTree, ScanTarget
+from settings import (DiffActionsEnum, FolderSettingsDataClass,
+                      ScanModeEnum, SyncOptionsDataClass)
+from tests.conftest import create_tmp_file, create_tmp_folder
+
+OLD_MTIME_NS = 1_000_000_000_000_000_000
+
+
+def set_old_mtime(folder):
+    os.utime(str(folder), ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+
+
+def walk_names(scan):
+    return sorted(
+        (diff.common_root, diff.source.folders, diff.source.files) for diff in scan
+    )
+
+
+def test_scan_tree_full_scan(tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file.txt", "content", "sub_folder/sub")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    diff_tree = DiffTree(folder_settings=folder_settings)
+
+    walk = walk_names(diff_tree._scan_tree_generator())
+
+    assert walk == [
+        ("", {"sub_folder"}, set()),
+        ("sub_folder", {"sub"}, set()),
+        (os.path.join("sub_folder", "sub"), set(), {"file.txt"}),
+    ]
+
+
+def test_scan_tree_incremental_reuse_listing_of_not_modified_folder(
+    tmp_source, tmp_destination
+):
+    create_tmp_file(tmp_source, "file.txt", "content")
+    set_old_mtime(tmp_source)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_mode=ScanModeEnum.INCREMENTAL)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+
+    assert walk_names(diff_tree._scan_tree_generator()) == [("", set(), {"file.txt"})]
+    diff_tree.end_scan(applied=True)
+
+    # a new file with the folder last modified date restored is not listed
+    create_tmp_file(tmp_source, "new_file.txt", "content")
+    set_old_mtime(tmp_source)
+
+    assert walk_names(diff_tree._scan_tree_generator()) == [("", set(), {"file.txt"})]
+    assert walk_names(diff_tree._scan_tree_generator(verify=True)) == [
+        ("", set(), {"file.txt", "new_file.txt"})
+    ]
+
+
+def test_scan_tree_incremental_read_modified_folder(tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file.txt", "content")
+    set_old_mtime(tmp_source)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_mode=ScanModeEnum.INCREMENTAL)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+
+    walk_names(diff_tree._scan_tree_generator())
+    create_tmp_file(tmp_source, "new_file.txt", "content")
+
+    assert walk_names(diff_tree._scan_tree_generator()) == [
+        ("", set(), {"file.txt", "new_file.txt"})
+    ]
+
+
+def test_scan_tree_trust_dirs_skip_not_modified_folder(tmp_source, tmp_destination):
+    sub_folder = create_tmp_folder(tmp_source, "sub_folder")
+    create_tmp_file(tmp_source, "file.txt", "content")
+    set_old_mtime(tmp_source)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_mode=ScanModeEnum.TRUST_DIRS)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+
+    assert len(walk_names(diff_tree._scan_tree_generator())) == 2
+    diff_tree.end_scan(applied=True)
+
+    # only the modified sub folder is yielded
+    create_tmp_file(sub_folder, "new_file.txt", "content")
+
+    assert walk_names(diff_tree._scan_tree_generator()) == [("sub_folder", set(), {"new_file.txt"})]
+
+
+@pytest.mark.parametrize("scan_workers", [1, 4])
+def test_scan_tree_only_targets(tmp_source, tmp_destination, scan_workers):
+    create_tmp_file(tmp_source, "file.txt", "content", "folder_1/sub")
+    create_tmp_file(tmp_source, "file.txt", "content", "folder_2/sub")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_workers=scan_workers)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+    targets = [
+        ScanTarget(common_root="folder_1", recursive=False),
+        ScanTarget(common_root="folder_2", recursive=True),
+    ]
+
+    # targets are scanned in the given order, before the sub folders
+    walk = [
+        (diff.common_root, diff.source.folders, diff.source.files)
+        for diff in diff_tree._scan_tree_generator(targets=targets)
+    ]
+
+    assert walk == [
+        ("folder_1", {"sub"}, set()),
+        ("folder_2", {"sub"}, set()),
+        (os.path.join("folder_2", "sub"), set(), {"file.txt"}),
+    ]
+
+
+@pytest.mark.parametrize("scan_workers", [1, 4])
+def test_get_actions_of_targets_create_parent_folder_first(
+    tmp_source, tmp_destination, scan_workers
+):
+    create_tmp_folder(create_tmp_folder(tmp_source, "z"), "y")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_workers=scan_workers)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+    targets = [
+        ScanTarget(common_root="", recursive=False),
+        ScanTarget(common_root="z", recursive=True),
+    ]
+
+    actions = [
+        (action.common_root, action.name, action.action)
+        for action in diff_tree.get_actions(targets=targets)
+    ]
+
+    assert actions == [
+        ("", "z", DiffActionsEnum.CREATE_FOLDER),
+        ("z", "y", DiffActionsEnum.CREATE_FOLDER),
+    ]
+
+
+def test_scan_tree_keep_files_dir_entry(tmp_source, tmp_destination):
+    file = create_tmp_file(tmp_source, "file.txt", "content")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    diff_tree = DiffTree(folder_settings=folder_settings)
+
+    [diff] = list(diff_tree._scan_tree_generator())
+
+    assert diff.source.entries["file.txt"].path == str(file)
+    assert diff.source.entries["file.txt"].stat().st_size == os.stat(file).st_size
+
+
+def test_scan_tree_with_scan_workers(tmp_source, tmp_destination):
+    for count in range(5):
+        create_tmp_file(tmp_source, "file.txt", "content", f"folder_{count}/sub")
+        create_tmp_file(tmp_destination, "file.txt", "content", f"folder_{count}")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_workers=4)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+
+    scan = list(diff_tree._scan_tree_generator())
+
+    assert scan[0].common_root == ""
+    assert len(scan) == 11
+    for diff in scan:
+        if diff.common_root.endswith("sub"):
+            assert diff.source.files == {"file.txt"}
+            assert diff.destination.files == set()
+        elif diff.common_root:
+            assert diff.source.folders == {"sub"}
+            assert diff.destination.files == {"file.txt"}
+
+
+def test_scan_tree_keeps_listing_only_of_applied_scan(tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file.txt", "content", "sub_folder")
+    set_old_mtime(tmp_source)
+    set_old_mtime(tmp_source / "sub_folder")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_mode=ScanModeEnum.TRUST_DIRS)
+    diff_tree = DiffTree(folder_settings=folder_settings, options=options)
+
+    # actions not applied, the folders are read again
+    assert len(walk_names(diff_tree._scan_tree_generator())) == 2
+    diff_tree.end_scan(applied=False)
+    assert len(walk_names(diff_tree._scan_tree_generator())) == 2
+
+    # a failed action on sub folder, only sub folder is read again
+    diff_tree.end_scan(applied=True, failed_roots=["sub_folder"])
+    assert walk_names(diff_tree._scan_tree_generator()) == [
+        ("sub_folder", set(), {"file.txt"})
+    ]
+
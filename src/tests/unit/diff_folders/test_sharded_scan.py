@@ -0,0 +1,99 @@
+import os
+
+from diff_folders import sharded_scan
+from diff_folders.sharded_scan import ShardedDiffTree
+from diff_folders.walk_tree import DiffTree, ScanTarget
+from settings import FolderSettingsDataClass, SyncOptionsDataClass
+from tests.conftest import create_tmp_file, create_tmp_folder
+
+
+def actions_set(actions):
+    return {(action.common_root, action.name, action.action) for action in actions}
+
+
+def create_tree(tmp_source):
+    create_tmp_file(tmp_source, "root.txt", "content")
+    for folder in ("a", "b"):
+        tmp_folder = create_tmp_folder(tmp_source, folder)
+        for sub_folder in ("x", "y"):
+            create_tmp_file(create_tmp_folder(tmp_folder, sub_folder), "file.txt", "content")
+
+
+def test_scan_unit_splits_sub_folders_at_shard_depth(tmp_source, tmp_destination):
+    create_tree(tmp_source)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(shard_depth=2)
+    diff_tree = ShardedDiffTree(folder_settings=folder_settings, options=options)
+
+    batches, split = diff_tree.scan_unit(ScanTarget(common_root="", recursive=True))
+
+    assert sorted(target.common_root for target in split) == [
+        os.path.join("a", "x"), os.path.join("a", "y"),
+        os.path.join("b", "x"), os.path.join("b", "y"),
+    ]
+    assert sorted(batch.common_root for batch in batches) == ["", "a", "b"]
+
+
+def test_scan_unit_splits_folders_left_over_the_unit_limit(
+    tmp_source, tmp_destination, monkeypatch
+):
+    create_tree(tmp_source)
+    monkeypatch.setattr(sharded_scan, "SHARD_UNIT_FOLDERS", 2)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(shard_depth=3)
+    diff_tree = ShardedDiffTree(folder_settings=folder_settings, options=options)
+
+    batches, split = diff_tree.scan_unit(ScanTarget(common_root="", recursive=True))
+
+    # the root and the last sub folder are scanned, the folders pending are split
+    assert len(batches) == 2
+    assert len(split) == 3
+    assert all(target.recursive for target in split)
+
+
+def test_sharded_actions_equal_serial_actions(tmp_source, tmp_destination):
+    create_tree(tmp_source)
+    create_tmp_file(tmp_destination, "root.txt", "other content")
+    create_tmp_file(tmp_destination, "deleted.txt", "content", "a")
+    create_tmp_folder(tmp_destination, "c")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(shard_workers=2)
+    sharded_tree = ShardedDiffTree(folder_settings=folder_settings, options=options)
+    serial_tree = DiffTree(folder_settings=folder_settings)
+
+    sharded = list(sharded_tree.get_actions())
+
+    assert actions_set(sharded) == actions_set(serial_tree.get_actions())
+    # the actions of a folder come before the actions of its sub folders
+    positions = {action.common_root: position for position, action in enumerate(sharded)}
+    assert positions["a"] < positions[os.path.join("a", "x")]
+
+
+def test_worker_processes_are_kept_between_scans(tmp_source, tmp_destination):
+    create_tree(tmp_source)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(shard_workers=2)
+    sharded_tree = ShardedDiffTree(folder_settings=folder_settings, options=options)
+
+    try:
+        first = actions_set(sharded_tree.get_actions())
+        pool = sharded_tree._pool
+
+        assert actions_set(sharded_tree.get_actions()) == first
+        assert sharded_tree._pool is pool
+    finally:
+        sharded_tree.close()
+
+    assert sharded_tree._pool is None
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+
+from diff_folders.state_index import SyncStateIndex
+from tests.conftest import create_tmp_file, create_tmp_folder
+
+
+def test_index_starts_empty(tmp_path, tmp_destination):
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+
+    assert index.is_empty()
+    assert index.list_folder("") == (set(), set())
+
+
+def test_record_and_list_folder(tmp_path, tmp_destination):
+    file = create_tmp_file(tmp_destination, "file.txt", "content", "sub_folder")
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+
+    index.record("sub_folder")
+    index.record("sub_folder/file.txt")
+
+    assert not index.is_empty()
+    assert index.list_folder("") == ({"sub_folder"}, set())
+    assert index.list_folder("sub_folder") == (set(), {"file.txt"})
+
+    record = index.get("sub_folder", "file.txt")
+    st = os.stat(file)
+    assert not record.is_dir
+    assert record.size == st.st_size
+    assert record.mtime_ns == st.st_mtime_ns
+    assert record.inode == st.st_ino
+
+
+def test_forget_folder_removes_sub_entries(tmp_path, tmp_destination):
+    create_tmp_file(tmp_destination, "file.txt", "content", "folder/sub")
+    create_tmp_folder(tmp_destination, "folder_2")
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+    index.rebuild()
+
+    index.forget("folder")
+
+    assert index.list_folder("") == ({"folder_2"}, set())
+    assert index.list_folder("folder") == (set(), set())
+    assert index.get("folder/sub", "file.txt") is None
+
+
+def test_index_is_persisted(tmp_path, tmp_destination):
+    create_tmp_file(tmp_destination, "file.txt", "content")
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+    index.rebuild()
+    index.close()
+
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+
+    assert index.list_folder("") == (set(), {"file.txt"})
+
+
+def test_index_of_another_destination_is_discarded(tmp_path, tmp_destination):
+    create_tmp_file(tmp_destination, "file.txt", "content")
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+    index.rebuild()
+    index.close()
+
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_path / "other"))
+
+    assert index.is_empty()
+
+
+def test_move_folder_moves_sub_entries(tmp_path, tmp_destination):
+    create_tmp_file(tmp_destination, "file.txt", "content", "folder/sub")
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+    index.rebuild()
+
+    os.rename(tmp_destination / "folder", tmp_destination / "moved")
+    index.move("folder", "moved")
+
+    assert index.list_folder("") == ({"moved"}, set())
+    assert index.list_folder("moved") == ({"sub"}, set())
+    assert index.list_folder("moved/sub") == (set(), {"file.txt"})
+    assert index.list_folder("folder/sub") == (set(), set())
+
+
+def test_names_not_valid_utf8_are_recorded(tmp_path, tmp_destination):
+    name = os.fsdecode(b"\xff.txt")
+    folder = os.fsdecode(b"folder_\xfe")
+    os.mkdir(os.path.join(tmp_destination, folder))
+    with open(os.path.join(tmp_destination, folder, name), "w", encoding="utf-8") as file:
+        file.write("content")
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+
+    index.record(folder)
+    index.record(os.path.join(folder, name))
+
+    assert index.list_folder("") == ({folder}, set())
+    assert index.list_folder(folder) == (set(), {name})
+    assert list(index.sorted_files(folder)) == [name]
+    assert index.get(folder, name).size == len("content")
+
+    os.rename(os.path.join(tmp_destination, folder), tmp_destination / "moved")
+    index.move(folder, "moved")
+    assert index.list_folder("moved") == (set(), {name})
+
+    index.forget("moved")
+    assert index.is_empty()
+
+    index.rebuild()
+    assert index.list_folder("moved") == (set(), {name})
+
+
+def test_index_of_previous_schema_is_discarded(tmp_path, tmp_destination):
+    connection = sqlite3.connect(str(tmp_path / "index.db"))
+    connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    connection.execute(
+        "INSERT INTO meta VALUES ('destination', ?)", (str(tmp_destination),)
+    )
+    connection.execute(
+        "CREATE TABLE entries (root TEXT NOT NULL, name TEXT NOT NULL, "
+        "is_dir INTEGER NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+        "inode INTEGER NOT NULL, PRIMARY KEY (root, name)) WITHOUT ROWID"
+    )
+    connection.execute("INSERT INTO entries VALUES ('', 'file.txt', 0, 1, 1, 1)")
+    connection.commit()
+    connection.close()
+
+    index = SyncStateIndex(str(tmp_path / "index.db"), str(tmp_destination))
+
+    assert index.is_empty()
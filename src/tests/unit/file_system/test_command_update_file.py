@@ -0,0 +1,111 @@
+import logging
+import os
+
+import pytest
+
+from file_system import commands, delta
+from file_system.commands import FileSystemCommands
+from file_system.delta import delta_update
+from settings import FolderSettingsDataClass
+from tests.conftest import create_tmp_file
+
+logger = logging.getLogger()
+
+BLOCK_SIZE = 1024
+CONTENT = "".join(chr(ord("a") + count % 26) for count in range(BLOCK_SIZE * 16))
+
+
+@pytest.fixture
+def small_delta_size(monkeypatch):
+    monkeypatch.setattr(commands, "DELTA_MIN_SIZE", BLOCK_SIZE)
+    monkeypatch.setattr(delta, "DELTA_MIN_SIZE", BLOCK_SIZE * 4)
+
+
+def test_delta_update_write_only_changed_blocks(tmp_source, tmp_destination):
+    changed = CONTENT[:BLOCK_SIZE * 5] + "X" + CONTENT[BLOCK_SIZE * 5 + 1:]
+    source_file = create_tmp_file(tmp_source, "file.txt", changed)
+    destination_file = create_tmp_file(tmp_destination, "file.txt", CONTENT)
+
+    written = delta_update(str(source_file), str(destination_file), BLOCK_SIZE)
+
+    assert written == BLOCK_SIZE
+    assert destination_file.read_text() == changed
+    assert os.stat(destination_file).st_mtime_ns == os.stat(source_file).st_mtime_ns
+
+
+def test_delta_update_source_smaller_and_bigger(tmp_source, tmp_destination):
+    source_file = create_tmp_file(tmp_source, "file.txt", CONTENT[:-10])
+    destination_file = create_tmp_file(tmp_destination, "file.txt", CONTENT)
+
+    assert delta_update(str(source_file), str(destination_file), BLOCK_SIZE) == (
+        BLOCK_SIZE - 10
+    )
+    assert destination_file.read_text() == CONTENT[:-10]
+
+    source_file.write_text(CONTENT + "end")
+
+    assert delta_update(str(source_file), str(destination_file), BLOCK_SIZE) == (
+        BLOCK_SIZE + 3
+    )
+    assert destination_file.read_text() == CONTENT + "end"
+
+
+def test_delta_update_copy_rest_when_most_blocks_changed(
+    small_delta_size, tmp_source, tmp_destination
+):
+    source_file = create_tmp_file(tmp_source, "file.txt", CONTENT.upper())
+    destination_file = create_tmp_file(tmp_destination, "file.txt", CONTENT)
+
+    written = delta_update(str(source_file), str(destination_file), BLOCK_SIZE)
+
+    assert written == len(CONTENT)
+    assert destination_file.read_text() == CONTENT.upper()
+
+
+def test_update_file_in_place_with_delta(small_delta_size, tmp_source, tmp_destination):
+    changed = "X" + CONTENT[1:]
+    create_tmp_file(tmp_source, "file.txt", changed)
+    destination_file = create_tmp_file(tmp_destination, "file.txt", CONTENT)
+    inode = os.stat(destination_file).st_ino
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    file_system = FileSystemCommands(
+        folder_settings=folder_settings, logger=logger, delta=True
+    )
+    file_system.update_file("file.txt")
+
+    assert destination_file.read_text() == changed
+    assert os.stat(destination_file).st_ino == inode
+    assert file_system.pop_copy_methods() == {"delta": 1}
+
+
+def test_update_file_without_delta_copy_file(tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file.txt", "new content")
+    destination_file = create_tmp_file(tmp_destination, "file.txt", "content")
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    file_system = FileSystemCommands(folder_settings=folder_settings, logger=logger)
+    file_system.update_file("file.txt")
+
+    assert destination_file.read_text() == "new content"
+    assert "delta" not in file_system.pop_copy_methods()
+
+
+def test_update_of_hard_linked_file_keeps_other_names(tmp_source, tmp_destination):
+    create_tmp_file(tmp_source, "file.txt", "new content")
+    destination_file = create_tmp_file(tmp_destination, "file.txt", "content")
+    os.link(destination_file, tmp_destination / "other.txt")
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+
+    FileSystemCommands(folder_settings=folder_settings, logger=logger).update_file(
+        "file.txt"
+    )
+
+    assert destination_file.read_text() == "new content"
+    assert (tmp_destination / "other.txt").read_text() == "content"
@@ -0,0 +1,102 @@
+import errno
+import os
+import shutil
+
+import pytest
+
+from file_system.copy_engine import copy_file
+from settings import CopyMethodEnum
+from tests.conftest import create_tmp_file
+
+CONTENT = "content of the file " * 1024
+
+
+def assert_same_file(source_file, destination_file):
+    src_st = os.stat(source_file)
+    dest_st = os.stat(destination_file)
+
+    assert destination_file.read_text() == source_file.read_text()
+    assert dest_st.st_mtime_ns == src_st.st_mtime_ns
+    assert dest_st.st_mode == src_st.st_mode
+
+
+def test_copy_file_with_copy_file_range(tmp_source, tmp_destination):
+    source_file = create_tmp_file(tmp_source, "file.txt", CONTENT)
+    os.chmod(source_file, 0o640)
+    destination_file = tmp_destination / "file.txt"
+
+    method = copy_file(str(source_file), str(destination_file))
+
+    assert method == CopyMethodEnum.COPY_FILE_RANGE
+    assert_same_file(source_file, destination_file)
+
+
+def test_copy_file_fallback_to_sendfile(monkeypatch, tmp_source, tmp_destination):
+    def copy_file_range(*args):
+        raise OSError(errno.EXDEV, "cross device")
+
+    monkeypatch.setattr(os, "copy_file_range", copy_file_range)
+    source_file = create_tmp_file(tmp_source, "file.txt", CONTENT)
+    destination_file = tmp_destination / "file.txt"
+
+    method = copy_file(str(source_file), str(destination_file))
+
+    assert method == CopyMethodEnum.SENDFILE
+    assert_same_file(source_file, destination_file)
+
+
+def test_copy_file_fallback_to_buffered(monkeypatch, tmp_source, tmp_destination):
+    monkeypatch.delattr(os, "copy_file_range")
+    monkeypatch.delattr(os, "sendfile")
+    source_file = create_tmp_file(tmp_source, "file.txt", CONTENT)
+    destination_file = tmp_destination / "file.txt"
+
+    method = copy_file(str(source_file), str(destination_file))
+
+    assert method == CopyMethodEnum.BUFFERED
+    assert_same_file(source_file, destination_file)
+
+
+def test_copy_file_continue_partial_copy(monkeypatch, tmp_source, tmp_destination):
+    real_copy_file_range = os.copy_file_range
+    calls = []
+
+    def copy_file_range(src, dst, count, offset_src, offset_dst):
+        calls.append(offset_src)
+        if len(calls) > 1:
+            raise OSError(errno.EINVAL, "not supported")
+        return real_copy_file_range(src, dst, 100, offset_src, offset_dst)
+
+    monkeypatch.setattr(os, "copy_file_range", copy_file_range)
+    source_file = create_tmp_file(tmp_source, "file.txt", CONTENT)
+    destination_file = tmp_destination / "file.txt"
+
+    method = copy_file(str(source_file), str(destination_file))
+
+    assert calls == [0, 100]
+    assert method == CopyMethodEnum.SENDFILE
+    assert_same_file(source_file, destination_file)
+
+
+def test_copy_empty_file(tmp_source, tmp_destination):
+    source_file = create_tmp_file(tmp_source, "file.txt", "")
+    destination_file = tmp_destination / "file.txt"
+
+    copy_file(str(source_file), str(destination_file))
+
+    assert_same_file(source_file, destination_file)
+
+
+def test_copy_file_not_found(tmp_source, tmp_destination):
+    with pytest.raises(FileNotFoundError):
+        copy_file(str(tmp_source / "file.txt"), str(tmp_destination / "file.txt"))
+
+
+def test_copy_file_rejects_named_pipe(tmp_source, tmp_destination):
+    fifo = tmp_source / "fifo"
+    os.mkfifo(fifo)
+
+    with pytest.raises(shutil.SpecialFileError):
+        copy_file(str(fifo), str(tmp_destination / "fifo"))
+
+    assert not (tmp_destination / "fifo").exists()
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pytest
+
+from diff_folders.hashing import file_digest
+from file_system.dedup import DedupStore
+from file_system.exceptions import InvalidDedupStore
+from settings import CopyMethodEnum, FolderSettingsDataClass
+from tests.conftest import create_tmp_file
+
+
+def file_hash(path, st=None):
+    return file_digest(path)
+
+
+@pytest.fixture
+def dedup_store(tmp_path, tmp_source, tmp_destination):
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    return DedupStore(str(tmp_path / "store"), folder_settings, file_hash)
+
+
+def test_same_content_is_stored_once(dedup_store, tmp_source, tmp_destination):
+    file_1 = create_tmp_file(tmp_source, "file1.txt", "content")
+    file_2 = create_tmp_file(tmp_source, "file2.txt", "content")
+
+    assert dedup_store.add(str(file_1), str(tmp_destination / "file1.txt")) != (
+        CopyMethodEnum.DEDUP
+    )
+    assert dedup_store.add(str(file_2), str(tmp_destination / "file2.txt")) == (
+        CopyMethodEnum.DEDUP
+    )
+
+    st = os.stat(tmp_destination / "file1.txt")
+    assert st.st_ino == os.stat(tmp_destination / "file2.txt").st_ino
+    assert st.st_nlink == 3
+    assert (tmp_destination / "file2.txt").read_text() == "content"
+
+
+def test_collect_removes_blobs_without_links(dedup_store, tmp_source, tmp_destination):
+    file_1 = create_tmp_file(tmp_source, "file1.txt", "content")
+    file_2 = create_tmp_file(tmp_source, "file2.txt", "other content")
+    dedup_store.add(str(file_1), str(tmp_destination / "file1.txt"))
+    dedup_store.add(str(file_2), str(tmp_destination / "file2.txt"))
+
+    os.unlink(tmp_destination / "file2.txt")
+
+    assert dedup_store.collect() == len("other content")
+    assert dedup_store.collect() == 0
+    assert (tmp_destination / "file1.txt").read_text() == "content"
+
+
+def test_store_inside_destination_is_invalid(tmp_source, tmp_destination):
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+
+    with pytest.raises(InvalidDedupStore):
+        DedupStore(str(tmp_destination / "store"), folder_settings, file_hash)
+
+
+def test_named_pipe_is_not_stored(dedup_store, tmp_source, tmp_destination):
+    fifo = tmp_source / "fifo"
+    os.mkfifo(fifo)
+
+    with pytest.raises(shutil.SpecialFileError):
+        dedup_store.add(str(fifo), str(tmp_destination / "fifo"))
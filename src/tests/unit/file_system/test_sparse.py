@@ -0,0 +1,80 @@
+import hashlib
+import os
+
+import pytest
+
+from diff_folders.hashing import file_digest
+from file_system.copy_engine import copy_file
+from file_system.sparse import data_extents, is_sparse
+from settings import CopyMethodEnum
+
+MB = 1024 * 1024
+
+
+def create_sparse_file(path):
+    with open(path, "wb") as f:
+        f.truncate(32 * MB)
+        f.seek(4 * MB)
+        f.write(b"data" * 1024)
+        f.seek(20 * MB)
+        f.write(b"more data" * 1024)
+
+    if not is_sparse(os.stat(path)):
+        pytest.skip("file system does not support sparse files")
+
+    return path
+
+
+def test_data_extents_of_sparse_file(tmp_source):
+    path = create_sparse_file(tmp_source / "sparse.img")
+
+    with open(path, "rb") as f:
+        extents = list(data_extents(f.fileno(), os.fstat(f.fileno()).st_size))
+
+    assert 1 <= len(extents) <= 2
+    assert extents[0][0] <= 4 * MB < extents[0][1]
+    assert extents[-1][0] <= 20 * MB < extents[-1][1] <= 32 * MB
+
+
+def test_copy_sparse_file_keep_holes(tmp_source, tmp_destination):
+    source_file = create_sparse_file(tmp_source / "sparse.img")
+    destination_file = tmp_destination / "sparse.img"
+
+    method = copy_file(str(source_file), str(destination_file))
+
+    assert method == CopyMethodEnum.SPARSE
+    assert destination_file.read_bytes() == source_file.read_bytes()
+    assert os.stat(destination_file).st_size == 32 * MB
+    assert os.stat(destination_file).st_blocks <= os.stat(source_file).st_blocks * 2
+    assert os.stat(destination_file).st_mtime_ns == os.stat(source_file).st_mtime_ns
+
+
+def test_sha256_of_sparse_file(tmp_source):
+    source_file = create_sparse_file(tmp_source / "sparse.img")
+
+    assert file_digest(str(source_file)) == hashlib.sha256(
+        source_file.read_bytes()
+    ).hexdigest()
+
+
+def test_copy_sparse_file_when_copy_file_range_stops_early(
+    tmp_source, tmp_destination, monkeypatch
+):
+    source_file = create_sparse_file(tmp_source / "sparse.img")
+    destination_file = tmp_destination / "sparse.img"
+    copy_file_range = os.copy_file_range
+    calls = []
+
+    # the first call copies part of the extent, then the copy reports no data
+    def stopping_copy_file_range(src, dst, count, offset_src, offset_dst):
+        calls.append(offset_src)
+        if len(calls) > 1:
+            return 0
+        return copy_file_range(src, dst, min(count, 1024), offset_src, offset_dst)
+
+    monkeypatch.setattr(os, "copy_file_range", stopping_copy_file_range)
+
+    method = copy_file(str(source_file), str(destination_file))
+
+    assert method == CopyMethodEnum.SPARSE
+    assert file_digest(str(destination_file)) == file_digest(str(source_file))
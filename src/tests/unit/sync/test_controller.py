@@ -0,0 +1,49 @@
+import logging
+import os
+
+import pytest
+
+from file_system.commands import FileSystemCommands
+from settings import FolderSettingsDataClass, ScanModeEnum, SyncOptionsDataClass
+from sync.controller import SyncController
+from tests.conftest import create_tmp_file
+
+OLD_MTIME_NS = 1_000_000_000_000_000_000
+
+logger = logging.getLogger()
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_trust_dirs_retries_failed_actions(tmp_source, tmp_destination, monkeypatch, workers):
+    create_tmp_file(tmp_source, "file.txt", "content", "folder")
+    for folder in (tmp_source / "folder", tmp_source):
+        os.utime(folder, ns=(OLD_MTIME_NS, OLD_MTIME_NS))
+
+    create_file = FileSystemCommands.create_file
+    calls = []
+
+    def create_file_failing_once(self, *args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError(args)
+        return create_file(self, *args, **kwargs)
+
+    monkeypatch.setattr(FileSystemCommands, "create_file", create_file_failing_once)
+
+    folder_settings = FolderSettingsDataClass(
+        source=str(tmp_source), destination=str(tmp_destination)
+    )
+    options = SyncOptionsDataClass(scan_mode=ScanModeEnum.TRUST_DIRS, workers=workers)
+    sync_controller = SyncController(
+        folder_settings=folder_settings, logger=logger, options=options
+    )
+
+    if workers == 1:
+        with pytest.raises(OSError):
+            sync_controller.execute()
+    else:
+        assert len(sync_controller.execute()) == 1
+
+    # the folder of the failed action is read again, even with the folder not modified
+    assert sync_controller.execute() == []
+    assert (tmp_destination / "folder" / "file.txt").read_text() == "content"
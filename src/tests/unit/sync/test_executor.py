@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+from diff_folders.walk_tree import GetActionResponse
+from settings import DiffActionsEnum
+from sync.executor import ParallelExecutor
+
+
+def test_actions_wait_for_parent_folder_creation():
+    applied = []
+    lock = threading.Lock()
+
+    def apply_action(action):
+        if action.action == DiffActionsEnum.CREATE_FOLDER:
+            time.sleep(0.05)
+        with lock:
+            applied.append(os.path.join(action.common_root, action.name))
+
+    actions = [
+        GetActionResponse(common_root="", name="folder", action=DiffActionsEnum.CREATE_FOLDER),
+        GetActionResponse(common_root="", name="file.txt", action=DiffActionsEnum.CREATE_FILE),
+        GetActionResponse(
+            common_root="folder", name="sub", action=DiffActionsEnum.CREATE_FOLDER
+        ),
+        GetActionResponse(
+            common_root=os.path.join("folder", "sub"),
+            name="file.txt",
+            action=DiffActionsEnum.CREATE_FILE,
+        ),
+    ]
+
+    failures = ParallelExecutor(apply_action=apply_action, workers=4).run(actions)
+
+    assert failures == []
+    assert applied[0] == "file.txt"
+    assert applied.index("folder") < applied.index(os.path.join("folder", "sub"))
+    assert applied.index(os.path.join("folder", "sub")) < applied.index(
+        os.path.join("folder", "sub", "file.txt")
+    )
+
+
+def test_actions_on_same_path_keep_order():
+    applied = []
+
+    def apply_action(action):
+        if action.action == DiffActionsEnum.DELETE_FILE:
+            time.sleep(0.05)
+        applied.append(action.action)
+
+    actions = [
+        GetActionResponse(common_root="", name="name", action=DiffActionsEnum.DELETE_FILE),
+        GetActionResponse(common_root="", name="name", action=DiffActionsEnum.CREATE_FOLDER),
+    ]
+
+    ParallelExecutor(apply_action=apply_action, workers=2).run(actions)
+
+    assert applied == [DiffActionsEnum.DELETE_FILE, DiffActionsEnum.CREATE_FOLDER]
+
+
+def test_failures_are_collected_without_stopping():
+    applied = []
+
+    def apply_action(action):
+        if action.name == "error.txt":
+            raise OSError
+        applied.append(action.name)
+
+    actions = [
+        GetActionResponse(common_root="", name=name, action=DiffActionsEnum.CREATE_FILE)
+        for name in ("file_1.txt", "error.txt", "file_2.txt")
+    ]
+
+    failures = ParallelExecutor(apply_action=apply_action, workers=2).run(actions)
+
+    assert sorted(applied) == ["file_1.txt", "file_2.txt"]
+    assert len(failures) == 1
+    assert failures[0].action.name == "error.txt"
+    assert isinstance(failures[0].error, OSError)
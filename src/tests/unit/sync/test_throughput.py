@@ -0,0 +1,37 @@
+import pytest
+
+from sync.throughput import ThroughputHistory
+
+
+def test_estimate_without_runs(tmp_path):
+    history = ThroughputHistory(str(tmp_path / "history.json"))
+
+    assert history.estimate(actions=10, bytes_to_copy=100) is None
+
+
+def test_estimate_fits_cost_per_action_and_per_byte(tmp_path):
+    history = ThroughputHistory(str(tmp_path / "history.json"))
+    # 0.01 seconds per action and 1 second per MB
+    history.record(actions=100, bytes_copied=1_000_000, seconds=2.0)
+    history.record(actions=1000, bytes_copied=1_000_000, seconds=11.0)
+    history.record(actions=10, bytes_copied=5_000_000, seconds=5.1)
+
+    assert history.estimate(actions=200, bytes_to_copy=3_000_000) == pytest.approx(5.0)
+
+
+def test_estimate_with_runs_of_same_ratio(tmp_path):
+    history = ThroughputHistory(str(tmp_path / "history.json"))
+    history.record(actions=10, bytes_copied=1000, seconds=1.0)
+    history.record(actions=20, bytes_copied=2000, seconds=2.0)
+
+    assert history.estimate(actions=1, bytes_to_copy=3000) == pytest.approx(3.0)
+
+
+def test_history_keeps_last_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr("sync.throughput.THROUGHPUT_HISTORY_RUNS", 2)
+    history = ThroughputHistory(str(tmp_path / "history.json"))
+
+    for seconds in (1.0, 2.0, 3.0):
+        history.record(actions=1, bytes_copied=0, seconds=seconds)
+
+    assert [run.seconds for run in history.runs()] == [2.0, 3.0]
@@ -0,0 +1,90 @@
+import logging
+import queue
+
+from settings import DiffActionsEnum
+from utils.action_log import ActionLogHandler, read_action_log
+from utils.log_queue import DeferredQueueHandler, SyncLogListener
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+
+
+def action_record(action, path, origin=None, created=1000.0):
+    return logging.makeLogRecord(
+        {
+            "msg": "sync %s complete on %s",
+            "args": (action.value, path),
+            "levelno": logging.INFO,
+            "created": created,
+            "sync_action": action,
+            "sync_path": path,
+            "sync_origin": origin,
+        }
+    )
+
+
+def test_action_lines_over_rate_are_summarized(tmp_path):
+    listener_queue = queue.SimpleQueue()
+    handler = ListHandler()
+    action_log = str(tmp_path / "actions.log")
+    listener = SyncLogListener(
+        listener_queue, [handler], action_handler=ActionLogHandler(action_log), action_rate=2
+    )
+    listener.start()
+
+    for number in range(5):
+        listener_queue.put(action_record(DiffActionsEnum.CREATE_FILE, f"file{number}"))
+    listener_queue.put(action_record(DiffActionsEnum.MOVE_FILE, "moved", origin="file0"))
+    listener_queue.put(action_record(DiffActionsEnum.DELETE_FILE, "next", created=1001.0))
+    listener_queue.put(action_record(DiffActionsEnum.DELETE_FILE, "next_2", created=1001.0))
+    listener_queue.put(action_record(DiffActionsEnum.DELETE_FILE, "next_3", created=1001.0))
+    listener.stop()
+
+    assert handler.lines == [
+        "sync create_file complete on file0",
+        "sync create_file complete on file1",
+        "sync action lines suppressed over 2 per second: create_file=3 move_file=1",
+        "sync delete_file complete on next",
+        "sync delete_file complete on next_2",
+        "sync action lines suppressed over 2 per second: delete_file=1",
+    ]
+
+    entries = list(read_action_log(action_log))
+    assert entries[0][0] == 1000 * 10**9
+    assert [entry[1:] for entry in entries] == [
+        *(("create_file", f"file{number}", None) for number in range(5)),
+        ("move_file", "moved", "file0"),
+        ("delete_file", "next", None),
+        ("delete_file", "next_2", None),
+        ("delete_file", "next_3", None),
+    ]
+
+
+def test_all_action_lines_without_rate():
+    listener_queue = queue.SimpleQueue()
+    handler = ListHandler()
+    listener = SyncLogListener(listener_queue, [handler])
+    logger = logging.getLogger("test_log_queue")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(DeferredQueueHandler(listener_queue))
+    listener.start()
+
+    for number in range(100):
+        logger.info(
+            "sync %s complete on %s",
+            DiffActionsEnum.DELETE_FILE.value,
+            f"file{number}",
+            extra={"sync_action": DiffActionsEnum.DELETE_FILE},
+        )
+    logger.info("sync dedup store released %s bytes", 5)
+    listener.stop()
+
+    assert len(handler.lines) == 101
+    assert handler.lines[-1] == "sync dedup store released 5 bytes"
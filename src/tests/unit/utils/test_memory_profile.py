@@ -0,0 +1,56 @@
+import json
+import tracemalloc
+
+import pytest
+
+from utils.memory_profile import MemoryProfiler, compare_snapshots
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    yield MemoryProfiler(str(tmp_path / "profile"))
+    tracemalloc.stop()
+
+
+def allocate(size):
+    return [bytearray(size) for _ in range(10)]
+
+
+def test_peak_by_phase_and_depth(tmp_path, profiler):
+    scan = profiler.profiled("scan", allocate, depth=lambda size: 2)
+    profiler.start_run()
+    kept = profiler.profiled("apply", allocate)(1000)
+    scan(100_000)
+    summary = profiler.end_run()
+
+    assert set(summary["peaks"]) == {"diff", "scan", "apply", "depth-2"}
+    assert summary["peaks"]["scan"]["peak_bytes"] >= 1_000_000
+    assert summary["peaks"]["depth-2"]["peak_bytes"] >= 1_000_000
+    assert summary["peaks"]["apply"]["peak_bytes"] < 1_000_000
+    assert summary["peak_bytes"] >= summary["peaks"]["scan"]["peak_bytes"]
+    # the allocations kept by apply are alive on the snapshot
+    assert any(
+        site["bytes"] >= 10_000 for site in summary["peaks"]["apply"]["top"]
+    )
+    del kept
+
+    files = sorted(path.name for path in (tmp_path / "profile").iterdir())
+    assert len(files) == 5
+    assert files[-1].endswith("-summary.json")
+    assert json.loads((tmp_path / "profile" / files[-1]).read_text()) == summary
+
+
+def test_compare_snapshots_between_runs(tmp_path, profiler):
+    apply = profiler.profiled("apply", allocate)
+    kept = []
+
+    for size in (1000, 100_000):
+        profiler.start_run()
+        kept.append(apply(size))
+        profiler.end_run()
+
+    old, new = sorted((tmp_path / "profile").glob("*-apply.snapshot"))
+    lines = compare_snapshots(str(old), str(new), top=1)
+
+    assert len(lines) == 1
+    assert "test_memory_profile.py" in lines[0]
@@ -0,0 +1,51 @@
+from utils.metrics import Histogram, SyncMetrics
+
+
+def test_histogram_counts_values_by_bucket():
+    histogram = Histogram()
+
+    for value in (0.00005, 0.0001, 0.002, 100.0):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.counts[0] == 2
+    assert histogram.counts[3] == 1
+    assert histogram.counts[-1] == 1
+
+
+def test_end_run_returns_run_and_keeps_totals(tmp_path):
+    metrics = SyncMetrics()
+    metrics.observe("copy", 0.002)
+    metrics.count_action("create_file", 100)
+    metrics.count_action("delete_file")
+    metrics.count_copy_methods({"copy_file_range": 1})
+    timed = metrics.timed("compare", lambda value: value * 2)
+
+    assert timed(2) == 4
+
+    record = metrics.end_run(seconds=2.0, failures=1, interval=10)
+
+    assert record["actions"] == {"create_file": 1, "delete_file": 1}
+    assert record["bytes"] == {"create_file": 100, "delete_file": 0}
+    assert record["copy_methods"] == {"copy_file_range": 1}
+    assert record["phases"]["copy"]["count"] == 1
+    assert record["phases"]["compare"]["count"] == 1
+    assert record["throughput_bytes_per_second"] == 50
+    assert record["throughput_actions_per_second"] == 1
+
+    metrics.count_action("create_file", 50)
+    metrics.count_copy_methods({"copy_file_range": 1, "sendfile": 1})
+    assert metrics.end_run(seconds=1.0, failures=0)["actions"] == {"create_file": 1}
+
+    prom_path = tmp_path / "sync.prom"
+    metrics.write_prometheus(str(prom_path))
+    lines = prom_path.read_text().splitlines()
+
+    assert 'sync_actions_total{action="create_file"} 2' in lines
+    assert 'sync_action_bytes_total{action="create_file"} 150' in lines
+    assert 'sync_copy_method_total{method="copy_file_range"} 2' in lines
+    assert 'sync_copy_method_total{method="sendfile"} 1' in lines
+    assert 'sync_phase_seconds_bucket{phase="copy",le="+Inf"} 1' in lines
+    assert 'sync_phase_seconds_count{phase="compare"} 1' in lines
+    assert "sync_failures_total 1" in lines
+    assert "sync_run_duration_seconds 1.0" in lines
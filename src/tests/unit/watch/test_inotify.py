@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+
+from diff_folders.walk_tree import ScanTarget
+from tests.conftest import create_tmp_file, create_tmp_folder
+from watch.inotify import InotifyWatcher
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is only available on Linux"
+)
+
+
+def test_file_change_targets_its_folder(tmp_source):
+    sub_folder = create_tmp_folder(tmp_source, "sub_folder")
+    watcher = InotifyWatcher(source=str(tmp_source))
+    changes = watcher.changes()
+
+    create_tmp_file(sub_folder, "file.txt", "content")
+
+    assert next(changes) == [ScanTarget(common_root="sub_folder", recursive=False)]
+    watcher.close()
+
+
+def test_new_folder_targets_parent_and_new_folder_recursively(tmp_source):
+    watcher = InotifyWatcher(source=str(tmp_source))
+    changes = watcher.changes()
+
+    create_tmp_file(tmp_source, "file.txt", "content", "new_folder/sub")
+
+    assert next(changes) == [
+        ScanTarget(common_root="", recursive=False),
+        ScanTarget(common_root="new_folder", recursive=True),
+    ]
+
+    # new folders are watched as well
+    create_tmp_file(tmp_source / "new_folder" / "sub", "file_2.txt", "content")
+
+    assert next(changes) == [
+        ScanTarget(common_root=os.path.join("new_folder", "sub"), recursive=False)
+    ]
+    watcher.close()
+
+
+def test_coalesce_folders_covered_by_recursive_parent():
+    targets = {
+        "a": True,
+        os.path.join("a", "b"): False,
+        "c": False,
+        os.path.join("c", "d"): True,
+    }
+
+    assert InotifyWatcher._coalesce(targets) == [
+        ScanTarget(common_root="a", recursive=True),
+        ScanTarget(common_root="c", recursive=False),
+        ScanTarget(common_root=os.path.join("c", "d"), recursive=True),
+    ]
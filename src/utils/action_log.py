@@ -0,0 +1,77 @@
+"""
+Module of the binary action log, a record per sync action with the time, the
+action code and the paths, written without formatting a log line. The log is
+read back as text with:
+
+cd src && python -m utils.action_log {action_log_path}
+"""
+
+import argparse
+import logging
+import os
+import struct
+from typing import BinaryIO, Generator, Optional, Tuple
+
+from diff_folders.actions import ACTION_CODES, ACTIONS
+
+# time in nanoseconds, action code and lengths of the path and origin of a record
+_HEADER = struct.Struct("<qBII")
+
+
+class ActionLogHandler(logging.Handler):
+    """
+    Handler writing the log records of sync actions, the records with the
+    sync_action attribute, on the binary action log. Other records are ignored
+    """
+
+    def __init__(self, log_path: str) -> None:
+        super().__init__()
+        self._file: BinaryIO = open(log_path, "ab")  # pylint: disable=consider-using-with
+
+    def emit(self, record: logging.LogRecord) -> None:
+        action = getattr(record, "sync_action", None)
+        if action is None:
+            return
+
+        path = os.fsencode(record.sync_path)
+        origin = os.fsencode(record.sync_origin or "")
+
+        self._file.write(
+            _HEADER.pack(int(record.created * 1e9), ACTION_CODES[action], len(path), len(origin))
+        )
+        self._file.write(path)
+        self._file.write(origin)
+
+    def flush(self) -> None:
+        with self.lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self._file.close()
+        super().close()
+
+
+def read_action_log(
+    log_path: str
+) -> Generator[Tuple[int, str, str, Optional[str]], None, None]:
+    """Yield the time in nanoseconds, action, path and origin of each record"""
+    with open(log_path, "rb") as log:
+        while True:
+            header = log.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+
+            time_ns, code, path_size, origin_size = _HEADER.unpack(header)
+            path = os.fsdecode(log.read(path_size))
+            origin = os.fsdecode(log.read(origin_size)) if origin_size else None
+
+            yield time_ns, ACTIONS[code].value, path, origin
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", help="action log path", type=str)
+
+    for entry in read_action_log(parser.parse_args().log):
+        print("\t".join(str(field) for field in entry if field is not None))
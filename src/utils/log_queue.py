@@ -0,0 +1,161 @@
+"""
+Module of the logging pipeline off the sync threads, records are put on a queue
+without formatting and a listener thread formats and writes them, flushing the
+handlers when the queue is drained or at most every flush interval. Above a max
+rate per second the per action lines are summarized by a line with the counts of
+the suppressed lines
+"""
+
+import logging
+import queue
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+from settings import LOG_FLUSH_INTERVAL
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that does not format the record on the logging thread, the
+    listener on the same process formats it
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SyncLogListener(QueueListener):
+    """
+    Listener writing the records on the text handlers and the sync action records
+    on the action handler, per action lines above the action rate per second are
+    counted and summarized instead of written on the text handlers
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.SimpleQueue,
+        handlers: List[logging.Handler],
+        action_handler: Optional[logging.Handler] = None,
+        action_rate: int = 0,
+    ) -> None:
+        """action_rate: max per action lines per second, 0 writes all lines"""
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self._action_handler = action_handler
+        self._action_rate = action_rate
+        self._window = 0
+        self._window_lines = 0
+        self._suppressed = Counter()
+        self._flushed = time.monotonic()
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        """
+        Flush the handlers before waiting on an empty queue, the suppressed lines
+        are summarized when no record comes for a flush interval
+        """
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            if not block:
+                raise
+
+        self._flush()
+
+        while True:
+            try:
+                return self.queue.get(timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                self._summarize()
+                self._flush()
+
+    def handle(self, record: logging.LogRecord) -> None:
+        action = getattr(record, "sync_action", None)
+
+        if action is not None:
+            if self._action_handler is not None:
+                self._action_handler.handle(record)
+
+            if self._is_suppressed(record, action):
+                return
+        else:
+            self._summarize()
+
+        super().handle(record)
+
+        if time.monotonic() - self._flushed >= LOG_FLUSH_INTERVAL:
+            self._flush()
+
+    def stop(self) -> None:
+        """Write the queued records and the pending summary, then flush"""
+        super().stop()
+        self._summarize()
+        self._flush()
+
+    def _is_suppressed(self, record: logging.LogRecord, action) -> bool:
+        """Count the action line on the second it was logged, over the rate it is suppressed"""
+        if not self._action_rate:
+            return False
+
+        window = int(record.created)
+        if window != self._window:
+            self._summarize()
+            self._window = window
+            self._window_lines = 0
+
+        self._window_lines += 1
+        if self._window_lines <= self._action_rate:
+            return False
+
+        self._suppressed[action.value] += 1
+        return True
+
+    def _summarize(self) -> None:
+        """Write a line with the counts of the per action lines suppressed"""
+        if not self._suppressed:
+            return
+
+        counts = " ".join(f"{name}={count}" for name, count in sorted(self._suppressed.items()))
+        self._suppressed.clear()
+        super().handle(
+            logging.makeLogRecord(
+                {
+                    "name": "sync",
+                    "levelno": logging.INFO,
+                    "levelname": logging.getLevelName(logging.INFO),
+                    "msg": "sync action lines suppressed over %s per second: %s",
+                    "args": (self._action_rate, counts),
+                }
+            )
+        )
+
+    def _flush(self) -> None:
+        """Flush the text and action handlers"""
+        for handler in self.handlers:
+            handler.flush()
+        if self._action_handler is not None:
+            self._action_handler.flush()
+        self._flushed = time.monotonic()
+
+
+class BufferedFileHandler(logging.FileHandler):
+    """File handler that leaves the flush to the listener, writes are batched"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.stream is None:
+            self.stream = self._open()
+
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
+
+
+class BufferedStreamHandler(logging.StreamHandler):
+    """Stream handler that leaves the flush to the listener, writes are batched"""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handleError(record)
@@ -0,0 +1,161 @@
+"""
+Module of the memory profile of sync runs with tracemalloc, the traced memory is
+attributed to the phase running (scan of a folder, compare of a file, apply of an
+action and the rest of the diff) and to the depth of the folder scanned. The
+snapshots of each phase and depth are dumped to be compared between runs
+
+usage to compare two snapshots:
+cd src && python -m utils.memory_profile {old.snapshot} {new.snapshot} [--top 10]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from settings import (MEMORY_PROFILE_FRAMES, MEMORY_PROFILE_SNAPSHOT_GROWTH,
+                      MEMORY_PROFILE_TOP)
+
+# phase of everything that runs out of the profiled calls on a run
+BASE_PHASE = "diff"
+
+
+class MemoryProfiler:
+    """
+    Peak traced memory and allocation sites of each phase and folder depth. The
+    peak between two phase changes is attributed to the phase running, so the
+    attribution is exact only when the scan, compare and apply run on a single
+    thread (without --workers, --hash-workers and --scan-workers)
+    """
+
+    def __init__(self, dump_dir: str, top: int = MEMORY_PROFILE_TOP) -> None:
+        """Folder of the dumped snapshots and summaries, and sites per summary"""
+        self._dump_dir = dump_dir
+        self._top = top
+        self._lock = threading.Lock()
+        self._stack: List[str] = []
+        self._peaks: Dict[str, int] = {}
+        # traced memory when the last snapshot of each phase and depth was taken
+        self._snapshots: Dict[str, Tuple[int, tracemalloc.Snapshot]] = {}
+        self._runs = 0
+        os.makedirs(dump_dir, exist_ok=True)
+
+    def start_run(self) -> None:
+        """
+        Start tracing on the first run, tracing is kept between runs so memory
+        held from previous runs is attributed too
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_PROFILE_FRAMES)
+
+        with self._lock:
+            self._stack = [BASE_PHASE]
+            self._peaks = {}
+            self._snapshots = {}
+            tracemalloc.reset_peak()
+
+    def profiled(
+        self, phase: str, func: Callable, depth: Optional[Callable[..., int]] = None
+    ) -> Callable:
+        """
+        Return func attributing the memory of each call to the phase, and to the
+        folder depth returned by depth called with the same arguments
+        """
+        @wraps(func)
+        def profiled_wrapper(*args, **kwargs):
+            with self._lock:
+                self._account()
+                self._stack.append(phase)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._account(None if depth is None else depth(*args, **kwargs))
+                    self._stack.pop()
+
+        return profiled_wrapper
+
+    def end_run(self) -> Dict:
+        """
+        Dump the snapshots and the summary of the run, named by the date and the
+        number of the run
+
+        return: summary with the peak of the run and the peak and top allocation
+        sites of each phase and depth
+        """
+        with self._lock:
+            self._account()
+            self._runs += 1
+            run_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._runs}"
+            summary = {"peak_bytes": max(self._peaks.values(), default=0), "peaks": {}}
+
+            for key, peak in sorted(self._peaks.items()):
+                top = []
+                _, snapshot = self._snapshots.get(key, (0, None))
+                if snapshot is not None:
+                    snapshot.dump(os.path.join(self._dump_dir, f"{run_name}-{key}.snapshot"))
+                    top = [
+                        {"site": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                        for stat in snapshot.statistics("lineno")[:self._top]
+                    ]
+                summary["peaks"][key] = {"peak_bytes": peak, "top": top}
+
+            self._snapshots = {}
+
+        with open(
+            os.path.join(self._dump_dir, f"{run_name}-summary.json"), "w", encoding="utf-8"
+        ) as summary_file:
+            json.dump(summary, summary_file, indent=2)
+
+        return summary
+
+    def _account(self, depth: Optional[int] = None) -> None:
+        """
+        Attribute the peak since the last phase change to the running phase, and
+        to the folder depth when given, then reset the peak
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        keys = [self._stack[-1]]
+        if depth is not None:
+            keys.append(f"depth-{depth}")
+
+        for key in keys:
+            self._peaks[key] = max(self._peaks.get(key, 0), peak)
+
+            # a snapshot of the allocations alive, taken again only when they grow
+            size, _ = self._snapshots.get(key, (0, None))
+            if current >= size * MEMORY_PROFILE_SNAPSHOT_GROWTH:
+                self._snapshots[key] = (current, _snapshot())
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    """Take a snapshot without the allocations of tracemalloc itself"""
+    return tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),)
+    )
+
+
+def compare_snapshots(old_path: str, new_path: str, top: int = MEMORY_PROFILE_TOP) -> List[str]:
+    """Return the allocation sites that grew the most from the old to the new snapshot"""
+    old = tracemalloc.Snapshot.load(old_path)
+    new = tracemalloc.Snapshot.load(new_path)
+
+    return [str(stat) for stat in new.compare_to(old, "lineno")[:top]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old", help="snapshot of the previous run", type=str)
+    parser.add_argument("new", help="snapshot of the current run", type=str)
+    parser.add_argument("--top", type=int, default=MEMORY_PROFILE_TOP,
+        help="number of allocation sites printed")
+
+    compare_args = parser.parse_args()
+    for line in compare_snapshots(compare_args.old, compare_args.new, compare_args.top):
+        print(line)
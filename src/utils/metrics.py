@@ -0,0 +1,213 @@
+"""
+Module of sync metrics, latency histograms of each phase, counters and bytes of
+each action, counters of the files copied by each copy method and throughput
+gauges of the last run, exported on the Prometheus text format and as a JSON
+line per run
+"""
+
+import bisect
+import json
+import os
+import resource
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Callable, Dict, List
+
+from settings import LATENCY_BUCKETS
+
+
+class Histogram:
+    """Counts of observed values by the upper bound of each bucket"""
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Count a value on its bucket, the last bucket has no upper bound"""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the counts of another histogram"""
+        for bucket, count in enumerate(other.counts):
+            self.counts[bucket] += count
+        self.total += other.total
+        self.count += other.count
+
+
+@dataclass
+class MetricCounts:
+    """
+    Latency histograms of the phases, counts and bytes copied of the actions and
+    counts of the files copied by each copy method
+    """
+    phases: Dict[str, Histogram] = field(default_factory=dict)
+    actions: Counter = field(default_factory=Counter)
+    bytes: Counter = field(default_factory=Counter)
+    copy_methods: Counter = field(default_factory=Counter)
+
+
+class SyncMetrics:
+    """
+    Metrics of the sync runs, observed from the scan, diff and executor threads.
+    The counters of a run are added to the totals of the process at the end of
+    the run, the totals are exported to Prometheus and the run to the JSON log
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._run = MetricCounts()
+        self._total = MetricCounts()
+        self._total_failures = 0
+        self._gauges: Dict[str, float] = {}
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """Record the latency of a phase"""
+        with self._lock:
+            histogram = self._run.phases.get(phase)
+            if histogram is None:
+                histogram = self._run.phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def timed(self, phase: str, func: Callable) -> Callable:
+        """Return func recording the latency of each call on the phase"""
+        perf_counter = time.perf_counter
+
+        @wraps(func)
+        def timed_wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe(phase, perf_counter() - started)
+
+        return timed_wrapper
+
+    def count_action(self, action: str, action_bytes: int = 0) -> None:
+        """Count an action applied and the bytes it copied"""
+        with self._lock:
+            self._run.actions[action] += 1
+            self._run.bytes[action] += action_bytes
+
+    def count_copy_methods(self, copy_methods: Dict[str, int]) -> None:
+        """Count the files copied by each copy method"""
+        with self._lock:
+            self._run.copy_methods.update(copy_methods)
+
+    def end_run(self, seconds: float, failures: int, interval: float = 0) -> Dict:
+        """
+        Close the run, adding it to the totals and updating the gauges
+
+        interval: seconds between the runs, when known
+
+        return: record of the run for the JSON log
+        """
+        with self._lock:
+            run, self._run = self._run, MetricCounts()
+
+            for phase, histogram in run.phases.items():
+                self._total.phases.setdefault(phase, Histogram()).merge(histogram)
+            self._total.actions.update(run.actions)
+            self._total.bytes.update(run.bytes)
+            self._total.copy_methods.update(run.copy_methods)
+            self._total_failures += failures
+
+            copied = sum(run.bytes.values())
+            self._gauges = {
+                "run_duration_seconds": seconds,
+                "interval_seconds": interval,
+                "throughput_bytes_per_second": copied / seconds if seconds else 0.0,
+                "throughput_actions_per_second": (
+                    sum(run.actions.values()) / seconds if seconds else 0.0
+                ),
+                # KiB on Linux
+                "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+                "last_run_timestamp_seconds": time.time(),
+            }
+
+            return {
+                **self._gauges,
+                "failures": failures,
+                "actions": dict(run.actions),
+                "bytes": dict(run.bytes),
+                "copy_methods": dict(run.copy_methods),
+                "phases": {
+                    phase: {
+                        "count": histogram.count,
+                        "seconds": histogram.total,
+                        "buckets": histogram.counts,
+                    }
+                    for phase, histogram in run.phases.items()
+                },
+            }
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write the totals and gauges on the Prometheus text format, the file is
+        replaced at once to be read by the textfile collector
+        """
+        lines = [
+            "# HELP sync_phase_seconds Latency of each sync phase",
+            "# TYPE sync_phase_seconds histogram",
+        ]
+
+        with self._lock:
+            for phase, histogram in sorted(self._total.phases.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'sync_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'sync_phase_seconds_sum{{phase="{phase}"}} {histogram.total}')
+                lines.append(f'sync_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+
+            for name, help_text, label, counter in (
+                ("sync_actions_total", "Sync actions applied", "action", self._total.actions),
+                (
+                    "sync_action_bytes_total",
+                    "Bytes copied by sync actions",
+                    "action",
+                    self._total.bytes,
+                ),
+                (
+                    "sync_copy_method_total",
+                    "Files copied by each copy method",
+                    "method",
+                    self._total.copy_methods,
+                ),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(counter.items()):
+                    lines.append(f'{name}{{{label}="{key}"}} {value}')
+
+            lines.append("# HELP sync_failures_total Sync actions that failed")
+            lines.append("# TYPE sync_failures_total counter")
+            lines.append(f"sync_failures_total {self._total_failures}")
+
+            for name, value in self._gauges.items():
+                lines.append(f"# TYPE sync_{name} gauge")
+                lines.append(f"sync_{name} {value}")
+
+        _replace_file(path, "\n".join(lines) + "\n")
+
+    @staticmethod
+    def append_json(path: str, record: Dict) -> None:
+        """Append the record of a run as a JSON line"""
+        with open(path, "a", encoding="utf-8") as log:
+            log.write(json.dumps(record) + "\n")
+
+
+def _replace_file(path: str, content: str) -> None:
+    """Write a temporary file and replace path, a reader never sees half a file"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, path)
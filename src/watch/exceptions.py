@@ -0,0 +1,12 @@
+"""Module with custom exceptions of file system watch"""
+
+class WatchBaseException(Exception):
+    """Base class exception of file system watch"""
+
+
+class WatchNotSupported(WatchBaseException):
+    """Raise when the platform does not support inotify"""
+
+
+class WatchLimitReached(WatchBaseException):
+    """Raise when the user limit of inotify watches is reached"""
@@ -0,0 +1,196 @@
+"""
+This module watches the source folders tree with Linux inotify (through ctypes) in
+order to sync only the folders with changes instead of scanning all folders tree
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Generator, List, Optional
+
+from diff_folders.walk_tree import ScanTarget
+from settings import WATCH_DEBOUNCE, WATCH_MAX_DELAY
+from watch.exceptions import WatchLimitReached, WatchNotSupported
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 1024 * 64
+
+
+class InotifyWatcher:
+    """Recursive watch of source folders tree"""
+
+    def __init__(self, source: str, symlink: bool = False) -> None:
+        """
+        Initialize inotify and register a watch for every source folder
+
+        :raises:
+            WatchNotSupported: if the platform does not support inotify.
+            WatchLimitReached: if the folders tree needs more watches than allowed.
+        """
+        if not sys.platform.startswith("linux"):
+            raise WatchNotSupported
+
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise WatchNotSupported
+
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._source = source
+        self._symlink = symlink
+        self._watches: Dict[int, str] = {}
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise WatchNotSupported(os.strerror(ctypes.get_errno()))
+
+        try:
+            self._add_tree("")
+        except WatchLimitReached:
+            self.close()
+            raise
+
+    def changes(self) -> Generator[Optional[List[ScanTarget]], None, None]:
+        """
+        Block until source changes, yielding the folders to sync after the events
+        are coalesced, None is yielded when events were lost and a full scan is
+        required
+        """
+        while True:
+            select.select([self._fd], [], [])
+            targets = {}
+            overflow = False
+            first_event = time.monotonic()
+
+            while True:
+                overflow = self._read_events(targets) or overflow
+                remaining = WATCH_MAX_DELAY - (time.monotonic() - first_event)
+
+                if remaining <= 0:
+                    break
+
+                readable, _, _ = select.select(
+                    [self._fd], [], [], min(WATCH_DEBOUNCE, remaining)
+                )
+                if not readable:
+                    break
+
+            if overflow:
+                yield None
+            elif targets:
+                yield self._coalesce(targets)
+
+    def close(self) -> None:
+        """Release the inotify file descriptor and all watches"""
+        os.close(self._fd)
+
+    def _read_events(self, targets: Dict[str, bool]) -> bool:
+        """
+        Read the pending events adding the folders to sync into targets, mapping
+        the common root to the recursive flag
+
+        return: True if the kernel queue overflowed
+        """
+        overflow = False
+
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                return overflow
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                elif wd in self._watches:
+                    self._handle_event(self._watches[wd], mask, name, targets)
+
+    def _handle_event(
+        self, common_root: str, mask: int, name: str, targets: Dict[str, bool]
+    ) -> None:
+        """Map a single event to the folders that must be synced"""
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # the parent folder receives its own event for the same change
+            return
+
+        targets.setdefault(common_root, False)
+
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            new_root = os.path.join(common_root, name)
+            self._add_tree(new_root)
+            targets[new_root] = True
+
+    def _add_tree(self, common_root: str) -> None:
+        """Register watches for a folder and all its sub folders"""
+        for src_root, src_folders, _ in os.walk(
+            os.path.join(self._source, common_root), followlinks=self._symlink
+        ):
+            root = os.path.relpath(src_root, self._source)
+            root = "" if root == "." else root
+
+            mask = WATCH_MASK if self._symlink else WATCH_MASK | IN_DONT_FOLLOW
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(src_root), mask)
+
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise WatchLimitReached
+                # folder removed before the watch was registered
+                src_folders.clear()
+                continue
+
+            self._watches[wd] = root
+
+    @staticmethod
+    def _coalesce(targets: Dict[str, bool]) -> List[ScanTarget]:
+        """Remove the folders already covered by a recursive sync of a parent folder"""
+        coalesced = []
+        recursive_roots = []
+
+        for common_root in sorted(targets):
+            if any(
+                root == "" or common_root.startswith(root + "/")
+                for root in recursive_roots
+            ):
+                continue
+
+            coalesced.append(
+                ScanTarget(common_root=common_root, recursive=targets[common_root])
+            )
+            if targets[common_root]:
+                recursive_roots.append(common_root)
+
+        return coalesced